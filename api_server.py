@@ -0,0 +1,442 @@
+# api_server.py
+# Локальный HTTP/JSON API поверх Database для других программ, которым
+# нужна та же finance.db. Только стандартная библиотека: asyncio держит
+# соединения клиентов, запросы к базе выполняются в пуле потоков (каждый
+# поток берет соединение для чтения из ConnectionPool, запись идет через
+# единственное соединение-писатель).
+#
+# Запуск из корня проекта:
+#     python -m api_server [--db finance.db] [--host 127.0.0.1] [--port 8765] [--workers 8]
+#
+# Основные адреса (фильтры записей: category, start, end, type, search):
+#     GET    /records?after_id=0&limit=500       страница записей в JSON
+#     GET    /records?format=ndjson              все записи потоком, по строке JSON
+#     GET    /export.csv                         все записи потоком в CSV
+#     POST   /records                            {"category", "amount", "type", "notes"}
+#     DELETE /records/<id>
+#     GET    /categories, POST /categories {"name"}, DELETE /categories/<id>
+#     GET    /totals/categories, /totals/days, /totals/months
+#     GET    /search?q=...&limit=100
+#     GET    /regular-expenses
+import argparse
+import asyncio
+import csv
+import io
+import json
+import math
+import re
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from functools import partial
+from urllib.parse import parse_qs, urlsplit
+
+from database import MAX_AMOUNT, Database
+
+STATUS_TEXT = {
+    200: "OK",
+    201: "Created",
+    204: "No Content",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+}
+
+MAX_BODY_SIZE = 1 << 20
+MAX_HEADERS = 100
+KEEP_ALIVE_TIMEOUT = 15
+PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+STREAM_PAGE_SIZE = 2000
+
+_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_MONTH = re.compile(r"^\d{4}-\d{2}$")
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError:
+            raise HttpError(400, "Тело запроса должно быть JSON")
+        if not isinstance(data, dict):
+            raise HttpError(400, "Ожидается JSON-объект")
+        return data
+
+
+class Stream:
+    # Ответ, который отправляется частями (Transfer-Encoding: chunked);
+    # chunks — асинхронный генератор строк
+    def __init__(self, content_type, chunks):
+        self.content_type = content_type
+        self.chunks = chunks
+
+
+def _record_to_json(record):
+    # Строка get_records_page: (id, category, amount, date, type)
+    return {"id": record[0], "category": record[1], "amount": record[2], "date": record[3], "type": record[4]}
+
+
+def _int_param(query, name, default, minimum=0, maximum=None):
+    value = query.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise HttpError(400, f"Параметр {name} должен быть целым числом")
+    if value < minimum or (maximum is not None and value > maximum):
+        raise HttpError(400, f"Параметр {name} вне допустимого диапазона")
+    return value
+
+
+def _date_param(query, name, pattern=_DATE):
+    # Шаблон проверяет формат, date.fromisoformat — что такая дата есть
+    # (2024-13-45 не пройдет); месяц проверяется по его первому дню
+    value = query.get(name)
+    if not value:
+        return None
+    try:
+        if not pattern.match(value):
+            raise ValueError(value)
+        date.fromisoformat(value if pattern is _DATE else f"{value}-01")
+    except ValueError:
+        raise HttpError(400, f"Неверный формат параметра {name}")
+    return value
+
+
+def _type_param(query):
+    record_type = query.get("type")
+    if record_type not in (None, "", "income", "expense"):
+        raise HttpError(400, "Параметр type: income или expense")
+    return record_type or None
+
+
+def _record_filters(query):
+    filters = {
+        "category_filter": query.get("category"),
+        "start_date": _date_param(query, "start"),
+        "end_date": _date_param(query, "end"),
+        "record_type": _type_param(query),
+        "search_term": query.get("search"),
+    }
+    return {key: value for key, value in filters.items() if value}
+
+
+class ApiServer:
+    def __init__(self, db, workers=8):
+        self.db = db
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-db")
+        self.routes = [
+            ("GET", re.compile(r"^/records$"), self.list_records),
+            ("POST", re.compile(r"^/records$"), self.add_record),
+            ("DELETE", re.compile(r"^/records/(\d+)$"), self.delete_record),
+            ("GET", re.compile(r"^/export\.csv$"), self.export_csv),
+            ("GET", re.compile(r"^/categories$"), self.list_categories),
+            ("POST", re.compile(r"^/categories$"), self.add_category),
+            ("DELETE", re.compile(r"^/categories/(\d+)$"), self.delete_category),
+            ("GET", re.compile(r"^/totals/categories$"), self.totals_by_category),
+            ("GET", re.compile(r"^/totals/days$"), self.totals_by_day),
+            ("GET", re.compile(r"^/totals/months$"), self.totals_by_month),
+            ("GET", re.compile(r"^/search$"), self.search),
+            ("GET", re.compile(r"^/regular-expenses$"), self.list_regular_expenses),
+        ]
+
+    async def run_db(self, func, *args, **kwargs):
+        # Запрос к базе выполняется в пуле потоков, цикл событий не блокируется
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    # --- записи ---
+
+    async def list_records(self, request):
+        filters = _record_filters(request.query)
+        if request.query.get("format") == "ndjson":
+            return Stream("application/x-ndjson; charset=utf-8", self._ndjson_records(filters))
+
+        after_id = _int_param(request.query, "after_id", 0)
+        limit = _int_param(request.query, "limit", PAGE_SIZE, 1, MAX_PAGE_SIZE)
+        rows = await self.run_db(self.db.get_records_page, after_id, limit, **filters)
+        return 200, {
+            "records": [_record_to_json(row) for row in rows],
+            "next_after_id": rows[-1][0] if len(rows) == limit else None,
+        }
+
+    async def _pages(self, filters):
+        # Все записи выборки страницами по ключу id: каждая страница —
+        # отдельный короткий запрос, поток не держит курсор между отправками
+        after_id = 0
+        while True:
+            rows = await self.run_db(self.db.get_records_page, after_id, STREAM_PAGE_SIZE, **filters)
+            if rows:
+                yield rows
+            if len(rows) < STREAM_PAGE_SIZE:
+                break
+            after_id = rows[-1][0]
+
+    async def _ndjson_records(self, filters):
+        async for rows in self._pages(filters):
+            yield "".join(json.dumps(_record_to_json(row), ensure_ascii=False) + "\n" for row in rows)
+
+    async def export_csv(self, request):
+        filters = _record_filters(request.query)
+
+        async def chunks():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(["Категория", "Сумма", "Дата", "Тип"])
+            async for rows in self._pages(filters):
+                writer.writerows((row[1], f"{row[2]:.2f}", row[3], row[4]) for row in rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+
+        return Stream("text/csv; charset=utf-8", chunks())
+
+    async def add_record(self, request):
+        data = request.json()
+        category = str(data.get("category") or "").strip()
+        record_type = data.get("type", "expense")
+        if not category:
+            raise HttpError(400, "Не указана категория")
+        if record_type not in ("income", "expense"):
+            raise HttpError(400, "Поле type: income или expense")
+        try:
+            amount = float(data.get("amount"))
+        except (TypeError, ValueError):
+            raise HttpError(400, "Сумма должна быть числом")
+        # float() принимает "nan" и "inf", а json — NaN и Infinity
+        if not math.isfinite(amount) or abs(amount) > MAX_AMOUNT:
+            raise HttpError(400, "Недопустимая сумма")
+        notes = data.get("notes")
+        if notes is not None and not isinstance(notes, str):
+            raise HttpError(400, "Поле notes должно быть строкой")
+        record = await self.run_db(self.db.add_record, category, amount, record_type, notes)
+        return 201, _record_to_json(record)
+
+    async def delete_record(self, request, record_id):
+        await self.run_db(self.db.delete_record, int(record_id))
+        return 204, None
+
+    # --- категории ---
+
+    async def list_categories(self, request):
+        rows = await self.run_db(self.db.get_all_categories)
+        return 200, [{"id": category_id, "name": name} for category_id, name in rows]
+
+    async def add_category(self, request):
+        name = str(request.json().get("name") or "").strip()
+        if not name:
+            raise HttpError(400, "Не указано название категории")
+        try:
+            category_id = await self.run_db(self.db.add_category, name)
+        except sqlite3.IntegrityError:
+            raise HttpError(409, "Такая категория уже есть")
+        return 201, {"id": category_id}
+
+    async def delete_category(self, request, category_id):
+        try:
+            await self.run_db(self.db.delete_category, int(category_id))
+        except sqlite3.IntegrityError:
+            raise HttpError(409, "Категория используется в записях")
+        return 204, None
+
+    # --- итоги и поиск ---
+
+    async def totals_by_category(self, request):
+        filters = _record_filters(request.query)
+        rows = await self.run_db(self.db.sum_by_category, **filters)
+        return 200, [{"category": category, "amount": amount} for category, amount in rows]
+
+    async def totals_by_day(self, request):
+        query = request.query
+        rows = await self.run_db(self.db.sum_by_day, _date_param(query, "start"), _date_param(query, "end"),
+                                 _type_param(query))
+        return 200, [{"day": day, "amount": amount} for day, amount in rows]
+
+    async def totals_by_month(self, request):
+        query = request.query
+        rows = await self.run_db(self.db.sum_by_month, _date_param(query, "start", _MONTH),
+                                 _date_param(query, "end", _MONTH), _type_param(query))
+        return 200, [{"month": month, "amount": amount} for month, amount in rows]
+
+    async def search(self, request):
+        term = (request.query.get("q") or "").strip()
+        if not term:
+            raise HttpError(400, "Не указан параметр q")
+        limit = _int_param(request.query, "limit", 100, 1, MAX_PAGE_SIZE)
+        rows = await self.run_db(self.db.search_records, term, limit)
+        return 200, [dict(_record_to_json(row), notes=row[6]) for row in rows]
+
+    async def list_regular_expenses(self, request):
+        rows = await self.run_db(self.db.get_regular_expenses)
+        return 200, [{"id": expense_id, "category": category, "amount": amount, "interval": interval,
+                      "next_payment_date": next_payment_date, "anchor_date": anchor_date}
+                     for expense_id, category, amount, interval, next_payment_date, anchor_date in rows]
+
+    # --- HTTP ---
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except HttpError as error:
+                    await self._send_json(writer, error.status, {"error": error.message}, False)
+                    break
+                if request is None:
+                    break
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                keep_alive = await self._respond(request, writer, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "Неверная строка запроса")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HttpError(431, "Слишком много заголовков")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HttpError(400, "Неверный заголовок Content-Length")
+        if length < 0 or length > MAX_BODY_SIZE:
+            raise HttpError(413, "Слишком большое тело запроса")
+        body = await reader.readexactly(length) if length else b""
+
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        return Request(method.upper(), url.path, query, headers, body)
+
+    async def _respond(self, request, writer, keep_alive):
+        try:
+            allowed = False
+            for method, pattern, handler in self.routes:
+                match = pattern.match(request.path)
+                if match is None:
+                    continue
+                allowed = True
+                if method == request.method:
+                    response = await handler(request, *match.groups())
+                    break
+            else:
+                raise HttpError(405 if allowed else 404, "Метод не поддерживается" if allowed else "Не найдено")
+        except HttpError as error:
+            response = error.status, {"error": error.message}
+        except Exception as error:
+            response = 500, {"error": f"{type(error).__name__}: {error}"}
+
+        if isinstance(response, Stream):
+            return await self._send_stream(writer, response, keep_alive)
+        await self._send_json(writer, *response, keep_alive)
+        return keep_alive
+
+    def _head(self, status, headers, keep_alive):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}"]
+        lines += [f"{name}: {value}" for name, value in headers]
+        lines.append("Connection: " + ("keep-alive" if keep_alive else "close"))
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send_json(self, writer, status, payload, keep_alive):
+        body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers = [("Content-Length", len(body))]
+        if payload is not None:
+            headers.insert(0, ("Content-Type", "application/json; charset=utf-8"))
+        writer.write(self._head(status, headers, keep_alive) + body)
+        await writer.drain()
+
+    async def _send_stream(self, writer, response, keep_alive):
+        # Ошибку посреди потока клиенту уже не сообщить статусом, поэтому
+        # соединение просто закрывается без завершающего пустого фрагмента.
+        # Возвращает, можно ли продолжать соединение
+        writer.write(self._head(200, [("Content-Type", response.content_type),
+                                      ("Transfer-Encoding", "chunked")], keep_alive))
+        try:
+            async for chunk in response.chunks:
+                data = chunk.encode("utf-8")
+                if data:
+                    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    # Ждем, пока клиент заберет данные, чтобы не копить их в памяти
+                    await writer.drain()
+        except ConnectionError:
+            raise
+        except Exception:
+            return False
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return keep_alive
+
+    async def serve(self, host="127.0.0.1", port=8765, ready=None):
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+        if ready is not None:
+            ready(server)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Локальный HTTP/JSON API для базы финансов")
+    parser.add_argument("--db", default="finance.db", help="путь к файлу базы данных")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=8, help="потоков для запросов к базе")
+    args = parser.parse_args(argv)
+
+    # WAL: читатели из пула не ждут окончания записи
+    db = Database(args.db, wal=True, synchronous="NORMAL", read_connections=args.workers)
+    server = ApiServer(db, args.workers)
+    print(f"API доступно по адресу http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
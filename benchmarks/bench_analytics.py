@@ -0,0 +1,68 @@
+# benchmarks/bench_analytics.py
+# Группировка по категориям и дням: цикл по строкам на Python против
+# utils.analytics (NumPy). Заодно проверяется, что суммы в копейках совпадают.
+#
+# Запуск из корня проекта:
+#     python benchmarks/bench_analytics.py --rows 2000000
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datagen import fill
+from database import Database
+from utils import analytics
+
+
+def python_group_by(db):
+    categories = dict(db.get_all_categories())
+    by_category = {}
+    by_day = {}
+    for rows in db.iter_amount_chunks():
+        for day, category_id, amount in rows:
+            category = categories[category_id]
+            by_category[category] = by_category.get(category, 0) + amount
+            by_day[day] = by_day.get(day, 0) + amount
+    return by_category, by_day
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Аналитика: Python против NumPy")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        print(f"Заполнение {args.rows} записей...")
+        fill(db, args.rows)
+
+        started = time.perf_counter()
+        by_category, by_day = python_group_by(db)
+        python_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        columns = analytics.load_columns(db)
+        load_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        categories, category_totals = analytics.sum_by_category(columns)
+        days, day_totals = analytics.sum_by_day(columns)
+        analytics.cumulative_by_day(columns)
+        numpy_seconds = time.perf_counter() - started
+
+        sql_totals = {category: round(total * 100) for category, total in db.sum_by_category()}
+        db.close()
+
+    assert dict(zip(categories, category_totals.tolist())) == by_category == sql_totals
+    assert dict(zip(days.astype(str).tolist(), day_totals.tolist())) == by_day
+
+    print(f"Python (чтение + dict):  {python_seconds * 1000:>10.1f} мс")
+    print(f"NumPy: загрузка столбцов {load_seconds * 1000:>10.1f} мс")
+    print(f"NumPy: группировки       {numpy_seconds * 1000:>10.1f} мс")
+    print("Суммы по категориям и дням совпадают с SQL до копейки")
+
+
+if __name__ == "__main__":
+    main()
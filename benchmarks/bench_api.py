@@ -0,0 +1,129 @@
+# benchmarks/bench_api.py
+# Нагрузка на локальный API (api_server.py): много одновременных клиентов
+# с keep-alive запрашивают страницы записей, итоги по категориям и поиск.
+# Сервер запускается в этом же процессе в отдельном потоке со своим
+# циклом событий. Выводятся запросы в секунду и задержки p50/p95/p99.
+#
+# Запуск из корня проекта:
+#     python benchmarks/bench_api.py --rows 200000 --clients 300 --requests 20
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_server import ApiServer
+from datagen import fill
+from database import Database
+
+PATHS = [
+    "/records?limit=500",
+    "/records?limit=100&category=%D0%9A%D0%B0%D1%84%D0%B5",
+    "/records?limit=100&start=2020-03-01&end=2020-03-31&type=income",
+    "/totals/categories?start=2019-01-01&end=2019-12-31",
+    "/search?q=%D0%BA%D0%B0%D1%84&limit=50",
+    "/categories",
+]
+
+
+def start_server(db, workers):
+    # Цикл событий сервера работает в отдельном потоке; возвращает порт и
+    # функцию остановки
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    api = ApiServer(db, workers)
+    started = threading.Event()
+    result = {}
+
+    def ready(server):
+        result["port"] = server.sockets[0].getsockname()[1]
+        started.set()
+
+    serving = asyncio.run_coroutine_threadsafe(api.serve("127.0.0.1", 0, ready), loop)
+    started.wait()
+
+    def stop():
+        serving.cancel()
+        # Клиенты уже закрыли соединения: даем обработчикам завершиться
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0.2), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        api.close()
+
+    return result["port"], stop
+
+
+async def request(reader, writer, path):
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b"\r\n":
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    body = await reader.readexactly(length)
+    if status != 200:
+        raise RuntimeError(f"{path}: {status} {body.decode('utf-8')}")
+    return json.loads(body)
+
+
+async def client(port, number, count, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for step in range(count):
+            path = PATHS[(number + step) % len(PATHS)]
+            started = time.perf_counter()
+            await request(reader, writer, path)
+            latencies.append(time.perf_counter() - started)
+    finally:
+        writer.close()
+
+
+async def load(port, clients, count):
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*(client(port, number, count, latencies) for number in range(clients)))
+    return time.perf_counter() - started, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузка на локальный API")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--clients", type=int, default=300)
+    parser.add_argument("--requests", type=int, default=20, help="запросов на клиента")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"), wal=True, synchronous="NORMAL")
+        print(f"Заполнение {args.rows} записей...")
+        fill(db, args.rows)
+
+        port, stop = start_server(db, args.workers)
+        seconds, latencies = asyncio.run(load(port, args.clients, args.requests))
+        stop()
+        stats = db.cache_stats()
+        db.close()
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f"Клиентов: {args.clients}, запросов: {len(latencies)} за {seconds:.2f} с "
+          f"({len(latencies) / seconds:,.0f} запросов/с)")
+    print(f"Задержка: p50 {quantiles[49] * 1000:.1f} мс, p95 {quantiles[94] * 1000:.1f} мс, "
+          f"p99 {quantiles[98] * 1000:.1f} мс")
+    print(f"Кэш запросов: попаданий {stats['hits']}, промахов {stats['misses']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_batch_report.py
+# Пакетный отчет по месяцам за все годы: как раньше (каждый период —
+# выборка записей через get_records_by_period и подсчет в Python), в одном
+# процессе через utils.batch_report и в пуле процессов. Проверяется, что
+# последовательный и параллельный варианты дают одинаковый результат.
+# Ускорение пула зависит от числа ядер; на одном ядре его нет.
+#
+# Запуск из корня проекта:
+#     python benchmarks/bench_batch_report.py --rows 1000000 --step month --jobs 4
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datagen import fill
+from database import Database
+from utils.batch_report import STEPS, build_batch_report, split_periods
+
+
+def report_by_records(db, step):
+    # Прежний способ: строки каждого периода целиком читаются из базы
+    first_day, last_day = db.get_date_range()
+    totals = {}
+    for label, start_date, end_date in split_periods(first_day, last_day, step):
+        income = expense = 0.0
+        for record in db.get_records_by_period(start_date, end_date + " 23:59:59"):
+            if record[4] == "income":
+                income += record[2]
+            else:
+                expense += record[2]
+        totals[label] = (round(income, 2), round(expense, 2))
+    return totals
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетный отчет в пуле процессов")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--step", choices=STEPS, default="month")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    print(f"Ядер: {os.cpu_count()}, процессов: {args.jobs}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        db = Database(path, query_cache_size=0)
+        print(f"Заполнение {args.rows} записей...")
+        fill(db, args.rows)
+        by_records, records_seconds = timed(report_by_records, db, args.step)
+        db.close()
+
+        sequential, sequential_seconds = timed(build_batch_report, path, step=args.step, jobs=1)
+        parallel, parallel_seconds = timed(build_batch_report, path, step=args.step, jobs=args.jobs)
+
+    assert sequential == parallel
+    assert by_records == {period["period"]: (period["income"], period["expense"])
+                          for period in parallel["periods"]}
+
+    print(f"Периодов: {len(parallel['periods'])}")
+    print(f"{'Выборка записей по периодам:':<30}{records_seconds * 1000:>10.1f} мс")
+    print(f"{'batch_report, jobs=1:':<30}{sequential_seconds * 1000:>10.1f} мс")
+    print(f"{f'batch_report, jobs={args.jobs}:':<30}{parallel_seconds * 1000:>10.1f} мс"
+          f"  ({sequential_seconds / parallel_seconds:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
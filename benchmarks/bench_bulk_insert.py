@@ -0,0 +1,43 @@
+# benchmarks/bench_bulk_insert.py
+# Скорость вставки: add_record (commit на каждую строку) против add_records_bulk.
+#
+# Запуск из корня проекта:
+#     python benchmarks/bench_bulk_insert.py --rows 500000
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datagen import generate_records
+from database import Database
+
+def main():
+    parser = argparse.ArgumentParser(description="Скорость вставки записей")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--single-rows", type=int, default=2_000,
+                        help="сколько строк вставить через add_record")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+
+        started = time.perf_counter()
+        for category, amount, _, record_type, notes in generate_records(args.single_rows):
+            db.add_record(category, amount, record_type, notes)
+        single = args.single_rows / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        db.add_records_bulk(generate_records(args.rows, seed=7), batch_size=args.batch_size)
+        bulk = args.rows / (time.perf_counter() - started)
+        db.close()
+
+    print(f"add_record:       {single:>12,.0f} строк/с")
+    print(f"add_records_bulk: {bulk:>12,.0f} строк/с (batch_size={args.batch_size})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_filter_indexes.py
+# Сравнение времени фильтрации записей без индексов и с индексами.
+#
+# Запуск из корня проекта:
+#     python benchmarks/bench_filter_indexes.py --rows 1000000
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datagen import fill
+from database import Database
+
+INDEXES = [
+    "idx_records_date",
+    "idx_records_category_date",
+    "idx_records_type_date",
+    "idx_regular_expenses_next_payment_date",
+]
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def run_queries(db, repeat):
+    queries = {
+        "category + period": lambda: db.get_filtered_records("Кафе", "2020-03-01", "2020-03-31"),
+        "period": lambda: db.get_records_by_period("2021-06-01", "2021-06-07"),
+        "type + period (page)": lambda: db.get_records_page(
+            0, 500, start_date="2019-01-01", end_date="2019-01-31", record_type="income"),
+        "due regular expenses": lambda: db.get_due_regular_expenses("2015-02-01"),
+    }
+    return {name: measure(func, repeat) for name, func in queries.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Фильтрация записей: без индексов и с индексами")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Кэш запросов отключен: каждый повтор должен выполнять запрос
+        db = Database(os.path.join(tmp, "bench.db"), query_cache_size=0)
+        print(f"Заполнение {args.rows} записей...")
+        # Регулярных расходов больше обычного, чтобы был заметен индекс по дате платежа
+        fill(db, args.rows, regular_expenses=args.rows // 100)
+
+        # Запоминаем определения индексов, чтобы потом создать их заново
+        placeholders = ", ".join("?" * len(INDEXES))
+        definitions = [row[0] for row in db.cursor.execute(
+            f"SELECT sql FROM sqlite_master WHERE type = 'index' AND name IN ({placeholders})", INDEXES
+        ).fetchall()]
+        for index in INDEXES:
+            db.cursor.execute(f"DROP INDEX {index}")
+        before = run_queries(db, args.repeat)
+
+        for definition in definitions:
+            db.cursor.execute(definition)
+        db.cursor.execute("ANALYZE")
+        after = run_queries(db, args.repeat)
+        db.close()
+
+    print(f"{'Запрос':<24}{'без индексов, мс':>18}{'с индексами, мс':>18}{'ускорение':>12}")
+    for name in before:
+        print(f"{name:<24}{before[name]:>18.2f}{after[name]:>18.2f}{before[name] / after[name]:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/bench_import.py
+# Импорт синтетической банковской выписки в формате CSV.
+#
+# Запуск из корня проекта:
+#     python benchmarks/bench_import.py --rows 1000000
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+from utils.importer import import_file, print_progress
+
+PAYEES = ["Пятерочка", "Магнит", "Яндекс Такси", "Аптека", "МТС", "Кофейня", "Перевод",
+          "Заправка", "Ozon", "Wildberries", "Кинотеатр", "Зарплата"]
+
+
+def write_statement(path, rows, seed=42):
+    # Выписка в «банковском» виде: разделитель ';', даты дд.мм.гггг,
+    # десятичная запятая, расходы со знаком минус, строки упорядочены по дате
+    rnd = random.Random(seed)
+    day = datetime(2015, 1, 1)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("Дата операции;Описание;Сумма\n")
+        for _ in range(rows):
+            if rnd.random() < 0.01:
+                day += timedelta(days=1)
+            payee = rnd.choice(PAYEES)
+            amount = rnd.uniform(50, 90000) if payee == "Зарплата" else -rnd.uniform(10, 5000)
+            when = day + timedelta(seconds=rnd.randrange(86400))
+            amount_text = f"{amount:.2f}".replace(".", ",")
+            file.write(f"{when:%d.%m.%Y %H:%M:%S};{payee};{amount_text}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Скорость импорта выписки")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        statement = os.path.join(tmp, "statement.csv")
+        write_statement(statement, args.rows)
+        print(f"Выписка: {args.rows:,} строк, {os.path.getsize(statement) / 1e6:.1f} МБ")
+
+        db = Database(os.path.join(tmp, "bench.db"))
+        for attempt in ("первый импорт", "повторный импорт (все строки — дубликаты)"):
+            print(attempt)
+            started = time.perf_counter()
+            stats = import_file(db, statement, progress=print_progress, progress_every=250_000)
+            elapsed = time.perf_counter() - started
+            print(f"  добавлено {stats['inserted']:,}, дубликатов {stats['duplicates']:,}, "
+                  f"ошибок {stats['errors']:,}: {elapsed:.1f} с, {stats['rows_per_second']:,.0f} строк/с")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
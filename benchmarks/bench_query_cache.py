@@ -0,0 +1,63 @@
+# benchmarks/bench_query_cache.py
+# Кэш результатов запросов на сценарии, похожем на работу интерфейса:
+# после каждого добавления записи заново загружаются первая страница и
+# список категорий, а отчет за одни и те же периоды строится повторно.
+# Сравнивается Database без кэша и с кэшем, выводятся счетчики попаданий.
+#
+# Запуск из корня проекта:
+#     python benchmarks/bench_query_cache.py --rows 1000000 --rounds 200
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datagen import fill
+from database import Database
+
+PERIODS = [("2019-01-01", "2019-12-31"), ("2020-03-01", "2020-03-31"), ("2024-01-15", "2024-02-15")]
+
+
+def session(db, rounds):
+    started = time.perf_counter()
+    for number in range(rounds):
+        # Между добавлениями пользователь несколько раз листает и строит отчеты
+        if number % 10 == 0:
+            db.add_record("Кафе", 250, "expense")
+        db.get_records_page(0, 500)
+        db.get_records_page(0, 500, category_filter="Кафе")
+        db.get_categories()
+        start_date, end_date = PERIODS[number % len(PERIODS)]
+        db.sum_by_category(start_date, end_date, "expense")
+        db.sum_by_day(start_date, end_date)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Кэш результатов запросов")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        db = Database(path, query_cache_size=0)
+        print(f"Заполнение {args.rows} записей...")
+        fill(db, args.rows)
+        uncached = session(db, args.rounds)
+        db.close()
+
+        db = Database(path)
+        cached = session(db, args.rounds)
+        stats = db.cache_stats()
+        db.close()
+
+    print(f"Без кэша: {uncached * 1000:>10.1f} мс")
+    print(f"С кэшем:  {cached * 1000:>10.1f} мс  ({uncached / cached:.1f}x)")
+    print(f"Попаданий: {stats['hits']}, промахов: {stats['misses']}, доля попаданий: {stats['hit_rate']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/bench_snapshot.py
+# Аналитика по снимку utils/snapshot.py против загрузки столбцов из SQLite
+# (utils.analytics.load_columns): время до первого результата и прирост
+# резидентной памяти процесса. Суммы обоих вариантов сверяются.
+#
+# Запуск из корня проекта:
+#     python benchmarks/bench_snapshot.py --rows 2000000
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datagen import fill
+from database import Database
+from utils import analytics
+from utils.snapshot import Snapshot, build_snapshot
+
+
+def resident_mb():
+    # Текущий размер резидентной памяти (Linux); на других системах 0
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def dashboard(columns):
+    # Набор расчетов, как у панели с итогами
+    by_category = analytics.sum_by_category(columns)
+    by_month = analytics.sum_by_month(columns)
+    analytics.cumulative_by_day(columns)
+    return by_category, by_month
+
+
+def measure(title, load):
+    memory = resident_mb()
+    started = time.perf_counter()
+    columns = load()
+    loaded = time.perf_counter() - started
+    by_category, by_month = dashboard(columns)
+    total = time.perf_counter() - started
+    print(f"{title:<12} загрузка {loaded * 1000:>9.1f} мс, с расчетами {total * 1000:>9.1f} мс, "
+          f"память +{resident_mb() - memory:.0f} МБ")
+    return by_category, by_month
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Снимок memmap против загрузки из SQLite")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"), query_cache_size=0)
+        print(f"Заполнение {args.rows} записей...")
+        fill(db, args.rows)
+
+        started = time.perf_counter()
+        build_snapshot(db, os.path.join(tmp, "snapshot"))
+        print(f"Снимок построен за {time.perf_counter() - started:.1f} с")
+
+        snapshot_result = measure("Снимок", lambda: Snapshot(os.path.join(tmp, "snapshot")).columns())
+        sqlite_result = measure("SQLite", lambda: analytics.load_columns(db))
+        db.close()
+
+    (categories, category_totals), (months, month_totals) = snapshot_result
+    (expected_categories, expected_category_totals), (expected_months, expected_month_totals) = sqlite_result
+    assert dict(zip(categories, category_totals.tolist())) == dict(
+        zip(expected_categories, expected_category_totals.tolist()))
+    assert months.tolist() == expected_months.tolist()
+    assert month_totals.tolist() == expected_month_totals.tolist()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# benchmarks/bench_startup.py
+# Время холодного запуска интерфейса.
+#
+# 1. python -X importtime -c "import gui": сколько занимает импорт gui и
+#    какие из импортируемых им модулей самые тяжелые.
+# 2. Время от запуска процесса до показа главного окна (медиана по
+#    нескольким запускам) сравнивается с целевым значением.
+#
+# Окно создается с пустой базой во временном каталоге. Без дисплея
+# используется QT_QPA_PLATFORM=offscreen.
+#
+# Запуск из корня проекта:
+#     python benchmarks/bench_startup.py --runs 5 --target 300
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WINDOW_SCRIPT = """
+import sys
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication
+import gui
+
+app = QApplication(sys.argv)
+window = gui.MainWindow()
+window.show()
+
+def shown():
+    print("shown", flush=True)
+    window.close()
+    app.quit()
+
+QTimer.singleShot(0, shown)
+app.exec_()
+"""
+
+
+def environment():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    if sys.platform.startswith("linux") and not env.get("DISPLAY") and not env.get("WAYLAND_DISPLAY"):
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return env
+
+
+def import_times(cwd):
+    # Строки вида "import time: self [us] | cumulative | imported package";
+    # глубина вложенности импорта — отступ по два пробела на уровень
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import gui"],
+                            cwd=cwd, env=environment(), capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((int(cumulative) / 1000, depth, name.strip()))
+    return modules
+
+
+def time_to_window(cwd):
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", WINDOW_SCRIPT], cwd=cwd, env=environment(),
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    line = process.stdout.readline()
+    elapsed = time.perf_counter() - started
+    process.wait()
+    if line.strip() != "shown":
+        raise RuntimeError("Главное окно не было показано")
+    return elapsed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время запуска интерфейса")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target", type=float, default=300, help="целевое время до показа окна, мс")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        modules = import_times(tmp)
+        # Первый запуск создает базу, его не учитываем
+        time_to_window(tmp)
+        timings = [time_to_window(tmp) for _ in range(args.runs)]
+
+    gui_time = next(cumulative for cumulative, depth, name in modules if depth == 0 and name == "gui")
+    print(f"Импорт gui: {gui_time:.1f} мс")
+    print("Самые тяжелые модули, которые импортирует gui:")
+    direct = sorted(((cumulative, name) for cumulative, depth, name in modules if depth == 1), reverse=True)
+    for cumulative, name in direct[:10]:
+        print(f"  {cumulative:>8.1f} мс  {name}")
+
+    median = statistics.median(timings)
+    print(f"До показа окна: медиана {median:.0f} мс, минимум {min(timings):.0f} мс (цель {args.target:.0f} мс)")
+    if median > args.target:
+        print("Целевое время превышено")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
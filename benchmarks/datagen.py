@@ -0,0 +1,151 @@
+# benchmarks/datagen.py
+# Детерминированный генератор синтетических данных для бенчмарков.
+#
+# При одинаковых rows и seed получается одна и та же база. Распределения
+# приближены к реальному учету:
+# - частоты категорий убывают по закону Ципфа (продукты и кафе встречаются
+#   намного чаще подарков), доходы — около 8% записей;
+# - суммы логнормальные со своей медианой для каждой категории;
+# - записи идут по времени (id растет вместе с датой), в выходные их
+#   больше, время суток — в основном днем и вечером;
+# - у части записей есть примечания (для полнотекстового поиска);
+# - регулярные расходы с разными интервалами.
+#
+# Запуск из корня проекта (создает базу с данными):
+#     python benchmarks/datagen.py bench.db --size 1m [--seed 42]
+import argparse
+import math
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+
+START = datetime(2015, 1, 1)
+YEARS = 10
+
+# Категория расходов -> медиана суммы в рублях; порядок задает частоту
+EXPENSE_CATEGORIES = [
+    ("Еда", 650), ("Кафе", 450), ("Транспорт", 180), ("Такси", 420), ("Связь", 550),
+    ("Аптека", 700), ("Здоровье", 2500), ("Одежда", 3200), ("Развлечения", 1200),
+    ("Коммунальные услуги", 5200), ("Дом", 1500), ("Подписки", 350), ("Книги", 800),
+    ("Спорт", 1800), ("Подарки", 2500), ("Путешествия", 15000), ("Образование", 6000),
+    ("Животные", 1100), ("Красота", 1900), ("Электроника", 9000), ("Авто", 3500),
+    ("Аренда", 35000), ("Благотворительность", 500), ("Налоги", 8000), ("Прочее", 600),
+]
+INCOME_CATEGORIES = [("Зарплата", 85000), ("Подработка", 12000), ("Проценты", 900), ("Кэшбэк", 350)]
+INCOME_SHARE = 0.08
+AMOUNT_SIGMA = 0.8
+
+NOTES_SHARE = 0.15
+NOTE_WORDS = ["обед", "ужин", "с коллегами", "продукты на неделю", "метро", "такси домой", "подарок маме",
+              "день рождения", "отпуск", "билеты", "лекарства", "ремонт", "кофе", "абонемент", "штраф",
+              "возврат", "скидка", "акция", "доставка", "заказ", "онлайн", "наличные", "карта", "кэшбэк"]
+
+# Доля записей по дням недели (понедельник — первый) и по часам
+WEEKDAY_WEIGHTS = [0.9, 0.9, 0.95, 1.0, 1.2, 1.5, 1.3]
+HOUR_WEIGHTS = [0.1, 0.05, 0.02, 0.02, 0.02, 0.1, 0.3, 0.8, 1.2, 1.0, 1.0, 1.2,
+                1.6, 1.4, 1.1, 1.0, 1.1, 1.4, 1.9, 2.0, 1.6, 1.1, 0.6, 0.3]
+
+REGULAR_EXPENSES = [
+    ("Аренда", 35000, "ежемесячно"), ("Коммунальные услуги", 5200, "ежемесячно"), ("Связь", 550, "ежемесячно"),
+    ("Подписки", 299, "ежемесячно"), ("Спорт", 2500, "ежемесячно"), ("Авто", 12000, "ежегодно"),
+    ("Образование", 18000, "ежеквартально"), ("Животные", 900, "еженедельно"), ("Еда", 350, "ежедневно"),
+]
+
+
+def _zipf_weights(count, exponent=1.1):
+    return list(accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def generate_records(rows, seed=42):
+    # Кортежи (category, amount, date, type, notes) в порядке возрастания даты
+    rnd = random.Random(seed)
+    expense_weights = _zipf_weights(len(EXPENSE_CATEGORIES))
+    income_weights = _zipf_weights(len(INCOME_CATEGORIES), 1.5)
+    hours = list(range(24))
+    hour_weights = list(accumulate(HOUR_WEIGHTS))
+
+    # Промежутки между записями экспоненциальные, в выходные они короче
+    days = YEARS * 365
+    rate = rows / days / (sum(WEEKDAY_WEIGHTS) / len(WEEKDAY_WEIGHTS))
+    position = 0.0
+    for _ in range(rows):
+        day = START + timedelta(days=min(int(position), days - 1))
+        position += rnd.expovariate(rate * WEEKDAY_WEIGHTS[day.weekday()])
+
+        if rnd.random() < INCOME_SHARE:
+            category, median = rnd.choices(INCOME_CATEGORIES, cum_weights=income_weights)[0]
+            record_type = "income"
+        else:
+            category, median = rnd.choices(EXPENSE_CATEGORIES, cum_weights=expense_weights)[0]
+            record_type = "expense"
+        amount = round(max(1.0, rnd.lognormvariate(math.log(median), AMOUNT_SIGMA)), 2)
+
+        hour = rnd.choices(hours, cum_weights=hour_weights)[0]
+        moment = day + timedelta(hours=hour, seconds=rnd.randrange(3600))
+
+        notes = None
+        if rnd.random() < NOTES_SHARE:
+            notes = " ".join(rnd.sample(NOTE_WORDS, rnd.randint(1, 3)))
+        yield category, amount, moment.strftime("%Y-%m-%d %H:%M:%S"), record_type, notes
+
+
+def generate_regular_expenses(count, seed=42):
+    # Кортежи (category, amount, interval, next_payment_date); даты следующего
+    # платежа — в пределах года после начала периода данных
+    rnd = random.Random(seed + 1)
+    for number in range(count):
+        category, amount, interval = REGULAR_EXPENSES[number % len(REGULAR_EXPENSES)]
+        next_date = START + timedelta(days=rnd.randrange(365))
+        yield category, amount, interval, next_date.strftime("%Y-%m-%d")
+
+
+def fill(db, rows, seed=42, regular_expenses=None):
+    # Заполняет базу: rows записей и regular_expenses регулярных расходов
+    # (по умолчанию один на 10 000 записей, но не меньше 10)
+    db.add_records_bulk(generate_records(rows, seed))
+    if regular_expenses is None:
+        regular_expenses = max(10, rows // 10_000)
+    with db.transaction():
+        for category, amount, interval, next_date in generate_regular_expenses(regular_expenses, seed):
+            db.add_regular_expense(category, amount, interval, next_date)
+
+
+def parse_size(value):
+    # "10k", "1m", "10m" или число строк
+    value = value.lower().replace("_", "")
+    if value in SIZES:
+        return SIZES[value]
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"размер: {', '.join(SIZES)} или число строк")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетическая база для бенчмарков")
+    parser.add_argument("db", help="файл базы; должен не существовать")
+    parser.add_argument("--size", type=parse_size, default=SIZES["1m"], help="10k, 1m, 10m или число строк")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        parser.error(f"файл {args.db} уже существует")
+    db = Database(args.db, query_cache_size=0)
+    try:
+        fill(db, args.size, args.seed)
+    finally:
+        db.close()
+    print(f"{args.db}: {args.size:,} записей, seed={args.seed}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
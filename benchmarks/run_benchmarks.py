@@ -0,0 +1,206 @@
+# benchmarks/run_benchmarks.py
+# Набор бенчмарков основных операций Database, экспорта и отчетов.
+#
+# Данные создает benchmarks/datagen.py; готовая база сохраняется в
+# benchmarks/data/ и при следующих запусках с тем же размером и seed
+# только копируется (изменяющие операции не портят исходную базу).
+# Кэш запросов отключен, чтобы каждый повтор выполнял запрос.
+#
+# Результаты записываются в benchmarks/results/<время>-<коммит>.json:
+# параметры запуска, версии Python и SQLite и время каждого случая в мс
+# (минимум, медиана, среднее, максимум). С --compare результаты
+# сравниваются с прошлым файлом, замедление больше --threshold раз
+# считается регрессией (код возврата 1).
+#
+# Запуск из корня проекта:
+#     python benchmarks/run_benchmarks.py --size 1m [--repeat 5] [--only search]
+#     python benchmarks/run_benchmarks.py --size 10k --compare benchmarks/results/<файл>.json
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, ROOT)
+
+from datagen import fill, parse_size
+from database import MIGRATIONS, Database
+from utils.export_to_csv import export_to_csv_stream
+from utils.export_to_parquet import export_records_columnar
+
+DATA_DIR = os.path.join(BENCHMARKS_DIR, "data")
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+
+
+def prepare_database(rows, seed):
+    # Имя файла зависит и от версии схемы: после новой миграции данные
+    # создаются заново
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"records-{rows}-seed{seed}-v{len(MIGRATIONS)}.db")
+    if not os.path.exists(path):
+        print(f"Создание данных: {rows:,} записей...")
+        started = time.perf_counter()
+        partial = path + ".tmp"
+        if os.path.exists(partial):
+            os.remove(partial)
+        db = Database(partial, query_cache_size=0)
+        fill(db, rows, seed)
+        db.close()
+        os.replace(partial, path)
+        print(f"  готово за {time.perf_counter() - started:.1f} с")
+    return path
+
+
+def cases(db, tmp):
+    # Название -> функция без аргументов. Периоды и категории есть в данных
+    # datagen при любом размере
+    csv_path = os.path.join(tmp, "export.csv")
+    pdf_path = os.path.join(tmp, "report.pdf")
+    result = {
+        "add_record": lambda: db.add_record("Кафе", 450.0, "expense", "кофе"),
+        "get_records_page": lambda: db.get_records_page(0, 500),
+        "get_records_page (category)": lambda: db.get_records_page(0, 500, category_filter="Книги"),
+        "get_records_page (search year)": lambda: db.get_records_page(0, 500, search_term="2023"),
+        "get_records_page (search text)": lambda: db.get_records_page(0, 500, search_term="обед"),
+        "get_filtered_records (category + month)": lambda: db.get_filtered_records(
+            "Кафе", "2020-03-01", "2020-03-31"),
+        "get_filtered_records (month)": lambda: db.get_filtered_records(None, "2020-03-01", "2020-03-31"),
+        "get_records_by_period (week)": lambda: db.get_records_by_period("2021-06-01", "2021-06-07 23:59:59"),
+        "search_records (text)": lambda: db.search_records("кофе", limit=500),
+        "search_records (amount)": lambda: db.search_records("450"),
+        "search_records (date)": lambda: db.search_records("15.03.2020"),
+        "sum_by_category (year, rollups)": lambda: db.sum_by_category("2019-01-01", "2019-12-31"),
+        "sum_by_category (year, category filter)": lambda: db.sum_by_category(
+            "2019-01-01", "2019-12-31", category_filter="Еда"),
+        "sum_by_day (year)": lambda: db.sum_by_day("2019-01-01", "2019-12-31", "expense"),
+        "sum_by_month (all)": lambda: db.sum_by_month(),
+        "export_csv (year)": lambda: export_to_csv_stream(
+            db.iter_filtered_records(start_date="2019-01-01", end_date="2019-12-31"), csv_path),
+    }
+    if importlib.util.find_spec("pyarrow") is None:
+        print("pyarrow не установлен: export_parquet пропущен")
+    else:
+        parquet_dir = os.path.join(tmp, "parquet")
+        result["export_parquet (all)"] = lambda: export_records_columnar(db, parquet_dir, incremental=False)
+    try:
+        from utils.pdf_report import build_pdf_report
+    except ImportError:
+        print("reportlab не установлен: export_pdf пропущен")
+    else:
+        result["export_pdf (month)"] = lambda: build_pdf_report(
+            db.db_name, pdf_path, {"start_date": "2019-03-01", "end_date": "2019-03-31"})
+    return result
+
+
+def measure(func, repeat, warmup=1):
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "min_ms": min(timings),
+        "median_ms": statistics.median(timings),
+        "mean_ms": statistics.fmean(timings),
+        "max_ms": max(timings),
+        "repeat": repeat,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, previous_path, threshold):
+    # Печатает отношение медиан к прошлому запуску; возвращает число регрессий
+    with open(previous_path, encoding="utf-8") as file:
+        previous = json.load(file)
+    if previous["rows"] != results["rows"]:
+        print(f"Внимание: прошлый запуск был на {previous['rows']:,} записях")
+
+    regressions = 0
+    print(f"\nСравнение с {os.path.basename(previous_path)} (коммит {previous['commit']}):")
+    for name, current in results["cases"].items():
+        before = previous["cases"].get(name)
+        if before is None:
+            print(f"  {name:<42} новый случай")
+            continue
+        ratio = current["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+        mark = ""
+        if ratio > threshold:
+            mark = "  РЕГРЕССИЯ"
+            regressions += 1
+        elif ratio < 1 / threshold:
+            mark = "  быстрее"
+        print(f"  {name:<42} {before['median_ms']:>10.2f} -> {current['median_ms']:>10.2f} мс"
+              f"  ({ratio:.2f}x){mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки Database, экспорта и отчетов")
+    parser.add_argument("--size", type=parse_size, default=parse_size("1m"), help="10k, 1m, 10m или число строк")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", help="запускать только случаи, в названии которых есть эта строка")
+    parser.add_argument("--output", help="файл результатов (по умолчанию в benchmarks/results/)")
+    parser.add_argument("--compare", help="файл результатов прошлого запуска")
+    parser.add_argument("--threshold", type=float, default=1.2, help="замедление, считающееся регрессией")
+    args = parser.parse_args()
+
+    source = prepare_database(args.size, args.seed)
+    results = {
+        "commit": git_commit(),
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "rows": args.size,
+        "seed": args.seed,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cases": {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        shutil.copyfile(source, path)
+        db = Database(path, query_cache_size=0)
+        try:
+            for name, func in cases(db, tmp).items():
+                if args.only and args.only not in name:
+                    continue
+                results["cases"][name] = stats = measure(func, args.repeat)
+                print(f"{name:<42} {stats['median_ms']:>10.2f} мс (мин. {stats['min_ms']:.2f})")
+        finally:
+            db.close()
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{results['commit']}-{args.size}.json")
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
+    print(f"Результаты записаны в {output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# chart_window.py
+# Окно графика сумм по времени. Фигура и линия создаются один раз; при
+# смене периода или типа записей из базы заново читаются только суммы по
+# дням (итоговые таблицы), при смене шага — данные не читаются вовсе.
+# Новый ряд передается в существующую линию через set_data.
+from datetime import date, timedelta
+
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+from matplotlib.dates import AutoDateLocator, ConciseDateFormatter, date2num
+from matplotlib.figure import Figure
+from PyQt5.QtWidgets import QComboBox, QHBoxLayout, QLabel, QMainWindow, QMessageBox, QVBoxLayout, QWidget
+
+from utils.charts import bucket_totals, lttb
+
+PERIODS = {
+    "Все время": None,
+    "Последние 5 лет": 5 * 365,
+    "Последний год": 365,
+    "Последние 3 месяца": 91,
+    "Последний месяц": 30,
+}
+RECORD_TYPES = {"Расходы": "expense", "Доходы": "income", "Все записи": None}
+RESOLUTIONS = {"Авто": "auto", "По дням": "day", "По неделям": "week", "По месяцам": "month"}
+RESOLUTION_TITLES = {"day": "по дням", "week": "по неделям", "month": "по месяцам"}
+
+# Маркеры точек рисуются только на коротких рядах
+MARKER_POINTS = 60
+MIN_POINTS = 100
+
+
+class LineChartWindow(QMainWindow):
+    def __init__(self, db, worker, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.worker = worker
+        self.day_totals = []
+        self.setWindowTitle("График расходов по времени")
+        self.resize(800, 600)
+
+        controls = QHBoxLayout()
+        self.period_selector = self._add_selector(controls, "Период:", PERIODS, self.reload)
+        self.type_selector = self._add_selector(controls, "Записи:", RECORD_TYPES, self.reload)
+        self.resolution_selector = self._add_selector(controls, "Шаг:", RESOLUTIONS, self.redraw)
+        controls.addStretch()
+
+        self.figure = Figure()
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        self.axes = self.figure.add_subplot(111)
+        self.line, = self.axes.plot([], [])
+        locator = AutoDateLocator()
+        self.axes.xaxis.set_major_locator(locator)
+        self.axes.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+        self.axes.set_xlabel("Дата")
+        self.axes.set_ylabel("Сумма")
+        self.axes.grid(True)
+
+        layout = QVBoxLayout()
+        layout.addLayout(controls)
+        layout.addWidget(self.canvas)
+        widget = QWidget()
+        widget.setLayout(layout)
+        self.setCentralWidget(widget)
+
+    def _add_selector(self, layout, label, items, slot):
+        selector = QComboBox(self)
+        selector.addItems(items)
+        selector.currentIndexChanged.connect(lambda index: slot())
+        layout.addWidget(QLabel(label))
+        layout.addWidget(selector)
+        return selector
+
+    def reload(self):
+        # Суммы по дням читаются в фоне; повторный вызов отменяет предыдущий
+        days = PERIODS[self.period_selector.currentText()]
+        start_date = (date.today() - timedelta(days=days)).isoformat() if days else None
+        self.worker.submit(
+            "line_chart", self.db.sum_by_day,
+            kwargs={"start_date": start_date, "record_type": RECORD_TYPES[self.type_selector.currentText()]},
+            on_result=self.set_day_totals, on_error=self.show_error,
+        )
+
+    def set_day_totals(self, day_totals):
+        self.day_totals = day_totals
+        self.redraw()
+
+    def redraw(self):
+        resolution, series = bucket_totals(self.day_totals, RESOLUTIONS[self.resolution_selector.currentText()])
+        # Точек не больше, чем пар пикселей по ширине графика
+        points = list(zip(date2num([day for day, _ in series]), [amount for _, amount in series]))
+        points = lttb(points, max(MIN_POINTS, self.canvas.width() // 2))
+
+        self.line.set_data([x for x, _ in points], [y for _, y in points])
+        self.line.set_marker("o" if len(points) <= MARKER_POINTS else "")
+        if points:
+            self.axes.relim()
+            self.axes.autoscale_view()
+            self.axes.set_title(f"{self.type_selector.currentText()} {RESOLUTION_TITLES[resolution]}")
+        else:
+            self.axes.set_title("Нет данных за период")
+        self.canvas.draw_idle()
+
+    def show_error(self, message):
+        QMessageBox.warning(self, "Ошибка", f"Ошибка при работе с базой данных: {message}")
@@ -0,0 +1,350 @@
+# cli.py
+# Командная строка для работы с базой без графического интерфейса
+# (cron, контейнеры). PyQt5 не импортируется.
+#
+# Запуск из корня проекта:
+#     python -m cli add Кафе 350 [--type expense] [--notes "обед"]
+#     python -m cli import выписка1.csv выписка2.ofx [--jobs 4]
+#     python -m cli export csv records.csv.gz [--start 2024-01-01] [--category Кафе]
+#     python -m cli export pdf report.pdf [--start 2024-01-01 --end 2024-01-31]
+#     python -m cli export parquet exports/records [--full]
+#     python -m cli report --period month [--type expense] [--csv report.csv]
+#     python -m cli statements --by quarter [--start 2015-01-01] [--jobs 4] [--json statements.json]
+#     python -m cli run-recurring [--date 2024-02-01]
+#
+# Путь к базе задается параметром --db (по умолчанию finance.db).
+import argparse
+import csv
+import json
+import math
+import multiprocessing
+import sys
+import time
+from datetime import date, datetime, timedelta
+from itertools import islice
+from queue import Empty
+
+from database import MAX_AMOUNT, Database
+from utils import importer
+from utils.batch_report import STEPS, build_batch_report
+from utils.export_to_csv import export_to_csv_stream
+from utils.scheduler import RegularExpenseScheduler
+
+PERIOD_DAYS = {"day": 0, "week": 7, "month": 30, "year": 365}
+
+
+def _date(value):
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидается дата в формате ГГГГ-ММ-ДД: {value}")
+    return value
+
+
+def _amount(value):
+    # float() принимает "nan" и "inf"; как и в API, сумма ограничена MAX_AMOUNT
+    try:
+        amount = float(value)
+    except ValueError:
+        amount = None
+    if amount is None or not math.isfinite(amount) or abs(amount) > MAX_AMOUNT:
+        raise argparse.ArgumentTypeError(f"недопустимая сумма: {value}")
+    return amount
+
+
+def _add_filter_arguments(parser):
+    parser.add_argument("--start", type=_date, help="начало периода, ГГГГ-ММ-ДД")
+    parser.add_argument("--end", type=_date, help="конец периода включительно, ГГГГ-ММ-ДД")
+    parser.add_argument("--category", help="только эта категория")
+    parser.add_argument("--type", choices=["expense", "income"], help="только доходы или расходы")
+    parser.add_argument("--search", help="поиск по названию категории, примечанию, сумме или дате")
+
+
+def _filters(args):
+    filters = {
+        "start_date": args.start,
+        "end_date": args.end,
+        "category_filter": args.category,
+        "record_type": args.type,
+        "search_term": args.search,
+    }
+    return {key: value for key, value in filters.items() if value}
+
+
+def add_command(db, args):
+    record = db.add_record(args.category, args.amount, args.type, args.notes)
+    print(f"Добавлена запись {record[0]}: {args.category} {args.amount:.2f} ({args.type})")
+    return 0
+
+
+def _print_import_stats(path, stats):
+    print(f"{path}: добавлено {stats['inserted']:,}, дубликатов {stats['duplicates']:,}, "
+          f"ошибок {stats['errors']:,} за {stats['seconds']:.1f} с")
+
+
+def import_command(db, args):
+    if args.jobs <= 1 or len(args.files) == 1:
+        for path in args.files:
+            stats = importer.import_file(db, path, args.format, default_type=args.default_type,
+                                         batch_size=args.batch_size)
+            _print_import_stats(path, stats)
+        return 0
+    return _import_parallel(db, args)
+
+
+def _read_file(queue, path, file_format, default_type, batch_size):
+    # Выполняется в рабочем процессе: разбор файла и хеширование строк.
+    # Пачки передаются в основной процесс, который один пишет в базу
+    try:
+        stats = {"read": 0, "errors": 0}
+        records = importer.read_records(path, file_format, default_type=default_type, stats=stats)
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            stats["read"] += len(batch)
+            queue.put(("batch", path, batch))
+        queue.put(("done", path, stats))
+    except Exception as error:
+        queue.put(("error", path, f"{type(error).__name__}: {error}"))
+
+
+def _import_parallel(db, args):
+    # Файлы разбираются в args.jobs процессах параллельно. Запись идет из
+    # одного процесса, каждая пачка фиксируется отдельной транзакцией, поэтому
+    # GUI и другие читатели видят данные по мере загрузки. Очередь
+    # ограничена, чтобы разбор не обгонял запись и не занимал лишнюю память
+    queue = multiprocessing.Queue(maxsize=args.jobs * 2)
+    started = time.perf_counter()
+    results = {path: {"inserted": 0, "started": started} for path in args.files}
+    waiting = list(args.files)
+    running = {}
+
+    failed = 0
+    try:
+        while waiting or running:
+            while waiting and len(running) < args.jobs:
+                path = waiting.pop(0)
+                process = multiprocessing.Process(
+                    target=_read_file, args=(queue, path, args.format, args.default_type, args.batch_size),
+                    daemon=True)
+                process.start()
+                running[path] = process
+                results[path]["started"] = time.perf_counter()
+
+            try:
+                kind, path, payload = queue.get(timeout=1)
+            except Empty:
+                # Процесс, убитый системой (например, при нехватке памяти), уже
+                # ничего не пришлет: без этой проверки импорт ждал бы вечно
+                for path, process in list(running.items()):
+                    if process.exitcode:
+                        del running[path]
+                        failed += 1
+                        print(f"{path}: ошибка: процесс разбора завершился с кодом {process.exitcode}",
+                              file=sys.stderr)
+                continue
+
+            if path not in running:
+                continue
+            if kind == "batch":
+                results[path]["inserted"] += db.add_imported_records(payload, args.batch_size)
+                continue
+
+            running.pop(path).join()
+            if kind == "error":
+                failed += 1
+                print(f"{path}: ошибка: {payload}", file=sys.stderr)
+                continue
+            stats = dict(payload, inserted=results[path]["inserted"],
+                         seconds=time.perf_counter() - results[path]["started"])
+            stats["duplicates"] = stats["read"] - stats["inserted"]
+            _print_import_stats(path, stats)
+    finally:
+        for process in running.values():
+            process.terminate()
+            process.join()
+
+    inserted = sum(result["inserted"] for result in results.values())
+    print(f"Всего добавлено {inserted:,} записей за {time.perf_counter() - started:.1f} с")
+    return 1 if failed else 0
+
+
+def export_command(db, args):
+    filters = _filters(args)
+    if args.format in ("parquet", "arrow"):
+        # Столбцовая выгрузка всегда идет от отметки последнего экспорта,
+        # поэтому фильтры к ней не применяются
+        if filters:
+            print("Фильтры не поддерживаются для parquet и arrow", file=sys.stderr)
+            return 2
+        from utils.export_to_parquet import export_records_columnar
+        count = export_records_columnar(db, args.output, args.format, incremental=not args.full)
+        print(f"Выгружено новых записей: {count:,} в {args.output}")
+        return 0
+    if args.format == "csv":
+        count = export_to_csv_stream(db.iter_filtered_records(**filters), args.output)
+    else:
+        # reportlab нужен только для PDF
+        from utils.pdf_report import build_pdf_report
+        count = build_pdf_report(db.db_name, args.output, filters)
+
+    if not count:
+        print("Нет данных для экспорта", file=sys.stderr)
+        return 1
+    print(f"Экспортировано {count:,} записей в {args.output}")
+    return 0
+
+
+def report_command(db, args):
+    # Суммы по категориям за период: --period отсчитывается от сегодняшнего
+    # дня так же, как в окне отчетов интерфейса, --start/--end задают его явно
+    start_date, end_date = args.start, args.end
+    if args.period:
+        today = date.today()
+        start_date = (today - timedelta(days=PERIOD_DAYS[args.period])).isoformat()
+        end_date = today.isoformat()
+
+    totals = db.sum_by_category(start_date, end_date, args.type, args.category, args.search)
+    if not totals:
+        print("Нет данных за выбранный период", file=sys.stderr)
+        return 1
+
+    total = sum(amount for _, amount in totals)
+    rows = [(category, f"{amount:.2f}", f"{amount / total * 100:.2f}%" if total else "—")
+            for category, amount in totals]
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["Категория", "Сумма", "Процент"])
+            writer.writerows(rows)
+        print(f"Отчет сохранен в {args.csv}")
+        return 0
+
+    print(f"Период: {start_date or '...'} — {end_date or '...'}")
+    width = max(len(category) for category, _, _ in rows)
+    for category, amount, share in rows:
+        print(f"{category:<{width}}  {amount:>14}  {share:>8}")
+    print(f"{'Итого':<{width}}  {total:>14.2f}")
+    return 0
+
+
+def statements_command(db, args):
+    # Выписки по месяцам, кварталам или годам; отрезки считаются в
+    # параллельных процессах (utils/batch_report.py)
+    report = build_batch_report(args.db, args.start, args.end, args.by, args.jobs)
+    if not report["periods"]:
+        print("Нет данных за выбранный период", file=sys.stderr)
+        return 1
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f"Отчет сохранен в {args.json}")
+        return 0
+
+    header = ["Период", "Доходы", "Расходы", "Баланс", "Записей", "Медиана расхода"]
+    rows = [(period["period"], f"{period['income']:.2f}", f"{period['expense']:.2f}", f"{period['balance']:.2f}",
+             str(period["records"]), f"{period['expense_median']:.2f}") for period in report["periods"]]
+    totals = report["totals"]
+    rows.append(("Итого", f"{totals['income']:.2f}", f"{totals['expense']:.2f}", f"{totals['balance']:.2f}",
+                 str(totals["records"]), ""))
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            writer.writerows(rows)
+        print(f"Отчет сохранен в {args.csv}")
+        return 0
+
+    print(f"{header[0]:<8}" + "".join(f"  {title:>15}" for title in header[1:]))
+    for row in rows:
+        print(f"{row[0]:<8}" + "".join(f"  {value:>15}" for value in row[1:]))
+    return 0
+
+
+def run_recurring_command(db, args):
+    # Проводит все наступившие регулярные расходы, включая пропущенные
+    today = datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else date.today()
+    scheduler = RegularExpenseScheduler(db)
+    posted = 0
+    while scheduler.has_due(today):
+        posted += scheduler.run_due(today)
+    print(f"Проведено платежей: {posted}")
+    next_date = scheduler.next_due_date()
+    if next_date is not None:
+        print(f"Следующий платеж: {next_date.isoformat()}")
+    return 0
+
+
+COMMANDS = {
+    "add": add_command,
+    "import": import_command,
+    "export": export_command,
+    "report": report_command,
+    "statements": statements_command,
+    "run-recurring": run_recurring_command,
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Учет личных финансов без интерфейса")
+    parser.add_argument("--db", default="finance.db", help="путь к файлу базы данных")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="добавить запись")
+    add.add_argument("category")
+    add.add_argument("amount", type=_amount)
+    add.add_argument("--type", choices=["expense", "income"], default="expense")
+    add.add_argument("--notes")
+
+    import_parser = commands.add_parser("import", help="импорт банковских выписок (CSV, OFX, QIF)")
+    import_parser.add_argument("files", nargs="+")
+    import_parser.add_argument("--format", choices=sorted(importer.READERS),
+                               help="формат файлов (по умолчанию по расширению)")
+    import_parser.add_argument("--default-type", choices=["expense", "income"], default="expense",
+                               help="тип для положительных сумм, если в файле нет столбца типа")
+    import_parser.add_argument("--jobs", type=int, default=1, help="сколько файлов разбирать параллельно")
+    import_parser.add_argument("--batch-size", type=int, default=10000)
+
+    export = commands.add_parser("export", help="экспорт записей в CSV, PDF, Parquet или Arrow")
+    export.add_argument("format", choices=["csv", "pdf", "parquet", "arrow"])
+    export.add_argument("output", help="файл; для CSV .gz и .zst включают сжатие; "
+                                       "для parquet и arrow — каталог с разбивкой по месяцам")
+    export.add_argument("--full", action="store_true",
+                        help="parquet/arrow: выгрузить все записи заново, а не только новые")
+    _add_filter_arguments(export)
+
+    report = commands.add_parser("report", help="суммы по категориям за период")
+    report.add_argument("--period", choices=sorted(PERIOD_DAYS), help="последний день, неделя, месяц или год")
+    report.add_argument("--csv", help="сохранить отчет в CSV вместо вывода на экран")
+    _add_filter_arguments(report)
+
+    statements = commands.add_parser("statements", help="выписки по месяцам, кварталам или годам")
+    statements.add_argument("--by", choices=STEPS, default="month", help="длина отрезка")
+    statements.add_argument("--start", type=_date, help="начало периода (по умолчанию первая запись)")
+    statements.add_argument("--end", type=_date, help="конец периода (по умолчанию последняя запись)")
+    statements.add_argument("--jobs", type=int, help="число процессов (по умолчанию по числу ядер)")
+    output = statements.add_mutually_exclusive_group()
+    output.add_argument("--csv", help="сохранить итоги по отрезкам в CSV")
+    output.add_argument("--json", help="сохранить весь отчет в JSON")
+
+    recurring = commands.add_parser("run-recurring", help="провести наступившие регулярные расходы")
+    recurring.add_argument("--date", type=_date, help="считать сегодняшней эту дату")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # Кэш запросов не нужен: каждая команда читает данные один раз
+    db = Database(args.db, wal=True, query_cache_size=0)
+    try:
+        return COMMANDS[args.command](db, args)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,170 +1,1544 @@
 # database.py
+import queue
+import re
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
 
+from utils import profiling
+
+
+def _migrate_base_schema(cursor):
+    # Создаем таблицы записей, категорий и регулярных расходов
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category TEXT NOT NULL,
+            amount REAL NOT NULL,
+            date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            type TEXT DEFAULT 'expense'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS regular_expenses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category TEXT NOT NULL,
+            amount REAL NOT NULL,
+            interval TEXT NOT NULL, -- daily, weekly, monthly
+            next_payment_date DATE NOT NULL
+        )
+    ''')
+
+    # В старых базах таблица records создавалась без столбца 'type'
+    cursor.execute("PRAGMA table_info(records)")
+    columns = [column[1] for column in cursor.fetchall()]
+    if 'type' not in columns:
+        cursor.execute("ALTER TABLE records ADD COLUMN type TEXT DEFAULT 'expense'")
+
+
+def _migrate_indexes(cursor):
+    # Индексы под фильтры по дате, категории и типу и под поиск платежей к оплате
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_records_date ON records (date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_records_category_date ON records (category, date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_records_type_date ON records (type, date)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_regular_expenses_next_payment_date "
+        "ON regular_expenses (next_payment_date)"
+    )
+
+
+def _migrate_rollups(cursor):
+    # Предварительно посчитанные суммы по дню и по месяцу для каждой пары
+    # (категория, тип). Поддерживаются методами записи Database
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_totals (
+            day TEXT NOT NULL,
+            category TEXT NOT NULL,
+            type TEXT NOT NULL,
+            total REAL NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (day, category, type)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS monthly_totals (
+            month TEXT NOT NULL,
+            category TEXT NOT NULL,
+            type TEXT NOT NULL,
+            total REAL NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (month, category, type)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        INSERT INTO daily_totals (day, category, type, total, count)
+        SELECT date(date), category, IFNULL(type, ''), SUM(amount), COUNT(*)
+        FROM records
+        GROUP BY 1, 2, 3
+    ''')
+    cursor.execute('''
+        INSERT INTO monthly_totals (month, category, type, total, count)
+        SELECT substr(day, 1, 7), category, type, SUM(total), SUM(count)
+        FROM daily_totals
+        GROUP BY 1, 2, 3
+    ''')
+
+
+def _migrate_import_hash(cursor):
+    # Хеш содержимого строки выписки, по которому повторный импорт
+    # того же файла не создает дубликатов
+    cursor.execute("ALTER TABLE records ADD COLUMN import_hash TEXT")
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_records_import_hash "
+        "ON records (import_hash) WHERE import_hash IS NOT NULL"
+    )
+
+
+def _migrate_full_text_search(cursor):
+    # Полнотекстовый индекс FTS5 по категории и примечанию. Таблица хранит
+    # только индекс (content='records') и, как итоговые суммы, обновляется
+    # методами записи Database
+    cursor.execute("ALTER TABLE records ADD COLUMN notes TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_records_amount ON records (amount)")
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(
+            category, notes,
+            content='records', content_rowid='id',
+            tokenize='unicode61', prefix='2 3'
+        )
+    ''')
+    cursor.execute("INSERT INTO records_fts (records_fts) VALUES ('rebuild')")
+
+
+def _rebuild_table(cursor, table, create_sql, columns, select_columns):
+    # SQLite не умеет менять тип столбца: создаем новую таблицу, копируем
+    # строки с теми же id и подменяем ею старую. Счетчик AUTOINCREMENT
+    # переносится, чтобы id удаленных строк не выдавались повторно
+    cursor.execute(f"SELECT seq FROM sqlite_sequence WHERE name = '{table}'")
+    sequence = cursor.fetchone()
+    cursor.execute(create_sql.format(table=f"{table}_new"))
+    cursor.execute(f"INSERT INTO {table}_new ({columns}) SELECT {select_columns} FROM {table}")
+    cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    if sequence is not None:
+        cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence[0], table))
+
+
+def _migrate_integer_amounts(cursor):
+    # Суммы хранятся в копейках (INTEGER): сложение целых чисел точное и не
+    # накапливает ошибку округления REAL на миллионах строк
+    _rebuild_table(cursor, "records", '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category TEXT NOT NULL,
+            amount_cents INTEGER NOT NULL,
+            date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            type TEXT DEFAULT 'expense',
+            import_hash TEXT,
+            notes TEXT
+        )
+    ''', "id, category, amount_cents, date, type, import_hash, notes",
+        "id, category, CAST(ROUND(amount * 100) AS INTEGER), date, type, import_hash, notes")
+    cursor.execute("CREATE INDEX idx_records_date ON records (date)")
+    cursor.execute("CREATE INDEX idx_records_category_date ON records (category, date)")
+    cursor.execute("CREATE INDEX idx_records_type_date ON records (type, date)")
+    cursor.execute("CREATE INDEX idx_records_amount_cents ON records (amount_cents)")
+    cursor.execute(
+        "CREATE UNIQUE INDEX idx_records_import_hash "
+        "ON records (import_hash) WHERE import_hash IS NOT NULL"
+    )
+
+    _rebuild_table(cursor, "regular_expenses", '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category TEXT NOT NULL,
+            amount_cents INTEGER NOT NULL,
+            interval TEXT NOT NULL, -- daily, weekly, monthly
+            next_payment_date DATE NOT NULL
+        )
+    ''', "id, category, amount_cents, interval, next_payment_date",
+        "id, category, CAST(ROUND(amount * 100) AS INTEGER), interval, next_payment_date")
+    cursor.execute(
+        "CREATE INDEX idx_regular_expenses_next_payment_date "
+        "ON regular_expenses (next_payment_date)"
+    )
+
+    for table, column in (("daily_totals", "day"), ("monthly_totals", "month")):
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f'''
+            CREATE TABLE {table} (
+                {column} TEXT NOT NULL,
+                category TEXT NOT NULL,
+                type TEXT NOT NULL,
+                total_cents INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY ({column}, category, type)
+            ) WITHOUT ROWID
+        ''')
+    cursor.execute('''
+        INSERT INTO daily_totals (day, category, type, total_cents, count)
+        SELECT date(date), category, IFNULL(type, ''), SUM(amount_cents), COUNT(*)
+        FROM records
+        GROUP BY 1, 2, 3
+    ''')
+    cursor.execute('''
+        INSERT INTO monthly_totals (month, category, type, total_cents, count)
+        SELECT substr(day, 1, 7), category, type, SUM(total_cents), SUM(count)
+        FROM daily_totals
+        GROUP BY 1, 2, 3
+    ''')
+
+
+def _migrate_category_ids(cursor):
+    # Записи и регулярные расходы ссылаются на categories.id вместо хранения
+    # названия: список категорий читается из маленькой таблицы, а
+    # переименование категории меняет одну строку
+    cursor.execute("INSERT OR IGNORE INTO categories (name) SELECT DISTINCT category FROM records")
+    cursor.execute("INSERT OR IGNORE INTO categories (name) SELECT DISTINCT category FROM regular_expenses")
+    category_id = "(SELECT id FROM categories WHERE name = category)"
+
+    _rebuild_table(cursor, "records", '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category_id INTEGER NOT NULL REFERENCES categories (id),
+            amount_cents INTEGER NOT NULL,
+            date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            type TEXT DEFAULT 'expense',
+            import_hash TEXT,
+            notes TEXT
+        )
+    ''', "id, category_id, amount_cents, date, type, import_hash, notes",
+        f"id, {category_id}, amount_cents, date, type, import_hash, notes")
+    cursor.execute("CREATE INDEX idx_records_date ON records (date)")
+    cursor.execute("CREATE INDEX idx_records_category_date ON records (category_id, date)")
+    cursor.execute("CREATE INDEX idx_records_type_date ON records (type, date)")
+    cursor.execute("CREATE INDEX idx_records_amount_cents ON records (amount_cents)")
+    cursor.execute(
+        "CREATE UNIQUE INDEX idx_records_import_hash "
+        "ON records (import_hash) WHERE import_hash IS NOT NULL"
+    )
+
+    _rebuild_table(cursor, "regular_expenses", '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category_id INTEGER NOT NULL REFERENCES categories (id),
+            amount_cents INTEGER NOT NULL,
+            interval TEXT NOT NULL, -- daily, weekly, monthly
+            next_payment_date DATE NOT NULL
+        )
+    ''', "id, category_id, amount_cents, interval, next_payment_date",
+        f"id, {category_id}, amount_cents, interval, next_payment_date")
+    cursor.execute(
+        "CREATE INDEX idx_regular_expenses_next_payment_date "
+        "ON regular_expenses (next_payment_date)"
+    )
+
+    for table, column in (("daily_totals", "day"), ("monthly_totals", "month")):
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f'''
+            CREATE TABLE {table} (
+                {column} TEXT NOT NULL,
+                category_id INTEGER NOT NULL,
+                type TEXT NOT NULL,
+                total_cents INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY ({column}, category_id, type)
+            ) WITHOUT ROWID
+        ''')
+    _fill_rollups(cursor)
+
+    # Названия категорий ищутся в отдельном маленьком индексе, а в
+    # records_fts остаются только примечания (строки без примечаний в него
+    # не попадают)
+    cursor.execute("DROP TABLE records_fts")
+    cursor.execute('''
+        CREATE VIRTUAL TABLE records_fts USING fts5(
+            notes,
+            content='records', content_rowid='id',
+            tokenize='unicode61', prefix='2 3'
+        )
+    ''')
+    cursor.execute('''
+        CREATE VIRTUAL TABLE categories_fts USING fts5(
+            name,
+            content='categories', content_rowid='id',
+            tokenize='unicode61', prefix='2 3'
+        )
+    ''')
+    _fill_search_index(cursor)
+
+
+def _migrate_regular_expense_anchor(cursor):
+    # День первого платежа: даты платежей считаются от него, а не от
+    # предыдущей даты, которая после короткого месяца «съезжает»
+    # (31 января -> 29 февраля -> 29 марта). Для существующих расходов
+    # исходный день неизвестен, за него берется дата следующего платежа
+    cursor.execute("ALTER TABLE regular_expenses ADD COLUMN anchor_date DATE")
+    cursor.execute("UPDATE regular_expenses SET anchor_date = next_payment_date")
+
+
+# Тип записи, который сохранял прежний интерфейс, -> тип в базе
+LEGACY_TYPES = {"расход": "expense", "Расход": "expense", "доход": "income", "Доход": "income"}
+
+
+def _migrate_legacy_types(cursor):
+    # Записи старого интерфейса с типом "расход" или "доход" не попадали в
+    # фильтры по типу, итоги и графики. Итоговые таблицы хранят суммы по
+    # типу, поэтому после замены пересчитываются
+    changed = 0
+    for legacy_type, record_type in LEGACY_TYPES.items():
+        cursor.execute("UPDATE records SET type = ? WHERE type = ?", (record_type, legacy_type))
+        changed += cursor.rowcount
+    if changed:
+        _fill_rollups(cursor)
+
+
+def _migrate_regular_expense_dates(cursor):
+    # Старый интерфейс мог сохранить дату без ведущих нулей ("2024-1-5").
+    # Планировщик ее разбирает, но сравнение строк в advance_regular_expense
+    # и get_due_regular_expenses с такой датой не срабатывает
+    rows = cursor.execute("SELECT id, next_payment_date, anchor_date FROM regular_expenses").fetchall()
+    for expense_id, *dates in rows:
+        normalized = []
+        for value in dates:
+            try:
+                value = datetime.strptime(value, "%Y-%m-%d").date().isoformat()
+            except (TypeError, ValueError):
+                pass
+            normalized.append(value)
+        if normalized != dates:
+            cursor.execute("UPDATE regular_expenses SET next_payment_date = ?, anchor_date = ? WHERE id = ?",
+                           (*normalized, expense_id))
+
+
+def _fill_rollups(cursor):
+    cursor.execute("DELETE FROM daily_totals")
+    cursor.execute("DELETE FROM monthly_totals")
+    cursor.execute('''
+        INSERT INTO daily_totals (day, category_id, type, total_cents, count)
+        SELECT date(date), category_id, IFNULL(type, ''), SUM(amount_cents), COUNT(*)
+        FROM records
+        GROUP BY 1, 2, 3
+    ''')
+    cursor.execute('''
+        INSERT INTO monthly_totals (month, category_id, type, total_cents, count)
+        SELECT substr(day, 1, 7), category_id, type, SUM(total_cents), SUM(count)
+        FROM daily_totals
+        GROUP BY 1, 2, 3
+    ''')
+
+
+def _fill_search_index(cursor):
+    cursor.execute("INSERT INTO records_fts (records_fts) VALUES ('delete-all')")
+    cursor.execute("INSERT INTO records_fts (rowid, notes) SELECT id, notes FROM records WHERE notes IS NOT NULL")
+    cursor.execute("INSERT INTO categories_fts (categories_fts) VALUES ('rebuild')")
+
+
+# Миграции схемы по порядку: номер версии базы (PRAGMA user_version)
+# равен количеству уже примененных миграций. Новые миграции добавляются
+# только в конец списка.
+MIGRATIONS = [
+    _migrate_base_schema,
+    _migrate_indexes,
+    _migrate_rollups,
+    _migrate_import_hash,
+    _migrate_full_text_search,
+    _migrate_integer_amounts,
+    _migrate_category_ids,
+    _migrate_regular_expense_anchor,
+    _migrate_legacy_types,
+    _migrate_regular_expense_dates,
+]
+
+# Записи вместе с названием категории. Столбцы идут в прежнем порядке,
+# сумма возвращается в рублях
+RECORDS_SOURCE = "records JOIN categories ON categories.id = records.category_id"
+RECORD_COLUMNS = ("records.id, categories.name AS category, records.amount_cents / 100.0 AS amount, "
+                  "records.date, records.type, records.import_hash, records.notes")
+REGULAR_EXPENSES_SOURCE = "regular_expenses JOIN categories ON categories.id = regular_expenses.category_id"
+REGULAR_EXPENSE_COLUMNS = ("regular_expenses.id, categories.name AS category, amount_cents / 100.0 AS amount, "
+                           "interval, next_payment_date, anchor_date")
+
+
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+TEMP_STORE_MODES = ("DEFAULT", "FILE", "MEMORY")
+
+
+def _build_pragmas(synchronous=None, cache_size=None, mmap_size=None, temp_store=None):
+    # Проверяем значения и собираем PRAGMA-команды для каждого соединения
+    pragmas = []
+    if synchronous is not None:
+        synchronous = str(synchronous).upper()
+        if synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Недопустимое значение synchronous: {synchronous}")
+        pragmas.append(f"PRAGMA synchronous = {synchronous}")
+    if cache_size is not None:
+        pragmas.append(f"PRAGMA cache_size = {int(cache_size)}")
+    if mmap_size is not None:
+        pragmas.append(f"PRAGMA mmap_size = {int(mmap_size)}")
+    if temp_store is not None:
+        temp_store = str(temp_store).upper()
+        if temp_store not in TEMP_STORE_MODES:
+            raise ValueError(f"Недопустимое значение temp_store: {temp_store}")
+        pragmas.append(f"PRAGMA temp_store = {temp_store}")
+    return pragmas
+
+
+class ConnectionPool:
+    # Соединения только для чтения. Запрос берет свободное соединение через
+    # acquire и возвращает через release, поэтому соединения не привязаны к
+    # потокам и переходят от одного потока пула к другому. Свободными
+    # хранятся не больше max_size соединений: если одновременно читают
+    # больше потоков, лишние соединения открываются на время запроса и
+    # закрываются при возврате. Все изменения идут через одно
+    # соединение-писатель в Database
+    def __init__(self, db_name, pragmas=(), timeout=5.0, max_size=4):
+        self.db_name = db_name
+        self.pragmas = list(pragmas)
+        self.timeout = timeout
+        self.max_size = max_size
+        self._idle = queue.LifoQueue(maxsize=max_size)
+        self._closed = False
+
+    def _connect(self):
+        connection = sqlite3.connect(self.db_name, timeout=self.timeout, check_same_thread=False)
+        for pragma in self.pragmas:
+            connection.execute(pragma)
+        connection.execute("PRAGMA query_only = ON")
+        return connection
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def release(self, connection):
+        if self._closed:
+            connection.close()
+            return
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def close_all(self):
+        # Соединения, занятые в момент закрытия, закрываются при возврате
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_QUERY_TABLES = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_]\w*)", re.IGNORECASE)
+_WRITTEN_TABLE = re.compile(
+    r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+(\w+)",
+    re.IGNORECASE,
+)
+
+
+@lru_cache(maxsize=1024)
+def _query_tables(query):
+    # Запрос без лишних пробелов (ключ кэша) и таблицы, из которых он читает
+    normalized = " ".join(query.split())
+    return normalized, tuple(sorted({table.lower() for table in _QUERY_TABLES.findall(normalized)}))
+
+
+class QueryCache:
+    # Результаты запросов на чтение. Ключ — текст запроса и параметры.
+    # У каждой таблицы есть номер поколения, который увеличивается после
+    # каждого изменения таблицы; запись кэша действительна, пока поколения
+    # ее таблиц не изменились и не истек ttl секунд. Изменения из других
+    # процессов Database замечает по PRAGMA data_version и очищает кэш
+    # целиком. Результаты длиннее max_rows строк не кэшируются
+    def __init__(self, max_entries=256, ttl=30.0, max_rows=10000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._generations = {}
+        # Номер очистки входит в поколения: результат, прочитанный до
+        # clear, не попадет в кэш после нее
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def _current(self, tables):
+        return (self._epoch,) + tuple(self._generations.get(table, 0) for table in tables)
+
+    def generations(self, tables):
+        with self._lock:
+            return self._current(tables)
+
+    def get(self, key, tables):
+        # Возвращает (True, результат) или (False, None)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                result, generations, expires = entry
+                if expires > time.monotonic() and generations == self._current(tables):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, result
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, generations, result):
+        if isinstance(result, list):
+            if len(result) > self.max_rows:
+                return
+            result = tuple(result)
+        with self._lock:
+            self._entries[key] = (result, generations, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tables):
+        # Старые записи не удаляются сразу: они не пройдут проверку поколений
+        # и будут вытеснены при обращении или по размеру
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self._epoch += 1
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+# Больше не помещается в копейках в INTEGER SQLite
+MAX_AMOUNT = 10 ** 15
+
+
+def to_cents(amount):
+    # Рубли (float, int или строка) -> целое число копеек
+    return int(round(float(amount) * 100))
+
+
+def _current_timestamp():
+    # Тот же формат и часовой пояс (UTC), что у CURRENT_TIMESTAMP в SQLite
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _split_by_months(start_date=None, end_date=None):
+    # Делит период на целые месяцы (читаются из monthly_totals) и неполные
+    # месяцы по краям (читаются по дням из daily_totals)
+    start = date.fromisoformat(start_date) if start_date else date(1, 1, 1)
+    end = date.fromisoformat(end_date) if end_date else date(9999, 12, 31)
+
+    first_month = start if start.day == 1 else (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    if end.month == 12:
+        last_month = end.replace(day=1) if end.day == 31 else None
+    else:
+        next_month = end.replace(day=1, month=end.month + 1)
+        last_month = end.replace(day=1) if end == next_month - timedelta(days=1) else None
+    if last_month is None:
+        last_month = (end.replace(day=1) - timedelta(days=1)).replace(day=1)
+
+    if first_month > last_month:
+        return [(start.isoformat(), end.isoformat())], None
+
+    day_ranges = []
+    if start < first_month:
+        day_ranges.append((start.isoformat(), (first_month - timedelta(days=1)).isoformat()))
+    if last_month < end.replace(day=1):
+        day_ranges.append((end.replace(day=1).isoformat(), end.isoformat()))
+    return day_ranges, (first_month.isoformat()[:7], last_month.isoformat()[:7])
+
+
+# До скольких совпадений поиск по сумме или дате считается избирательным:
+# тогда выгоднее пройти по индексу и отсортировать, чем идти по id
+SELECTIVE_SEARCH_ROWS = 20000
+
+_AMOUNT_TERM = re.compile(r"^\d[\d ]*(?:[.,](\d{1,2}))?$")
+_DATE_TERMS = [
+    (re.compile(r"^(\d{4})$"), "year"),
+    (re.compile(r"^(\d{4})-(\d{2})$"), "month"),
+    (re.compile(r"^(\d{2})\.(\d{4})$"), "month_reversed"),
+    (re.compile(r"^(\d{4})-(\d{2})-(\d{2})$"), "day"),
+    (re.compile(r"^(\d{2})\.(\d{2})\.(\d{4})$"), "day_reversed"),
+]
+
+
+def _search_date_range(term):
+    # Дата или ее часть -> полуинтервал [начало, конец)
+    for pattern, kind in _DATE_TERMS:
+        match = pattern.match(term)
+        if not match:
+            continue
+        groups = [int(group) for group in match.groups()]
+        try:
+            if kind == "year":
+                start = date(groups[0], 1, 1)
+                end = date(groups[0] + 1, 1, 1)
+            elif kind in ("month", "month_reversed"):
+                year, month = groups if kind == "month" else groups[::-1]
+                start = date(year, month, 1)
+                end = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+            else:
+                year, month, day = groups if kind == "day" else groups[::-1]
+                start = date(year, month, day)
+                end = start + timedelta(days=1)
+        except ValueError:
+            return None
+        return start.isoformat(), end.isoformat()
+    return None
+
+
+def _search_ranges(term):
+    # Условия (столбец, запрос, параметры) для числа — диапазон сумм — и для
+    # даты — диапазон дат; у каждого условия свой индекс. Пустой список —
+    # термин ищется как текст
+    ranges = []
+    match = _AMOUNT_TERM.match(term)
+    if match:
+        # "1500" находит суммы от 1500.00 до 1500.99, "1500,5" — ровно 1500.50
+        cents = to_cents(term.replace(" ", "").replace(",", "."))
+        ranges.append(("amount_cents", "amount_cents >= ? AND amount_cents < ?",
+                       [cents, cents + 1] if match.group(1) else [cents, cents + 100]))
+
+    date_range = _search_date_range(term)
+    if date_range:
+        ranges.append(("date", "date >= ? AND date < ?", list(date_range)))
+    return ranges
+
+
+def _period_within(date_range, start_date=None, end_date=None):
+    # Полуинтервал дат поиска [начало, конец) как границы периода
+    # (первый день, последний день), суженные периодом фильтра
+    start, end = date_range
+    last_day = (date.fromisoformat(end) - timedelta(days=1)).isoformat()
+    if start_date and start_date > start:
+        start = start_date
+    if end_date and end_date[:10] <= last_day:
+        last_day = end_date
+    return start, last_day
+
+
+def _build_search_filter(search_term):
+    # Числа ищутся по диапазону сумм, даты — по диапазону дат (оба столбца
+    # проиндексированы), и любой термин — еще и префиксным поиском по
+    # FTS-индексам: "1500" может быть частью примечания. Возвращает условия
+    # диапазонов, их параметры и запрос FTS
+    term = search_term.strip()
+    ranges = _search_ranges(term)
+    conditions = [f"({condition})" for _, condition, _ in ranges]
+    params = [param for _, _, range_params in ranges for param in range_params]
+    return conditions, params, _fts_query(term)
+
+
+def _fts_query(term):
+    # Каждое слово ищется как префикс: "каф" найдет "Кафе"
+    words = re.findall(r"\w+", term)
+    return " ".join(f'"{word}"*' for word in words) or '""'
+
+
+@profiling.instrument("call", exclude=("transaction",))
 class Database:
-    def __init__(self, db_name="finance.db"):
-        self.connection = sqlite3.connect(db_name)
+    def __init__(self, db_name="finance.db", wal=False, synchronous=None, cache_size=None,
+                 mmap_size=None, temp_store=None, timeout=5.0, query_cache_size=256, query_cache_ttl=30.0,
+                 read_only=False, read_connections=4):
+        self.db_name = db_name
+        self.read_only = read_only
+        pragmas = _build_pragmas(synchronous, cache_size, mmap_size, temp_store)
+
+        # Единственное соединение для записи; доступ к нему защищен блокировкой.
+        # read_only=True открывает файл в режиме ro (например, в процессах
+        # пакетного отчета): запись и миграции при этом недоступны
+        if read_only:
+            uri = f"{Path(db_name).resolve().as_uri()}?mode=ro"
+            self.connection = sqlite3.connect(uri, uri=True, timeout=timeout, check_same_thread=False)
+        else:
+            self.connection = sqlite3.connect(db_name, timeout=timeout, check_same_thread=False)
         self.cursor = self.connection.cursor()
-        self.create_table()
-        self.create_regular_expenses_table()
-        # Вызовите этот метод в конструкторе `Database`
-        self.create_table_categories()
-        self.update_records_table()  # Обновление структуры таблицы
-
-
-    def create_table(self):
-        # Создаем таблицу для записей
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                category TEXT NOT NULL,
-                amount REAL NOT NULL,
-                date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        self._write_lock = threading.RLock()
+        self._transaction_depth = 0
+        self._transaction_thread = None
+        # Таблицы, измененные в текущей транзакции: их записи в кэше
+        # становятся недействительными после commit или rollback
+        self._changed_tables = set()
+
+        # query_cache_size=0 отключает кэш результатов
+        self.query_cache = None
+        self._data_version = None
+        if query_cache_size:
+            self.query_cache = QueryCache(query_cache_size, query_cache_ttl)
+
+        if wal and not read_only:
+            self.cursor.execute("PRAGMA journal_mode = WAL")
+        for pragma in pragmas:
+            self.cursor.execute(pragma)
+        # Проверка ссылок records и regular_expenses на categories
+        self.cursor.execute("PRAGMA foreign_keys = ON")
+
+        # У базы в памяти нет файла, который могли бы открыть другие соединения.
+        # read_connections — сколько свободных соединений чтения держать
+        # открытыми, обычно по числу потоков, читающих одновременно
+        self.pool = None
+        if db_name != ":memory:":
+            self.pool = ConnectionPool(db_name, pragmas, timeout, read_connections)
+
+        self.migrate()
+
+    def get_schema_version(self):
+        return self._fetchone("PRAGMA user_version")[0]
+
+    def migrate(self):
+        # При обычном запуске это единственная проверка версии схемы
+        version = self.get_schema_version()
+        if version >= len(MIGRATIONS):
+            return
+        if self.read_only:
+            raise sqlite3.OperationalError(
+                f"Схема базы {self.db_name} устарела (версия {version}); откройте ее для записи"
             )
-        ''')
-        self.connection.commit()
 
-    def add_record(self, category, amount, record_type='expense'):
-        self.cursor.execute('''
-            INSERT INTO records (category, amount, type)
-            VALUES (?, ?, ?)
-        ''', (category, amount, record_type))
-        self.connection.commit()
+        with self._write_lock:
+            try:
+                self.cursor.execute("BEGIN")
+                for migration in MIGRATIONS[version:]:
+                    migration(self.cursor)
+                self.cursor.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+                self.connection.commit()
+            except Exception:
+                self.connection.rollback()
+                raise
+            finally:
+                if self.query_cache is not None:
+                    self.query_cache.clear()
+
+    @contextmanager
+    def transaction(self):
+        # Объединяет несколько изменений в одну транзакцию: внутри блока
+        # методы записи не вызывают commit, при исключении все откатывается.
+        # Соединение-писатель занято этим потоком до конца блока
+        with self._write_lock:
+            self._transaction_depth += 1
+            self._transaction_thread = threading.get_ident()
+            try:
+                yield self
+            except Exception:
+                self._transaction_depth -= 1
+                if self._transaction_depth == 0:
+                    self._transaction_thread = None
+                    self.connection.rollback()
+                    self._invalidate_changed()
+                raise
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self._transaction_thread = None
+                self.connection.commit()
+                self._invalidate_changed()
+
+    def _commit(self):
+        if self._transaction_depth == 0:
+            self.connection.commit()
+            self._invalidate_changed()
+
+    def _changed(self, *tables):
+        # Отмечает таблицы, измененные через соединение-писатель
+        self._changed_tables.update(tables)
+
+    def _invalidate_changed(self):
+        # Поколения увеличиваются после commit: запрос, прочитавший
+        # поколение до этого момента, не сохранит в кэше устаревший результат
+        if self._changed_tables and self.query_cache is not None:
+            self.query_cache.invalidate(self._changed_tables)
+        self._changed_tables.clear()
+
+    def _execute(self, query, params=()):
+        # Изменение данных через соединение-писатель
+        with self._write_lock:
+            started = time.perf_counter()
+            self.cursor.execute(query, params)
+            if profiling.profiler is not None:
+                profiling.profiler.record_query(query, (time.perf_counter() - started) * 1000,
+                                                self.cursor.rowcount)
+            written = _WRITTEN_TABLE.match(query)
+            if written:
+                self._changed(written.group(1).lower())
+            lastrowid = self.cursor.lastrowid
+            self._commit()
+        return lastrowid
+
+    @contextmanager
+    def _read_connection(self):
+        # Соединение из пула на время чтения, после него возвращается в пул.
+        # None — читать через писателя: внутри своей транзакции, чтобы видеть
+        # свои изменения, или если пула нет
+        if self.pool is None or self._transaction_thread == threading.get_ident():
+            yield None
+            return
+        connection = self.pool.acquire()
+        try:
+            yield connection
+        finally:
+            self.pool.release(connection)
+
+    def _fetchall(self, query, params=()):
+        return self._cached_read(query, params, fetch_one=False)
+
+    def _fetchone(self, query, params=()):
+        return self._cached_read(query, params, fetch_one=True)
+
+    def _read(self, query, params, fetch_one):
+        with self._read_connection() as connection:
+            if profiling.profiler is not None:
+                return self._profiled_read(connection, query, params, fetch_one)
+            if connection is None:
+                with self._write_lock:
+                    cursor = self.connection.execute(query, params)
+                    return cursor.fetchone() if fetch_one else cursor.fetchall()
+            cursor = connection.execute(query, params)
+            return cursor.fetchone() if fetch_one else cursor.fetchall()
+
+    def _profiled_read(self, connection, query, params, fetch_one):
+        # Время запроса, количество строк и план для медленных запросов
+        def run(connection):
+            started = time.perf_counter()
+            cursor = connection.execute(query, params)
+            result = cursor.fetchone() if fetch_one else cursor.fetchall()
+            rows = (result is not None) if fetch_one else len(result)
+            profiling.profiler.record_query(
+                query, (time.perf_counter() - started) * 1000, int(rows),
+                lambda: connection.execute("EXPLAIN QUERY PLAN " + query, params).fetchall(),
+            )
+            return result
+
+        if connection is None:
+            with self._write_lock:
+                return run(self.connection)
+        return run(connection)
+
+    def _cached_read(self, query, params, fetch_one):
+        # Внутри своей транзакции поток видит незафиксированные изменения,
+        # их в кэш не кладем
+        cache = self.query_cache
+        if cache is None or self._transaction_thread == threading.get_ident():
+            return self._read(query, params, fetch_one)
+        normalized, tables = _query_tables(query)
+        if not tables or not self._check_data_version():
+            return self._read(query, params, fetch_one)
+
+        key = (normalized, tuple(params), fetch_one)
+        found, result = cache.get(key, tables)
+        if found:
+            return result if fetch_one else list(result)
+        generations = cache.generations(tables)
+        result = self._read(query, params, fetch_one)
+        cache.put(key, generations, result)
+        return result
+
+    def _check_data_version(self):
+        # PRAGMA data_version писателя меняется, когда базу изменило другое
+        # соединение, например другой процесс; тогда кэш очищается целиком.
+        # Пока писатель занят другим потоком, проверить версию нельзя, и
+        # чтение идет мимо кэша (False)
+        if not self._write_lock.acquire(blocking=False):
+            return False
+        try:
+            version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+        finally:
+            self._write_lock.release()
+        if version != self._data_version:
+            self._data_version = version
+            self.query_cache.clear()
+        return True
+
+    def cache_stats(self):
+        # Счетчики попаданий и промахов кэша запросов (None — кэш отключен)
+        return self.query_cache.stats() if self.query_cache is not None else None
+
+    def _update_rollups(self, records, sign=1):
+        # records: кортежи (category_id, amount_cents, date, type); sign=-1 при удалении
+        self._changed("daily_totals", "monthly_totals")
+        daily = {}
+        monthly = {}
+        for category_id, amount_cents, record_date, record_type in records:
+            for totals, key in ((daily, record_date[:10]), (monthly, record_date[:7])):
+                key = (key, category_id, record_type or '')
+                total, count = totals.get(key, (0, 0))
+                totals[key] = (total + sign * amount_cents, count + sign)
+
+        for table, column, totals in (("daily_totals", "day", daily), ("monthly_totals", "month", monthly)):
+            self.cursor.executemany(f'''
+                INSERT INTO {table} ({column}, category_id, type, total_cents, count)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT ({column}, category_id, type)
+                DO UPDATE SET total_cents = total_cents + excluded.total_cents,
+                    count = count + excluded.count
+            ''', [key + value for key, value in totals.items()])
+            if sign < 0:
+                # Опустевшие строки ищутся только среди затронутых ключей
+                # (по первичному ключу), а не по всей таблице
+                self.cursor.executemany(
+                    f"DELETE FROM {table} WHERE {column} = ? AND category_id = ? AND type = ? AND count <= 0",
+                    list(totals),
+                )
+
+    def _find_category_id(self, name):
+        row = self._fetchone("SELECT id FROM categories WHERE name = ?", (name,))
+        return row[0] if row else None
+
+    def _category_ids(self, names):
+        # Название -> id для набора категорий; недостающие категории создаются.
+        # Вызывается внутри транзакции
+        names = set(names)
+        ids = {}
+        for name in names:
+            row = self.cursor.execute("SELECT id FROM categories WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                ids[name] = self._create_category(name)
+            else:
+                ids[name] = row[0]
+        return ids
+
+    def _create_category(self, name):
+        self._changed("categories", "categories_fts")
+        self.cursor.execute("INSERT INTO categories (name) VALUES (?)", (name,))
+        category_id = self.cursor.lastrowid
+        self.cursor.execute("INSERT INTO categories_fts (rowid, name) VALUES (?, ?)", (category_id, name))
+        return category_id
+
+    def _insert_records(self, batch):
+        # batch: кортежи (category, amount, date, type, notes, import_hash),
+        # категория названием, сумма в рублях. Вместе с записями обновляются
+        # итоговые суммы и поисковый индекс: одна вставка на пачку обходится
+        # намного дешевле триггера на строку
+        category_ids = self._category_ids(record[0] for record in batch)
+        batch = [(category_ids[category], to_cents(amount), record_date, record_type, notes, import_hash)
+                 for category, amount, record_date, record_type, notes, import_hash in batch]
+        self._changed("records", "records_fts")
+        last_id = self.cursor.execute("SELECT IFNULL(MAX(id), 0) FROM records").fetchone()[0]
+        self.cursor.executemany('''
+            INSERT INTO records (category_id, amount_cents, date, type, notes, import_hash)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', batch)
+        if any(record[4] is not None for record in batch):
+            self.cursor.execute('''
+                INSERT INTO records_fts (rowid, notes)
+                SELECT id, notes FROM records WHERE id > ? AND notes IS NOT NULL
+            ''', (last_id,))
+        self._update_rollups([record[:4] for record in batch])
+        # executemany не обновляет lastrowid, поэтому id последней записи
+        # берем из таблицы
+        return self.cursor.execute("SELECT MAX(id) FROM records").fetchone()[0]
+
+    def add_record(self, category, amount, record_type='expense', notes=None):
+        record_date = _current_timestamp()
+        with self.transaction():
+            record_id = self._insert_records([(category, amount, record_date, record_type, notes, None)])
+        # Новая строка в том же виде, что и строки get_records_page
+        # (id, category, amount, date, type): интерфейс вставляет ее в
+        # таблицу без повторной выборки
+        return record_id, category, to_cents(amount) / 100.0, record_date, record_type
+
+    def add_records_bulk(self, records, batch_size=10000):
+        # records: итерируемый объект кортежей (category, amount, date, type)
+        # или (category, amount, date, type, notes); date = None означает
+        # текущее время. Данные читаются пачками по batch_size строк и
+        # вставляются через executemany в одной транзакции
+        records = iter(records)
+        now = _current_timestamp()
+        inserted = 0
+        with self.transaction():
+            while True:
+                batch = [(record[0], record[1], record[2] or now, record[3],
+                          record[4] if len(record) > 4 else None, None)
+                         for record in islice(records, batch_size)]
+                if not batch:
+                    break
+                self._insert_records(batch)
+                inserted += len(batch)
+        return inserted
+
+    def add_imported_records(self, records, batch_size=10000):
+        # records: кортежи (category, amount, date, type, notes, import_hash).
+        # Строки с уже известным хешем пропускаются. Все пачки вставляются
+        # в одной транзакции; возвращает количество добавленных строк
+        records = iter(records)
+        inserted = 0
+        with self.transaction():
+            while True:
+                batch = list(islice(records, batch_size))
+                if not batch:
+                    break
+
+                hashes = [record[5] for record in batch]
+                seen = set()
+                for start in range(0, len(hashes), 900):
+                    chunk = hashes[start:start + 900]
+                    placeholders = ", ".join("?" * len(chunk))
+                    self.cursor.execute(
+                        f"SELECT import_hash FROM records WHERE import_hash IN ({placeholders})", chunk
+                    )
+                    seen.update(row[0] for row in self.cursor.fetchall())
+
+                new_records = []
+                for record in batch:
+                    if record[5] not in seen:
+                        seen.add(record[5])
+                        new_records.append(record)
+
+                if new_records:
+                    self._insert_records(new_records)
+                inserted += len(new_records)
+        return inserted
 
 
     def get_all_records(self):
         # Получаем все записи
-        self.cursor.execute('SELECT * FROM records')
-        return self.cursor.fetchall()
+        return self._fetchall(f'SELECT {RECORD_COLUMNS} FROM {RECORDS_SOURCE}')
 
     def close(self):
-        # Закрываем соединение
+        # Закрываем соединения
+        if self.pool is not None:
+            self.pool.close_all()
         self.connection.close()
 
     def delete_record(self, record_id):
-        # Удаление записи по ID
-        self.cursor.execute('DELETE FROM records WHERE id = ?', (record_id,))
-        self.connection.commit()
+        # Удаление записи по ID вместе с ее вкладом в итоговые суммы
+        with self.transaction():
+            record = self._fetchone(
+                'SELECT category_id, amount_cents, date, type, notes FROM records WHERE id = ?', (record_id,)
+            )
+            if record is None:
+                return
+            self._execute('DELETE FROM records WHERE id = ?', (record_id,))
+            if record[4] is not None:
+                self._execute('''
+                    INSERT INTO records_fts (records_fts, rowid, notes)
+                    VALUES ('delete', ?, ?)
+                ''', (record_id, record[4]))
+            self._update_rollups([record[:4]], sign=-1)
     
     def get_categories(self):
-        self.cursor.execute("SELECT DISTINCT category FROM records")
-        return [row[0] for row in self.cursor.fetchall()]
+        return [row[0] for row in self._fetchall("SELECT name FROM categories ORDER BY name")]
 
 
     def load_categories(self):
         categories = self.db.get_categories()
         self.category_filter.addItems(categories)
 
+    def _build_records_filter(self, category_filter=None, start_date=None, end_date=None,
+                              record_type=None, search_term=None, scan=False, record_id=None):
+        # Собираем источник строк, условие WHERE и параметры для выборки записей.
+        # Категория и найденные по названию категории подставляются как id,
+        # поэтому фильтр идет по индексу (category_id, date). scan=True
+        # отключает этот индекс (унарный +), если совпадений много и выгоднее
+        # идти по таблице в порядке id. record_id ограничивает выборку одной
+        # записью (проверка, подходит ли она под фильтр)
+        source = RECORDS_SOURCE
+        id_column = "records.id"
+        category_column = "+records.category_id" if scan else "records.category_id"
+        query, params = self._build_period_filter(start_date, end_date, record_type, scan)
+
+        if category_filter and category_filter != "Все категории":
+            query += f" AND {category_column} = ?"
+            params.append(self._find_category_id(category_filter))
+
+        if record_id is not None:
+            query += f" AND {id_column} = ?"
+            params.append(record_id)
+
+        if search_term and search_term.strip():
+            conditions, search_params, fts_query = _build_search_filter(search_term)
+            text_conditions, text_params = self._build_text_filter(
+                fts_query, category_column, correlated=record_id is not None
+            )
+            query += " AND (" + " OR ".join(conditions + text_conditions) + ")"
+            params += search_params + text_params
+
+        return source, query, params, id_column
+
+    def _build_text_filter(self, fts_query, category_column="records.category_id", correlated=False):
+        # Текст ищется в названиях категорий (маленький categories_fts) и в
+        # примечаниях (records_fts). correlated=True проверяет примечания
+        # каждой строки по rowid вместо выборки всех совпадений — для
+        # фильтра по одной записи
+        category_ids = [row[0] for row in self._fetchall(
+            "SELECT rowid FROM categories_fts WHERE categories_fts MATCH ?", (fts_query,)
+        )]
+        if correlated:
+            conditions = ["EXISTS (SELECT 1 FROM records_fts WHERE records_fts MATCH ? AND rowid = records.id)"]
+        else:
+            conditions = ["records.id IN (SELECT rowid FROM records_fts WHERE records_fts MATCH ?)"]
+        params = [fts_query]
+        if category_ids:
+            conditions.insert(0, f"{category_column} IN ({', '.join('?' * len(category_ids))})")
+            params = category_ids + params
+        return conditions, params
+
     def get_filtered_records(self, category_filter=None, start_date=None, end_date=None):
-        query = "SELECT * FROM records WHERE 1=1"
-        params = []
+        source, where, params, _ = self._build_records_filter(category_filter, start_date, end_date)
+        return self._fetchall(f"SELECT {RECORD_COLUMNS} FROM {source}{where}", params)
+
+    def iter_filtered_records(self, category_filter=None, start_date=None, end_date=None,
+                              chunk_size=5000, **filters):
+        # Потоковая выборка: строки читаются курсором порциями по chunk_size,
+        # поэтому в памяти одновременно находится только одна порция
+        source, where, params, id_column = self._build_records_filter(
+            category_filter, start_date, end_date, **filters
+        )
+        with self._read_connection() as connection:
+            cursor = (connection or self.connection).cursor()
+            try:
+                cursor.execute(f"SELECT {RECORD_COLUMNS} FROM {source}{where} ORDER BY {id_column}", params)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield from rows
+            finally:
+                cursor.close()
+
+    def iter_amount_chunks(self, start_date=None, end_date=None, record_type=None, chunk_size=100000):
+        # Порции строк (день, id категории, сумма в копейках) для аналитики
+        # (utils/analytics.py): только нужные столбцы, без пересчета в рубли
+        where, params = self._build_period_filter(start_date, end_date, record_type)
+        with self._read_connection() as connection:
+            cursor = (connection or self.connection).cursor()
+            try:
+                cursor.execute("SELECT substr(date, 1, 10), category_id, amount_cents FROM records" + where, params)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cursor.close()
+
+    def iter_day_ordered_chunks(self, chunk_size=100000):
+        # Все записи по возрастанию даты для снимка (utils/snapshot.py):
+        # порции (id, день как число дней с 1970-01-01, id категории,
+        # 1 для дохода или 0, сумма в копейках). День считается в SQLite,
+        # поэтому строки дат в Python не создаются
+        with self._read_connection() as connection:
+            cursor = (connection or self.connection).cursor()
+            try:
+                cursor.execute("SELECT id, CAST(julianday(substr(date, 1, 10)) - 2440587.5 AS INTEGER), category_id,"
+                               " type IS 'income', amount_cents FROM records ORDER BY date, id")
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cursor.close()
 
+    def iter_record_batches(self, after_id=0, batch_size=50000):
+        # Порции записей с id больше after_id по возрастанию id для
+        # экспорта в столбцовые форматы: (id, category_id, сумма в копейках,
+        # дата, тип, примечание). Без соединения с categories и перевода в
+        # рубли: названия категорий подставляет экспорт по category_id
+        with self._read_connection() as connection:
+            cursor = (connection or self.connection).cursor()
+            try:
+                cursor.execute("SELECT id, category_id, amount_cents, date, type, notes FROM records"
+                               " WHERE id > ? ORDER BY id", (after_id,))
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cursor.close()
+
+    def get_records_page(self, after_id=0, limit=500, **filters):
+        # Постраничная выборка по ключу id: следующая страница начинается
+        # сразу после последнего загруженного id, без OFFSET
+        if (filters.get("search_term") or "").strip():
+            return self._get_search_page(after_id, limit, **filters)
+
+        source, where, params, id_column = self._build_records_filter(**filters)
+
+        # Для редких совпадений быстрее найти строки по индексу и
+        # отсортировать их, чем просматривать таблицу в порядке id; для
+        # частых — наоборот. Оценка только по индексу (category_id, date),
+        # без чтения строк
+        category_filter = filters.get("category_filter")
+        order = id_column
         if category_filter and category_filter != "Все категории":
-            query += " AND category = ?"
-            params.append(category_filter)
+            count_where, count_params = self._build_period_filter(filters.get("start_date"), filters.get("end_date"))
+            if self._is_selective(f"{count_where} AND category_id = ?",
+                                  count_params + [self._find_category_id(category_filter)]):
+                order = "+" + id_column
+            else:
+                source, where, params, id_column = self._build_records_filter(scan=True, **filters)
 
-        if start_date:
-            query += " AND date >= ?"
-            params.append(start_date)
+        query = (f"SELECT records.id, categories.name, amount_cents / 100.0, date, type FROM {source}{where}"
+                 f" AND {id_column} > ? ORDER BY {order} LIMIT ?")
+        return self._fetchall(query, params + [after_id, limit])
 
-        if end_date:
-            query += " AND date <= ?"
-            params.append(end_date)
+    def _is_selective(self, where, params):
+        # Не больше SELECTIVE_SEARCH_ROWS строк records под условием
+        return self._fetchone(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM records{where} LIMIT ?)", params + [SELECTIVE_SEARCH_ROWS + 1],
+        )[0] <= SELECTIVE_SEARCH_ROWS
 
-        self.cursor.execute(query, params)
-        return self.cursor.fetchall()
+    def _get_search_page(self, after_id, limit, search_term, **filters):
+        # Условия поиска, соединенные через OR (сумма, дата, название
+        # категории, примечание), проверяются отдельными запросами: каждый
+        # идет по своему индексу и возвращает только первые limit подходящих
+        # id. Так "2023" не просматривает таблицу в порядке id до первых
+        # записей года и не читает строки всего года. Полные строки страницы
+        # выбираются по найденным id
+        term = search_term.strip()
+        ranges = _search_ranges(term)
+        queries = self._range_search_queries(ranges, filters) + self._text_search_queries(term, filters)
 
-    def create_table_categories(self):
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS categories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL
-            )
-        ''')
-        self.connection.commit()
+        ids = set()
+        for query, params in queries:
+            ids.update(row[0] for row in self._fetchall(query, params + [after_id, limit]))
+        ids = sorted(ids)[:limit]
+        if not ids:
+            return []
+        return self._fetchall(
+            f"SELECT records.id, categories.name, amount_cents / 100.0, date, type FROM {RECORDS_SOURCE}"
+            f" WHERE records.id IN ({', '.join('?' * len(ids))}) ORDER BY records.id",
+            ids,
+        )
+
+    def _range_search_queries(self, ranges, filters):
+        # Запросы id для диапазона сумм и диапазона дат
+        queries = []
+        for column, condition, condition_params in ranges:
+            if column == "amount_cents":
+                # Узкий диапазон сумм ищется по своему индексу, индексы
+                # категории и типа для него отключены
+                _, where, params, _ = self._build_records_filter(scan=True, **filters)
+                where, params = f"{where} AND {condition}", params + condition_params
+            else:
+                # Диапазон дат поиска и период фильтра сводятся в одни
+                # границы, иначе индекс дат может пройти весь период фильтра.
+                # При выбранной категории тип проверяется без индекса:
+                # (category_id, date) обычно уже, чем (type, date)
+                branch = dict(filters)
+                branch["start_date"], branch["end_date"] = _period_within(
+                    condition_params, filters.get("start_date"), filters.get("end_date")
+                )
+                category_filter = filters.get("category_filter")
+                record_type = None
+                if category_filter and category_filter != "Все категории":
+                    record_type = branch.pop("record_type", None)
+                _, where, params, _ = self._build_records_filter(**branch)
+                if record_type:
+                    where += " AND +type = ?"
+                    params.append(record_type)
+            queries.append((f"SELECT id FROM records{where} AND id > ? ORDER BY +id LIMIT ?", params))
+        return queries
+
+    def _text_search_queries(self, term, filters):
+        # Запросы id для текста: примечания перебираются по records_fts в
+        # порядке rowid (он совпадает с id записи), записи найденных по
+        # названию категорий — как при фильтре по категории: по индексу с
+        # сортировкой, если их немного, иначе по таблице в порядке id
+        fts_query = _fts_query(term)
+        _, scan_where, scan_params, _ = self._build_records_filter(scan=True, **filters)
+        queries = [(
+            f"SELECT records_fts.rowid FROM records_fts JOIN records ON records.id = records_fts.rowid{scan_where}"
+            " AND records_fts MATCH ? AND records_fts.rowid > ? ORDER BY records_fts.rowid LIMIT ?",
+            scan_params + [fts_query],
+        )]
+
+        category_ids = [row[0] for row in self._fetchall(
+            "SELECT rowid FROM categories_fts WHERE categories_fts MATCH ?", (fts_query,)
+        )]
+        if category_ids:
+            placeholders = ", ".join("?" * len(category_ids))
+            _, where, params, _ = self._build_records_filter(**filters)
+            if self._is_selective(f"{where} AND category_id IN ({placeholders})", params + category_ids):
+                queries.append((f"SELECT id FROM records{where} AND category_id IN ({placeholders})"
+                                " AND id > ? ORDER BY +id LIMIT ?", params + category_ids))
+            else:
+                queries.append((f"SELECT id FROM records{scan_where} AND +category_id IN ({placeholders})"
+                                " AND id > ? ORDER BY id LIMIT ?", scan_params + category_ids))
+        return queries
+
+    def record_matches(self, record_id, **filters):
+        # Подходит ли запись под фильтры get_records_page. Поиск идет по
+        # первичному ключу, поэтому время не зависит от размера таблицы
+        source, where, params, _ = self._build_records_filter(record_id=record_id, **filters)
+        return self._fetchone(f"SELECT 1 FROM {source}{where} LIMIT 1", params) is not None
 
     def get_all_categories(self):
-        self.cursor.execute("SELECT * FROM categories")
-        return self.cursor.fetchall()
+        return self._fetchall("SELECT * FROM categories")
 
     def add_category(self, name):
-        self.cursor.execute("INSERT INTO categories (name) VALUES (?)", (name,))
-        self.connection.commit()
+        with self.transaction():
+            return self._create_category(name)
 
     def delete_category(self, category_id):
-        self.cursor.execute("DELETE FROM categories WHERE id = ?", (category_id,))
-        self.connection.commit()
+        # Категорию, на которую ссылаются записи, удалить нельзя (sqlite3.IntegrityError)
+        with self.transaction():
+            row = self._fetchone("SELECT name FROM categories WHERE id = ?", (category_id,))
+            if row is None:
+                return
+            self._execute("DELETE FROM categories WHERE id = ?", (category_id,))
+            self._execute("INSERT INTO categories_fts (categories_fts, rowid, name) VALUES ('delete', ?, ?)",
+                          (category_id, row[0]))
 
     def update_category(self, category_id, new_name):
-        self.cursor.execute("UPDATE categories SET name = ? WHERE id = ?", (new_name, category_id))
-        self.connection.commit()
+        # Записи ссылаются на id, поэтому переименование меняет одну строку
+        with self.transaction():
+            row = self._fetchone("SELECT name FROM categories WHERE id = ?", (category_id,))
+            if row is None:
+                return
+            self._execute("UPDATE categories SET name = ? WHERE id = ?", (new_name, category_id))
+            self._execute("INSERT INTO categories_fts (categories_fts, rowid, name) VALUES ('delete', ?, ?)",
+                          (category_id, row[0]))
+            self._execute("INSERT INTO categories_fts (rowid, name) VALUES (?, ?)", (category_id, new_name))
 
-    def create_regular_expenses_table(self):
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS regular_expenses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                category TEXT NOT NULL,
-                amount REAL NOT NULL,
-                interval TEXT NOT NULL, -- daily, weekly, monthly
-                next_payment_date DATE NOT NULL
-            )
-        ''')
-        self.connection.commit()
-    
     def add_regular_expense(self, category, amount, interval, next_payment_date):
-        self.cursor.execute('''
-            INSERT INTO regular_expenses (category, amount, interval, next_payment_date)
-            VALUES (?, ?, ?, ?)
-        ''', (category, amount, interval, next_payment_date))
-        self.connection.commit()
+        with self.transaction():
+            category_id = self._category_ids([category])[category]
+            self._execute('''
+                INSERT INTO regular_expenses (category_id, amount_cents, interval, next_payment_date, anchor_date)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (category_id, to_cents(amount), interval, next_payment_date, next_payment_date))
 
     def get_regular_expenses(self):
-        self.cursor.execute("SELECT * FROM regular_expenses")
-        return self.cursor.fetchall()
+        return self._fetchall(f"SELECT {REGULAR_EXPENSE_COLUMNS} FROM {REGULAR_EXPENSES_SOURCE}")
 
     def update_next_payment_date(self, expense_id, next_payment_date):
-        self.cursor.execute('''
+        # Перенос платежа вручную задает новый день, от которого считаются
+        # следующие платежи
+        self._execute('''
             UPDATE regular_expenses
-            SET next_payment_date = ?
+            SET next_payment_date = ?, anchor_date = ?
             WHERE id = ?
-        ''', (next_payment_date, expense_id))
-        self.connection.commit()
+        ''', (next_payment_date, next_payment_date, expense_id))
+
+    def advance_regular_expense(self, expense_id, expected_date, next_payment_date):
+        # Сдвигает дату платежа, только если она не изменилась с момента чтения.
+        # Возвращает True, если строка обновлена
+        with self._write_lock:
+            self.cursor.execute('''
+                UPDATE regular_expenses
+                SET next_payment_date = ?
+                WHERE id = ? AND next_payment_date = ?
+            ''', (next_payment_date, expense_id, expected_date))
+            updated = self.cursor.rowcount == 1
+            if updated:
+                self._changed("regular_expenses")
+            self._commit()
+        return updated
+
+    def delete_regular_expense(self, expense_id):
+        self._execute("DELETE FROM regular_expenses WHERE id = ?", (expense_id,))
     
     def get_due_regular_expenses(self, current_date):
-        self.cursor.execute('''
-            SELECT * FROM regular_expenses
+        return self._fetchall(f'''
+            SELECT {REGULAR_EXPENSE_COLUMNS} FROM {REGULAR_EXPENSES_SOURCE}
             WHERE next_payment_date <= ?
         ''', (current_date,))
-        return self.cursor.fetchall()
+
+    def get_date_range(self):
+        # Дни первой и последней записи или (None, None) для пустой базы
+        first, last = self._fetchone("SELECT MIN(date), MAX(date) FROM records")
+        if first is None:
+            return None, None
+        return first[:10], last[:10]
 
     def get_records_by_period(self, start_date, end_date):
-        query = "SELECT * FROM records WHERE date >= ? AND date <= ?"
-        self.cursor.execute(query, (start_date, end_date))
-        return self.cursor.fetchall()
-
-    def search_records(self, search_term):
-        query = '''
-            SELECT * FROM records 
-            WHERE category LIKE ? OR 
-                CAST(amount AS TEXT) LIKE ? OR 
-                date LIKE ?
-        '''
-        wildcard_term = f"%{search_term}%"
-        self.cursor.execute(query, (wildcard_term, wildcard_term, wildcard_term))
-        return self.cursor.fetchall()
-
-    def update_records_table(self):
-        # Проверяем, есть ли столбец 'type' в таблице records
-        self.cursor.execute("PRAGMA table_info(records)")
-        columns = [column[1] for column in self.cursor.fetchall()]
-
-        if 'type' not in columns:
-            # Если столбца нет, добавляем его
-            self.cursor.execute('''
-                ALTER TABLE records 
-                ADD COLUMN type TEXT DEFAULT 'expense'
-            ''')
-            self.connection.commit()
+        query = f"SELECT {RECORD_COLUMNS} FROM {RECORDS_SOURCE} WHERE date >= ? AND date <= ?"
+        return self._fetchall(query, (start_date, end_date))
+
+    def _build_period_filter(self, start_date=None, end_date=None, record_type=None, scan=False):
+        query = " WHERE 1=1"
+        params = []
+
+        if start_date:
+            query += " AND date >= ?"
+            params.append(start_date)
+
+        if end_date:
+            # Дата без времени включает весь день целиком
+            if len(end_date) == 10:
+                query += " AND date < date(?, '+1 day')"
+            else:
+                query += " AND date <= ?"
+            params.append(end_date)
+
+        if record_type:
+            query += " AND +type = ?" if scan else " AND type = ?"
+            params.append(record_type)
+
+        return query, params
+
+    def _can_use_rollups(self, start_date, end_date):
+        # Итоговые таблицы хранят суммы по дням, поэтому границы периода
+        # должны быть датами без времени
+        return all(bound is None or len(bound) == 10 for bound in (start_date, end_date))
+
+    def sum_by_category(self, start_date=None, end_date=None, record_type=None,
+                        category_filter=None, search_term=None):
+        # Суммы по категориям: целые месяцы берутся из monthly_totals,
+        # неполные месяцы по краям периода — из daily_totals. С фильтром по
+        # категории или поиском суммы считаются по самим записям
+        if category_filter == "Все категории":
+            category_filter = None
+        if category_filter or search_term or not self._can_use_rollups(start_date, end_date):
+            source, where, params, _ = self._build_records_filter(
+                category_filter, start_date, end_date, record_type, search_term
+            )
+            query = (f"SELECT categories.name, SUM(amount_cents) / 100.0 FROM {source}{where}"
+                     " GROUP BY records.category_id ORDER BY SUM(amount_cents) DESC")
+            return self._fetchall(query, params)
+
+        type_filter = " AND type = ?" if record_type else ""
+        type_params = [record_type] if record_type else []
+        day_ranges, month_range = _split_by_months(start_date, end_date)
+
+        parts = []
+        params = []
+        for first_day, last_day in day_ranges:
+            parts.append("SELECT category_id, total_cents FROM daily_totals WHERE day BETWEEN ? AND ?" + type_filter)
+            params += [first_day, last_day] + type_params
+        if month_range:
+            parts.append("SELECT category_id, total_cents FROM monthly_totals WHERE month BETWEEN ? AND ?" + type_filter)
+            params += list(month_range) + type_params
+
+        query = ("SELECT categories.name, SUM(total_cents) / 100.0 FROM (" + " UNION ALL ".join(parts) + ") t"
+                 " JOIN categories ON categories.id = t.category_id"
+                 " GROUP BY t.category_id ORDER BY SUM(total_cents) DESC")
+        return self._fetchall(query, params)
+
+    def sum_by_day(self, start_date=None, end_date=None, record_type=None):
+        if not self._can_use_rollups(start_date, end_date):
+            where, params = self._build_period_filter(start_date, end_date, record_type)
+            query = ("SELECT date(date) AS day, SUM(amount_cents) / 100.0 FROM records" + where +
+                     " GROUP BY day ORDER BY day")
+            return self._fetchall(query, params)
+
+        query = "SELECT day, SUM(total_cents) / 100.0 FROM daily_totals WHERE 1=1"
+        params = []
+        if start_date:
+            query += " AND day >= ?"
+            params.append(start_date)
+        if end_date:
+            query += " AND day <= ?"
+            params.append(end_date)
+        if record_type:
+            query += " AND type = ?"
+            params.append(record_type)
+        return self._fetchall(query + " GROUP BY day ORDER BY day", params)
+
+    def sum_by_month(self, start_month=None, end_month=None, record_type=None):
+        # Месяцы в формате 'YYYY-MM'
+        query = "SELECT month, SUM(total_cents) / 100.0 FROM monthly_totals WHERE 1=1"
+        params = []
+        if start_month:
+            query += " AND month >= ?"
+            params.append(start_month)
+        if end_month:
+            query += " AND month <= ?"
+            params.append(end_month)
+        if record_type:
+            query += " AND type = ?"
+            params.append(record_type)
+        return self._fetchall(query + " GROUP BY month ORDER BY month", params)
+
+    def rebuild_rollups(self):
+        # Полный пересчет итоговых таблиц по records
+        with self.transaction():
+            self._changed("daily_totals", "monthly_totals")
+            _fill_rollups(self.cursor)
+
+    def rebuild_search_index(self):
+        with self.transaction():
+            self._changed("records_fts", "categories_fts")
+            _fill_search_index(self.cursor)
+
+    def check_rollups(self):
+        # Сравнивает итоговые таблицы с records. Возвращает список
+        # расхождений (таблица, период, id категории, тип, ожидаемая сумма,
+        # ожидаемое количество, фактическая сумма, фактическое количество).
+        # Суммы в копейках сравниваются точно
+        checks = (
+            ("daily_totals", "day", '''
+                SELECT date(date) AS day, category_id, IFNULL(type, '') AS type,
+                    SUM(amount_cents) AS total_cents, COUNT(*) AS count
+                FROM records GROUP BY 1, 2, 3
+            '''),
+            ("monthly_totals", "month", '''
+                SELECT strftime('%Y-%m', date) AS month, category_id, IFNULL(type, '') AS type,
+                    SUM(amount_cents) AS total_cents, COUNT(*) AS count
+                FROM records GROUP BY 1, 2, 3
+            '''),
+        )
+        mismatches = []
+        for table, column, expected in checks:
+            query = f'''
+                WITH expected AS ({expected})
+                SELECT e.{column}, e.category_id, e.type, e.total_cents / 100.0, e.count,
+                    t.total_cents / 100.0, t.count
+                FROM expected e
+                LEFT JOIN {table} t USING ({column}, category_id, type)
+                WHERE t.count IS NULL OR t.count != e.count OR t.total_cents != e.total_cents
+                UNION ALL
+                SELECT t.{column}, t.category_id, t.type, NULL, NULL, t.total_cents / 100.0, t.count
+                FROM {table} t
+                LEFT JOIN expected e USING ({column}, category_id, type)
+                WHERE e.count IS NULL
+            '''
+            mismatches += [(table,) + row for row in self._fetchall(query)]
+        return mismatches
+
+    def search_records(self, search_term, limit=None):
+        # Текстовый поиск возвращает записи по убыванию релевантности (bm25
+        # названия категории или примечания), поиск по сумме или дате (вместе
+        # с совпадениями в тексте) — по убыванию даты
+        term = search_term.strip()
+        if not _search_ranges(term):
+            params = [_fts_query(term)] * 2
+            query = f'''
+                WITH matched AS (
+                    SELECT records.id AS id, categories_fts.rank AS rank
+                    FROM categories_fts JOIN records ON records.category_id = categories_fts.rowid
+                    WHERE categories_fts MATCH ?
+                    UNION ALL
+                    SELECT rowid, rank FROM records_fts WHERE records_fts MATCH ?
+                )
+                SELECT {RECORD_COLUMNS}
+                FROM (SELECT id, MIN(rank) AS rank FROM matched GROUP BY id) m
+                JOIN records ON records.id = m.id
+                JOIN categories ON categories.id = records.category_id
+                ORDER BY m.rank, records.date DESC
+            '''
         else:
-            print("Столбец 'type' уже существует в таблице 'records'")
+            source, where, params, _ = self._build_records_filter(search_term=term)
+            query = f"SELECT {RECORD_COLUMNS} FROM {source}{where} ORDER BY date DESC"
 
+        if limit:
+            query += " LIMIT ?"
+            params = params + [limit]
+        return self._fetchall(query, params)
@@ -0,0 +1,111 @@
+# db_worker.py
+import time
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from utils import profiling
+
+
+class DbTaskSignals(QObject):
+    # Сигналы создаются в главном потоке, поэтому обработчики результата
+    # вызываются в главном потоке, даже если задача выполнялась в фоновом
+    finished = pyqtSignal(object, object)
+    failed = pyqtSignal(object, str)
+
+
+class DbTask(QRunnable):
+    def __init__(self, key, func, args, kwargs):
+        super().__init__()
+        self.key = key
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = DbTaskSignals()
+        self.setAutoDelete(False)
+
+    def run(self):
+        started = time.perf_counter()
+        try:
+            result = self.func(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.failed.emit(self, str(e))
+        else:
+            self.signals.finished.emit(self, result)
+        finally:
+            if profiling.profiler is not None:
+                profiling.profiler.record("task", self.key, (time.perf_counter() - started) * 1000)
+
+
+class DbWorker(QObject):
+    # Выполняет запросы к базе в пуле потоков. Запросы группируются по ключу
+    # (например, "records" или "chart"): новый запрос с тем же ключом снимает
+    # из очереди еще не начатый предыдущий, а результат уже выполняющегося
+    # устаревшего запроса просто отбрасывается.
+    # Задачи не держат соединений с базой между запусками: PyQt не
+    # сохраняет состояние Python-потока между задачами QThreadPool, поэтому
+    # каждое чтение берет соединение из пула Database и сразу возвращает его
+    busy_changed = pyqtSignal(bool)
+
+    def __init__(self, parent=None, max_threads=4):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.latest = {}
+        self.tasks = {}
+
+    def submit(self, key, func, args=(), kwargs=None, on_result=None, on_error=None):
+        previous = self.latest.get(key)
+        if previous is not None and self.pool.tryTake(previous):
+            self._forget(previous)
+
+        task = DbTask(key, func, args, kwargs or {})
+        task.signals.finished.connect(self._on_finished)
+        task.signals.failed.connect(self._on_failed)
+
+        was_busy = self.is_busy()
+        self.latest[key] = task
+        self.tasks[task] = (key, on_result, on_error)
+        self.pool.start(task)
+        if not was_busy:
+            self.busy_changed.emit(True)
+        return task
+
+    def is_busy(self):
+        return bool(self.tasks)
+
+    def wait(self):
+        self.pool.waitForDone()
+
+    def _forget(self, task):
+        key, on_result, on_error = self.tasks.pop(task)
+        if self.latest.get(key) is task:
+            del self.latest[key]
+        if not self.tasks:
+            self.busy_changed.emit(False)
+        return key, on_result, on_error
+
+    def _on_finished(self, task, result):
+        is_latest = self.latest.get(self.tasks[task][0]) is task
+        key, on_result, _ = self._forget(task)
+        if is_latest and on_result is not None:
+            self._call_handler(key, on_result, result)
+
+    def _on_failed(self, task, message):
+        is_latest = self.latest.get(self.tasks[task][0]) is task
+        key, _, on_error = self._forget(task)
+        if is_latest and on_error is not None:
+            self._call_handler(key, on_error, message)
+
+    def _call_handler(self, key, handler, value):
+        # Обработчик результата выполняется в главном потоке; при
+        # профилировании его время записывается как время интерфейса.
+        # Методы окна, обернутые profiling.instrument, уже замеряются сами
+        if profiling.profiler is None or hasattr(getattr(handler, "__func__", handler), "__wrapped__"):
+            handler(value)
+            return
+        started = time.perf_counter()
+        try:
+            handler(value)
+        finally:
+            profiling.profiler.record("slot", f"{key}: {getattr(handler, '__name__', 'handler')}",
+                                     (time.perf_counter() - started) * 1000)
@@ -0,0 +1,97 @@
+# diagnostics_window.py
+# Окно диагностики: задержки операций (p50/p95) и последние медленные
+# запросы с планами. Данные берутся из utils.profiling и обновляются раз
+# в две секунды, пока окно открыто. Доступно при FINANCE_PROFILE=1.
+from datetime import datetime
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import (QHBoxLayout, QHeaderView, QLabel, QMainWindow, QPushButton, QTableWidget,
+                             QTableWidgetItem, QTabWidget, QVBoxLayout, QWidget)
+
+from utils import profiling
+
+KIND_NAMES = {"call": "База", "query": "SQL", "slot": "Интерфейс", "task": "Фон"}
+
+
+class DiagnosticsWindow(QMainWindow):
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.setWindowTitle("Диагностика")
+        self.resize(900, 600)
+
+        layout = QVBoxLayout()
+        self.cache_label = QLabel()
+        layout.addWidget(self.cache_label)
+
+        tabs = QTabWidget()
+        self.latency_table = QTableWidget(0, 6)
+        self.latency_table.setHorizontalHeaderLabels(["Вид", "Операция", "Вызовов", "p50, мс", "p95, мс", "Макс., мс"])
+        self.latency_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        tabs.addTab(self.latency_table, "Задержки")
+
+        self.slow_table = QTableWidget(0, 5)
+        self.slow_table.setHorizontalHeaderLabels(["Время", "мс", "Строк", "SQL", "План"])
+        self.slow_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
+        self.slow_table.setWordWrap(True)
+        tabs.addTab(self.slow_table, "Медленные запросы")
+        layout.addWidget(tabs)
+
+        buttons = QHBoxLayout()
+        refresh_button = QPushButton("Обновить")
+        refresh_button.clicked.connect(self.refresh)
+        buttons.addWidget(refresh_button)
+        reset_button = QPushButton("Сбросить")
+        reset_button.clicked.connect(self.reset)
+        buttons.addWidget(reset_button)
+        layout.addLayout(buttons)
+
+        widget = QWidget()
+        widget.setLayout(layout)
+        self.setCentralWidget(widget)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(2000)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start()
+        self.refresh()
+
+    def refresh(self):
+        profiler = profiling.profiler
+        if profiler is None:
+            self.cache_label.setText("Профилирование выключено: запустите программу с FINANCE_PROFILE=1")
+            return
+
+        stats = self.db.cache_stats()
+        if stats is None:
+            self.cache_label.setText("Кэш запросов выключен")
+        else:
+            self.cache_label.setText(f"Кэш запросов: попаданий {stats['hits']}, промахов {stats['misses']} "
+                                     f"({stats['hit_rate']:.0%}), записей {stats['entries']}. "
+                                     f"Медленный запрос: от {profiler.slow_query_ms:g} мс")
+
+        summary = profiler.summary()
+        self.latency_table.setRowCount(len(summary))
+        for row_index, (key, count, p50, p95, maximum) in enumerate(summary):
+            kind, _, name = key.partition(":")
+            values = (KIND_NAMES.get(kind, kind), name, str(count), f"{p50:.2f}", f"{p95:.2f}", f"{maximum:.2f}")
+            for column, value in enumerate(values):
+                self.latency_table.setItem(row_index, column, QTableWidgetItem(value))
+
+        slow = profiler.slow_queries()
+        self.slow_table.setRowCount(len(slow))
+        for row_index, sample in enumerate(slow):
+            values = (datetime.fromtimestamp(sample["ts"]).strftime("%H:%M:%S"), f"{sample['ms']:.1f}",
+                      str(sample["rows"]), sample["sql"], "\n".join(sample["plan"]))
+            for column, value in enumerate(values):
+                self.slow_table.setItem(row_index, column, QTableWidgetItem(value))
+        self.slow_table.resizeRowsToContents()
+
+    def reset(self):
+        if profiling.profiler is not None:
+            profiling.profiler.reset()
+        self.refresh()
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        event.accept()
@@ -1,21 +1,46 @@
 # gui.py
 import sys
-from PyQt5.QtCore import QDate
-from PyQt5.QtWidgets import QApplication, QLabel, QMainWindow, QPushButton, QLineEdit, QVBoxLayout, QWidget, QMessageBox, QTableWidget, QTableWidgetItem, QComboBox, QDateEdit
+from PyQt5.QtCore import QDate, QTimer
+from PyQt5.QtWidgets import QApplication, QLabel, QMainWindow, QPushButton, QLineEdit, QVBoxLayout, QWidget, QMessageBox, QTableWidget, QTableWidgetItem, QTableView, QComboBox, QDateEdit, QProgressBar
 from database import Database
-from utils.export_to_csv import export_to_csv
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
+from records_model import RecordsTableModel
+from db_worker import DbWorker
+from utils.export_to_csv import export_to_csv_stream
+from utils.scheduler import RegularExpenseScheduler
+from utils import profiling
 from datetime import datetime, timedelta
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 
+DB_THREADS = 4
+
+# matplotlib и reportlab импортируются при первом построении диаграммы или
+# отчета: их импорт занимает большую часть времени запуска
+
+
+def _figure_canvas():
+    from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+    from matplotlib.figure import Figure
+    return Figure, FigureCanvasQTAgg
+
+
+# При FINANCE_PROFILE=1 замеряется время каждого обработчика окна
+@profiling.instrument("slot", exclude=("get_period_bounds",), trim_args=True)
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
 
-        # Инициализация базы данных
-        self.db = Database()
+        # Инициализация базы данных. WAL позволяет фоновым запросам читать,
+        # не дожидаясь окончания записи. Свободных соединений чтения столько
+        # же, сколько фоновых потоков, и одно для главного потока
+        self.db = Database(wal=True, synchronous="NORMAL", read_connections=DB_THREADS + 1)
+
+        # Запросы к базе выполняются в фоновых потоках
+        self.worker = DbWorker(self, max_threads=DB_THREADS)
+        self.busy_indicator = QProgressBar(self)
+        self.busy_indicator.setRange(0, 0)  # Бесконечный индикатор
+        self.busy_indicator.setMaximumWidth(150)
+        self.busy_indicator.hide()
+        self.statusBar().addPermanentWidget(self.busy_indicator)
+        self.worker.busy_changed.connect(self.set_busy)
         
         self.set_light_theme()
 
@@ -54,9 +79,12 @@ class MainWindow(QMainWindow):
         self.layout.addWidget(self.add_button)
 
         # Таблица для отображения записей
-        self.table = QTableWidget(self)
-        self.table.setColumnCount(5)  # 5 столбца: ID, Категория, Сумма, Дата
-        self.table.setHorizontalHeaderLabels(["ID", "Категория", "Сумма", "Дата", "Тип"])
+        # Строки подгружаются из базы по мере прокрутки (см. RecordsTableModel)
+        self.records_model = RecordsTableModel(self.db, parent=self)
+        self.table = QTableView(self)
+        self.table.setModel(self.records_model)
+        self.table.setSelectionBehavior(QTableView.SelectRows)
+        self.table.setColumnHidden(0, True)  # Скрыть колонку ID
         self.layout.addWidget(self.table)
 
         # Кнопка для удаления записи
@@ -91,12 +119,18 @@ class MainWindow(QMainWindow):
 
         self.line_chart_button = QPushButton("Показать график расходов по времени", self)
         self.line_chart_button.clicked.connect(self.show_line_chart)
+        self.line_chart_window = None
         self.layout.addWidget(self.line_chart_button)
         
         self.regular_expenses_button = QPushButton("Настроить регулярные расходы", self)
         self.regular_expenses_button.clicked.connect(self.open_regular_expenses_window)
         self.layout.addWidget(self.regular_expenses_button)
         
+        # Очередь регулярных платежей и таймер их проведения
+        self.scheduler = RegularExpenseScheduler(self.db)
+        self.regular_expenses_timer = QTimer(self)
+        self.regular_expenses_timer.setSingleShot(True)
+        self.regular_expenses_timer.timeout.connect(self.check_regular_expenses)
         self.check_regular_expenses()
         
         self.report_button = QPushButton("Создать отчет", self)
@@ -111,6 +145,13 @@ class MainWindow(QMainWindow):
         self.search_input.setPlaceholderText("Введите категорию, сумму или дату")
         self.layout.addWidget(self.search_input)
 
+        # Поиск по мере ввода: запрос уходит после короткой паузы в наборе
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.live_search)
+        self.search_input.textChanged.connect(self.search_timer.start)
+
         self.search_button = QPushButton("Найти", self)
         self.search_button.clicked.connect(self.search_records)
         self.layout.addWidget(self.search_button)
@@ -136,8 +177,24 @@ class MainWindow(QMainWindow):
         self.theme_selector.currentTextChanged.connect(self.change_theme)
         self.layout.addWidget(self.theme_selector)
 
+        if profiling.profiler is not None:
+            self.diagnostics_button = QPushButton("Диагностика", self)
+            self.diagnostics_button.clicked.connect(self.open_diagnostics_window)
+            self.layout.addWidget(self.diagnostics_button)
+
         
         
+    def set_busy(self, busy):
+        if busy:
+            self.busy_indicator.show()
+            self.statusBar().showMessage("Загрузка данных...")
+        else:
+            self.busy_indicator.hide()
+            self.statusBar().clearMessage()
+
+    def show_db_error(self, message):
+        QMessageBox.warning(self, "Ошибка", f"Ошибка при работе с базой данных: {message}")
+
     def load_categories(self):
         try:
             categories = self.db.get_categories()
@@ -157,53 +214,35 @@ class MainWindow(QMainWindow):
         
         record_type_db = "expense" if record_type == "расход" else "income"
 
-        # Сохраняем данные в базу
-        self.db.add_record(category, float(amount), record_type)
-
-        # Обновляем таблицу
-        self.load_records()
+        # Сохраняем данные в базу и добавляем новую строку в таблицу
+        row = self.db.add_record(category, float(amount), record_type_db)
+        self.records_model.insert_record(row)
+        if self.category_filter.findText(category) == -1:
+            self.category_filter.addItem(category)
 
         # Очистка полей ввода
         self.category_input.clear()
         self.amount_input.clear()
 
     def load_records(self, category_filter=None, start_date=None, end_date=None):
-        query = "SELECT id, category, amount, date, type FROM records WHERE 1=1"
-        params = []
-
-        if category_filter and category_filter != "Все категории":
-            query += " AND category = ?"
-            params.append(category_filter)
-
-        if start_date:
-            query += " AND date >= ?"
-            params.append(start_date)
-
-        if end_date:
-            query += " AND date <= ?"
-            params.append(end_date)
-
-        if hasattr(self, 'type_filter') and self.type_filter.currentText() == "Только доходы": query += " AND type = 'income'"
-        elif hasattr(self, 'type_filter') and self.type_filter.currentText() == "Только расходы": query += " AND type = 'expense'"
-
-        self.db.cursor.execute(query, params)
-        records = self.db.cursor.fetchall()
-
-        # Устанавливаем количество строк в таблице
-        self.table.setRowCount(len(records))
-
-        for row_index, row_data in enumerate(records):
-            # row_data: (id, category, amount, date, type)
-            self.table.setItem(row_index, 0, QTableWidgetItem(str(row_data[0])))  # ID
-            self.table.setItem(row_index, 1, QTableWidgetItem(row_data[1]))  # Категория
-            self.table.setItem(row_index, 2, QTableWidgetItem(f"{row_data[2]:.2f}"))  # Сумма
-            self.table.setItem(row_index, 3, QTableWidgetItem(row_data[3]))  # Дата
-
-            # Обработка типа записи, если он существует
-            record_type = row_data[4] if len(row_data) > 4 else "N/A"
-            self.table.setItem(row_index, 4, QTableWidgetItem(record_type.capitalize()))  # Тип
-
-        self.table.setColumnHidden(0, True)  # Скрыть колонку ID
+        record_type = None
+        if hasattr(self, 'type_filter') and self.type_filter.currentText() == "Только доходы": record_type = "income"
+        elif hasattr(self, 'type_filter') and self.type_filter.currentText() == "Только расходы": record_type = "expense"
+
+        filters = RecordsTableModel.clean_filters({
+            "category_filter": category_filter,
+            "start_date": start_date,
+            "end_date": end_date,
+            "record_type": record_type,
+        })
+
+        # Первая страница загружается в фоне; повторный вызов отменяет предыдущий
+        self.worker.submit(
+            "records", self.db.get_records_page,
+            args=(0, self.records_model.page_size), kwargs=filters,
+            on_result=lambda rows: self.records_model.set_rows(filters, rows),
+            on_error=self.show_db_error,
+        )
 
 
     def filter_records(self):
@@ -213,55 +252,59 @@ class MainWindow(QMainWindow):
 
         self.load_records(category_filter=category, start_date=start_date, end_date=end_date)
 
+    def reload_records(self):
+        # Перезагрузка первой страницы с теми же фильтрами или поиском, что сейчас в таблице
+        filters = dict(self.records_model.filters)
+        self.worker.submit(
+            "records", self.db.get_records_page,
+            args=(0, self.records_model.page_size), kwargs=filters,
+            on_result=lambda rows: self.records_model.set_rows(filters, rows),
+            on_error=self.show_db_error,
+        )
+
     def delete_record(self):
         # Получаем текущую строку
-        selected_row = self.table.currentRow()
+        selected_row = self.table.currentIndex().row()
 
         if selected_row == -1:
             QMessageBox.warning(self, "Ошибка", "Пожалуйста, выберите запись для удаления!")
             return
 
-        # Получаем ID записи из первой колонки (скрытый идентификатор)
-        record_id = int(self.table.item(selected_row, 0).text())
+        # Получаем ID записи из модели (скрытый идентификатор)
+        record_id = self.records_model.record_id(selected_row)
 
-        # Удаляем запись из базы данных
+        # Удаляем запись из базы данных и убираем ее строку из таблицы
         self.db.delete_record(record_id)
-
-        # Обновляем таблицу
-        self.load_records()
+        self.records_model.remove_record(record_id)
 
     def export_records(self):
-        records = self.db.get_all_records()
+        # Экспорт данных потоком, без загрузки всей таблицы в память
+        def export():
+            return export_to_csv_stream(self.db.iter_filtered_records())
 
-        if not records:
-            QMessageBox.warning(self, "Ошибка", "Нет данных для экспорта!")
-            return
+        def on_result(count):
+            if not count:
+                QMessageBox.warning(self, "Ошибка", "Нет данных для экспорта!")
+                return
+            QMessageBox.information(self, "Успех", "Данные успешно экспортированы в 'finance_records.csv'!")
 
-        # Экспорт данных
-        export_to_csv(records)
-        QMessageBox.information(self, "Успех", "Данные успешно экспортированы в 'finance_records.csv'!")
+        self.worker.submit("export_csv", export, on_result=on_result, on_error=self.show_db_error)
 
     def show_chart(self):
-        records = self.db.get_all_records()
+        # Суммы по категориям считаются в базе в фоновом потоке
+        self.worker.submit("chart", self.db.sum_by_category,
+                           on_result=self.draw_chart, on_error=self.show_db_error)
 
-        if not records:
+    def draw_chart(self, totals):
+        if not totals:
             QMessageBox.warning(self, "Ошибка", "Нет данных для построения диаграммы!")
             return
 
-        # Группируем данные по категориям
-        categories = {}
-        for record in records:
-            category = record[1]  # Категория
-            amount = record[2]    # Сумма
-            if category in categories:
-                categories[category] += amount
-            else:
-                categories[category] = amount
-
         # Построение диаграммы
-        labels = list(categories.keys())
-        sizes = list(categories.values())
+        labels = [category for category, _ in totals]
+        sizes = [amount for _, amount in totals]
 
+        Figure, FigureCanvas = _figure_canvas()
         fig = Figure()
         canvas = FigureCanvas(fig)
         ax = fig.add_subplot(111)
@@ -280,50 +323,14 @@ class MainWindow(QMainWindow):
         chart_window.show()
 
     def show_line_chart(self):
-        records = self.db.get_all_records()
-
-        if not records:
-            QMessageBox.warning(self, "Ошибка", "Нет данных для построения графика!")
-            return
-
-        # Группируем данные по датам
-        dates = {}
-        for record in records:
-            date = record[3].split(" ")[0]  # Учитываем только дату, без времени
-            amount = record[2]             # Сумма
-            if date in dates:
-                dates[date] += amount
-            else:
-                dates[date] = amount
-
-        # Сортируем данные по дате
-        sorted_dates = sorted(dates.items())
-
-        # Данные для графика
-        x_data = [date for date, _ in sorted_dates]
-        y_data = [amount for _, amount in sorted_dates]
-
-        # Построение графика
-        fig = Figure()
-        canvas = FigureCanvas(fig)
-        ax = fig.add_subplot(111)
-        ax.plot(x_data, y_data, marker="o")
-        ax.set_title("Расходы по времени")
-        ax.set_xlabel("Дата")
-        ax.set_ylabel("Сумма")
-        ax.grid(True)
-        fig.autofmt_xdate()
-
-        # Отображение графика в новом окне
-        chart_window = QMainWindow(self)
-        chart_window.setWindowTitle("График расходов по времени")
-        chart_layout = QVBoxLayout()
-        chart_widget = QWidget()
-        chart_widget.setLayout(chart_layout)
-        chart_layout.addWidget(canvas)
-        chart_window.setCentralWidget(chart_widget)
-        chart_window.resize(800, 600)
-        chart_window.show()
+        # Окно графика создается один раз (вместе с импортом matplotlib);
+        # при повторном открытии в нем обновляются только данные
+        if self.line_chart_window is None:
+            from chart_window import LineChartWindow
+            self.line_chart_window = LineChartWindow(self.db, self.worker, self)
+        self.line_chart_window.reload()
+        self.line_chart_window.show()
+        self.line_chart_window.raise_()
 
     def open_regular_expenses_window(self):
         self.regular_expenses_window = QMainWindow(self)
@@ -382,6 +389,7 @@ class MainWindow(QMainWindow):
             self.db.add_regular_expense(category, float(amount), interval, next_payment_date)
             QMessageBox.information(self, "Успех", "Регулярный расход добавлен!")
             self.load_regular_expenses()
+            self.reload_regular_expenses()
             category_input.clear()
             amount_input.clear()
 
@@ -398,29 +406,28 @@ class MainWindow(QMainWindow):
 
 
     def check_regular_expenses(self):
+        # Проводим наступившие платежи (в том числе пропущенные) в фоне
+        self.regular_expenses_timer.stop()
+        self.worker.submit("regular_expenses", self.scheduler.run_due,
+                           on_result=self.on_regular_expenses_posted, on_error=self.show_db_error)
+
+    def on_regular_expenses_posted(self, inserted):
+        if inserted:
+            self.reload_records()
+        if self.scheduler.has_due():
+            # За один проход проводится ограниченное число платежей
+            self.check_regular_expenses()
+            return
 
-        today = datetime.now().strftime("%Y-%m-%d")
-        due_expenses = self.db.get_due_regular_expenses(today)
-
-        for expense in due_expenses:
-            expense_id, category, amount, interval, next_payment_date = expense
-
-            # Добавляем расход в основную таблицу
-            self.db.add_record(category, amount)
-
-            # Рассчитываем новую дату платежа
-            if interval == "ежедневно":
-                new_date = datetime.strptime(next_payment_date, "%Y-%m-%d") + timedelta(days=1)
-            elif interval == "еженедельно":
-                new_date = datetime.strptime(next_payment_date, "%Y-%m-%d") + timedelta(weeks=1)
-            elif interval == "ежемесячно":
-                new_date = datetime.strptime(next_payment_date, "%Y-%m-%d").replace(day=1) + timedelta(days=31)
-                new_date = new_date.replace(day=1)
+        # Следующая проверка — к дате ближайшего платежа, но не реже раза в час
+        seconds = self.scheduler.seconds_until_next()
+        if seconds is not None:
+            self.regular_expenses_timer.start(int(min(seconds + 1, 3600) * 1000))
 
-            self.db.update_next_payment_date(expense_id, new_date.strftime("%Y-%m-%d"))
+    def reload_regular_expenses(self):
+        self.scheduler.reload()
+        self.check_regular_expenses()
 
-        self.load_records()
-        
     def delete_regular_expense(self):
         # Получаем выбранную строку
         selected_row = self.regular_expenses_table.currentRow()
@@ -433,8 +440,8 @@ class MainWindow(QMainWindow):
         expense_id = int(self.regular_expenses_table.item(selected_row, 0).text())
 
         # Удаляем запись из базы данных
-        self.db.cursor.execute("DELETE FROM regular_expenses WHERE id = ?", (expense_id,))
-        self.db.connection.commit()
+        self.db.delete_regular_expense(expense_id)
+        self.reload_regular_expenses()
 
         # Обновляем таблицу
         self.load_regular_expenses()
@@ -450,7 +457,7 @@ class MainWindow(QMainWindow):
 
         # Заполняем таблицу данными
         for row_index, expense in enumerate(regular_expenses):
-            expense_id, category, amount, interval, next_payment_date = expense
+            expense_id, category, amount, interval, next_payment_date, _ = expense
             self.regular_expenses_table.setItem(row_index, 0, QTableWidgetItem(str(expense_id)))  # ID
             self.regular_expenses_table.setItem(row_index, 1, QTableWidgetItem(category))        # Категория
             self.regular_expenses_table.setItem(row_index, 2, QTableWidgetItem(f"{amount:.2f}")) # Сумма
@@ -481,30 +488,23 @@ class MainWindow(QMainWindow):
         # Функция генерации отчета
         def generate_report():
             period = period_input.currentText()
-            records = self.get_records_by_period(period)
+            start_date, end_date = self.get_period_bounds(period)
+            self.worker.submit("report", self.db.sum_by_category, args=(start_date, end_date),
+                               on_result=fill_report, on_error=self.show_db_error)
 
-            if not records:
+        def fill_report(categories):
+            if not categories:
                 QMessageBox.warning(self, "Ошибка", "Нет данных за выбранный период!")
                 return
 
-            # Группируем данные по категориям
-            categories = {}
-            total = 0
-            for record in records:
-                category = record[1]  # Категория
-                amount = record[2]    # Сумма
-                total += amount
-                if category in categories:
-                    categories[category] += amount
-                else:
-                    categories[category] = amount
+            total = sum(amount for _, amount in categories)
 
             # Заполняем таблицу отчетов
             report_area.setRowCount(len(categories))
-            for row_index, (category, amount) in enumerate(categories.items()):
+            for row_index, (category, amount) in enumerate(categories):
                 report_area.setItem(row_index, 0, QTableWidgetItem(category))         # Категория
                 report_area.setItem(row_index, 1, QTableWidgetItem(f"{amount:.2f}"))  # Сумма
-            report_area.setItem(row_index, 2, QTableWidgetItem(f"{(amount / total) * 100:.2f}%"))  # Процент
+                report_area.setItem(row_index, 2, QTableWidgetItem(f"{(amount / total) * 100:.2f}%"))  # Процент
 
         generate_button.clicked.connect(generate_report)
 
@@ -515,6 +515,10 @@ class MainWindow(QMainWindow):
         self.report_window.show()
 
     def get_records_by_period(self, period):
+        start_date, end_date = self.get_period_bounds(period)
+        return self.db.get_records_by_period(start_date, end_date)
+
+    def get_period_bounds(self, period):
         today = datetime.now().strftime("%Y-%m-%d")
         if period == "Сегодня":
             start_date = end_date = today
@@ -530,7 +534,7 @@ class MainWindow(QMainWindow):
         else:
             start_date = end_date = today  # Default case
 
-        return self.db.get_records_by_period(start_date, end_date)
+        return start_date, end_date
     
     def set_light_theme(self):
         self.setStyleSheet("""
@@ -543,7 +547,7 @@ class MainWindow(QMainWindow):
                 border: 1px solid #CCCCCC;
                 padding: 5px;
             }   
-            QLineEdit, QComboBox, QTableWidget {
+            QLineEdit, QComboBox, QTableView {
                 background-color: #FFFFFF;
                 color: #000000;
                 border: 1px solid #CCCCCC;
@@ -564,7 +568,7 @@ class MainWindow(QMainWindow):
                 border: 1px solid #444444;
                 padding: 5px;
             }
-            QLineEdit, QComboBox, QTableWidget {
+            QLineEdit, QComboBox, QTableView {
                 background-color: #3C3C3C;
                 color: #FFFFFF;
                 border: 1px solid #555555;
@@ -585,7 +589,7 @@ class MainWindow(QMainWindow):
                 border: 1px solid #FF69B4;
                 padding: 5px;
             }
-            QLineEdit, QComboBox, QTableWidget {
+            QLineEdit, QComboBox, QTableView {
                 background-color: #FFF8DC;
                 color: #000000;
                 border: 1px solid #FFD700;
@@ -606,7 +610,7 @@ class MainWindow(QMainWindow):
                 border: 1px solid #66BB6A;
                 padding: 5px;
             }
-            QLineEdit, QComboBox, QTableWidget {
+            QLineEdit, QComboBox, QTableView {
                 background-color: #C8E6C9;
                 color: #000000;
                 border: 1px solid #81C784;
@@ -627,7 +631,7 @@ class MainWindow(QMainWindow):
                 border: 1px solid #42A5F5;
                 padding: 5px;
             }
-            QLineEdit, QComboBox, QTableWidget {
+            QLineEdit, QComboBox, QTableView {
                 background-color: #BBDEFB;
                 color: #000000;
                 border: 1px solid #64B5F6;
@@ -648,7 +652,7 @@ class MainWindow(QMainWindow):
                 border: 1px solid #E57373;
                 padding: 5px;
             }
-            QLineEdit, QComboBox, QTableWidget {
+            QLineEdit, QComboBox, QTableView {
                 background-color: #FFCDD2;
                 color: #000000;
                 border: 1px solid #EF9A9A;
@@ -666,6 +670,20 @@ class MainWindow(QMainWindow):
         elif theme == "Синяя тема": self.set_blue_theme()
         elif theme == "Красная тема": self.set_red_theme()
 
+    def live_search(self):
+        search_term = self.search_input.text().strip()
+        if not search_term:
+            self.load_records()
+            return
+
+        filters = {"search_term": search_term}
+        self.worker.submit(
+            "records", self.db.get_records_page,
+            args=(0, self.records_model.page_size), kwargs=filters,
+            on_result=lambda rows: self.records_model.set_rows(filters, rows),
+            on_error=self.show_db_error,
+        )
+
     def search_records(self):
         search_term = self.search_input.text().strip()
 
@@ -673,68 +691,49 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Введите критерий для поиска!")
             return
 
-        # Выполняем поиск в базе данных
-        records = self.db.search_records(search_term)
+        # Выполняем поиск в базе данных в фоне и показываем результат в той же модели
+        filters = {"search_term": search_term}
 
-        if not records:
-            QMessageBox.information(self, "Результат поиска", "Записи не найдены.")
-            self.load_records()  # Загружаем все записи
-            return
+        def on_result(rows):
+            if not rows:
+                QMessageBox.information(self, "Результат поиска", "Записи не найдены.")
+                self.load_records()  # Загружаем все записи
+                return
+            self.records_model.set_rows(filters, rows)
 
-        # Отображаем результаты в таблице
-        self.table.setRowCount(len(records))
-        for row_index, row_data in enumerate(records):
-            self.table.setItem(row_index, 0, QTableWidgetItem(str(row_data[0])))  # ID
-            self.table.setItem(row_index, 1, QTableWidgetItem(row_data[1]))  # Категория
-            self.table.setItem(row_index, 2, QTableWidgetItem(f"{row_data[2]:.2f}"))  # Сумма
-            self.table.setItem(row_index, 3, QTableWidgetItem(row_data[3]))  # Дата
+        self.worker.submit(
+            "records", self.db.get_records_page,
+            args=(0, self.records_model.page_size), kwargs=filters,
+            on_result=on_result, on_error=self.show_db_error,
+        )
 
     def export_to_pdf(self):
-        # Получаем данные из таблицы
-        row_count = self.table.rowCount()
-        if row_count == 0:
-            QMessageBox.warning(self, "Ошибка", "Нет данных для экспорта!")
-            return
+        # PDF строится по текущей выборке таблицы в отдельном процессе,
+        # который сам читает записи из базы
+        from utils.pdf_report import render_in_process
 
-        # Создаем PDF-файл
         file_name = "finance_report.pdf"
-        pdf = canvas.Canvas(file_name, pagesize=letter)
-        pdf.setTitle("Отчет по финансам")
-
-        # Заголовок
-        pdf.setFont("Helvetica-Bold", 16)
-        pdf.drawString(200, 750, "Отчет по финансам")
-
-        # Таблица
-        pdf.setFont("Helvetica", 10)
-        start_y = 700
-        x_offsets = [50, 150, 250, 350, 450]  # Колонки: Категория, Сумма, Дата, Тип
-        headers = ["Категория", "Сумма", "Дата", "Тип"]
-    
-        # Рисуем заголовки
-        for i, header in enumerate(headers): pdf.drawString(x_offsets[i], start_y, header)
 
-        # Рисуем строки данных
-        y = start_y - 20
-        for row in range(row_count):
-            if y < 50:  # Если место на странице закончилось, создаем новую
-                pdf.showPage()
-                pdf.setFont("Helvetica", 10)
-                y = 750
+        def on_result(count):
+            if not count:
+                QMessageBox.warning(self, "Ошибка", "Нет данных для экспорта!")
+                return
+            QMessageBox.information(self, "Успех", f"Отчет успешно экспортирован в {file_name}!")
 
-            for col in range(1, 5):  # Пропускаем скрытый ID
-                item = self.table.item(row, col)
-                if item:
-                    pdf.drawString(x_offsets[col - 1], y, item.text())
+        self.worker.submit("export_pdf", render_in_process,
+                           args=(self.db.db_name, file_name, dict(self.records_model.filters)),
+                           on_result=on_result, on_error=self.show_db_error)
 
-            y -= 20
 
-        pdf.save()
+    def open_diagnostics_window(self):
+        from diagnostics_window import DiagnosticsWindow
+
+        self.diagnostics_window = DiagnosticsWindow(self.db, self)
+        self.diagnostics_window.show()
 
-        QMessageBox.information(self, "Успех", f"Отчет успешно экспортирован в {file_name}!")
-        
-        
     def closeEvent(self, event):
+        self.regular_expenses_timer.stop()
+        self.worker.wait()
         self.db.close()
         event.accept()
 
@@ -0,0 +1,126 @@
+# records_model.py
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+
+class RecordsTableModel(QAbstractTableModel):
+    # Модель для таблицы записей: строки подгружаются из базы страницами
+    # по мере прокрутки, вместо создания QTableWidgetItem на каждую ячейку
+    HEADERS = ["ID", "Категория", "Сумма", "Дата", "Тип"]
+
+    def __init__(self, db, page_size=500, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.page_size = page_size
+        self.filters = {}
+        self.rows = []
+        self.last_id = 0
+        self.has_more = True
+
+    @staticmethod
+    def clean_filters(filters):
+        return {key: value for key, value in filters.items() if value}
+
+    def set_rows(self, filters, rows):
+        # Первая страница может быть загружена заранее (например, в фоновом потоке)
+        self.beginResetModel()
+        self.filters = self.clean_filters(filters)
+        self.rows = list(rows)
+        self.last_id = self.rows[-1][0] if self.rows else 0
+        self.has_more = len(self.rows) == self.page_size
+        self.endResetModel()
+
+    def _load_page(self):
+        page = self.db.get_records_page(self.last_id, self.page_size, **self.filters)
+        if page:
+            self.last_id = page[-1][0]
+        self.has_more = len(page) == self.page_size
+        return page
+
+    def _position(self, record_id):
+        # Двоичный поиск по id: строки отсортированы по возрастанию id
+        low, high = 0, len(self.rows)
+        while low < high:
+            middle = (low + high) // 2
+            if self.rows[middle][0] < record_id:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def insert_record(self, row):
+        # Добавленная запись вставляется одной строкой, без перезагрузки
+        # таблицы. Если она не подходит под фильтр или попадает за последнюю
+        # загруженную страницу (придет с fetchMore), модель не меняется
+        if self.filters and not self.db.record_matches(row[0], **self.filters):
+            return False
+        position = self._position(row[0])
+        if position == len(self.rows) and self.has_more:
+            return False
+
+        self.beginInsertRows(QModelIndex(), position, position)
+        self.rows.insert(position, tuple(row))
+        if position == len(self.rows) - 1:
+            self.last_id = row[0]
+        self.endInsertRows()
+        return True
+
+    def remove_record(self, record_id):
+        # Удаленная запись убирается из модели одной строкой
+        position = self._position(record_id)
+        if position == len(self.rows) or self.rows[position][0] != record_id:
+            return False
+
+        self.beginRemoveRows(QModelIndex(), position, position)
+        del self.rows[position]
+        self.endRemoveRows()
+        return True
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return self.has_more
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or not self.has_more:
+            return
+
+        page = self._load_page()
+        if not page:
+            return
+
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+        self.rows.extend(page)
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+
+        # row: (id, category, amount, date, type)
+        row = self.rows[index.row()]
+        column = index.column()
+        if column == 0:
+            return str(row[0])
+        if column == 2:
+            return f"{row[2]:.2f}"
+        if column == 4:
+            return (row[4] or "N/A").capitalize()
+        return row[column]
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def record_id(self, row):
+        return self.rows[row][0]
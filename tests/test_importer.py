@@ -0,0 +1,38 @@
+import pytest
+
+from utils.importer import QIF_DATE_FORMATS, DateParser, _qif_date, normalize_rows, parse_amount
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1,234.56", 1234.56),
+    ("1.234,56", 1234.56),
+    ("1 234,56 руб.", 1234.56),
+    ("-1234.56", -1234.56),
+])
+def test_parse_amount_separators(value, expected):
+    assert parse_amount(value) == expected
+
+
+def test_date_parser_keeps_day_month_order():
+    parse_date = DateParser()
+    assert parse_date("13/02/2024") == "2024-02-13 00:00:00"
+    # После даты с днем первым 01/02 тоже читается как 1 февраля
+    assert parse_date("01/02/2024") == "2024-02-01 00:00:00"
+    with pytest.raises(ValueError):
+        parse_date("02/13/2024")
+
+
+def test_qif_dates_are_month_first():
+    parse_date = DateParser(QIF_DATE_FORMATS)
+    assert parse_date(_qif_date("1/31'24")) == "2024-01-31 00:00:00"
+    assert parse_date(_qif_date(" 1/ 5' 4")) == "2004-01-05 00:00:00"
+    assert parse_date(_qif_date("02/01/2024")) == "2024-02-01 00:00:00"
+
+
+def test_normalize_rows_rejects_non_finite_amounts():
+    stats = {"errors": 0}
+    rows = [{"category": "Еда", "amount": amount, "date": "2024-01-31"}
+            for amount in ("nan", "inf", "-Infinity", "1e400", "100")]
+    records = list(normalize_rows(rows, stats=stats))
+    assert [record[1] for record in records] == [100.0]
+    assert stats["errors"] == 4
@@ -0,0 +1,90 @@
+# utils/analytics.py
+# Аналитика по записям на массивах NumPy.
+#
+# Записи загружаются из базы в три столбца: день, id категории и сумма в
+# копейках (int64). Группировки и накопительные суммы считаются
+# векторно, без циклов по строкам на Python. Суммы остаются целыми числами
+# копеек, в рубли они переводятся только для вывода (to_rubles).
+from operator import itemgetter
+
+import numpy as np
+
+
+class RecordColumns:
+    # days — datetime64[D] (или целые дни с 1970-01-01, как в снимке
+    # utils/snapshot.py), category_ids — int32, amounts — суммы в копейках,
+    # int64; categories — словарь id категории -> название
+    def __init__(self, days, category_ids, amounts, categories):
+        self.days = days
+        self.category_ids = category_ids
+        self.amounts = amounts
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.amounts)
+
+
+def load_columns(db, start_date=None, end_date=None, record_type=None, chunk_size=100000):
+    # Читает записи порциями и собирает их в массивы
+    categories = dict(db.get_all_categories())
+    days, category_ids, amounts = [], [], []
+    for rows in db.iter_amount_chunks(start_date, end_date, record_type, chunk_size):
+        days.append(np.array(list(map(itemgetter(0), rows)), dtype="datetime64[D]"))
+        category_ids.append(np.array(list(map(itemgetter(1), rows)), dtype=np.int32))
+        amounts.append(np.array(list(map(itemgetter(2), rows)), dtype=np.int64))
+
+    if not amounts:
+        return RecordColumns(np.array([], dtype="datetime64[D]"), np.array([], dtype=np.int32),
+                             np.array([], dtype=np.int64), categories)
+    return RecordColumns(np.concatenate(days), np.concatenate(category_ids), np.concatenate(amounts),
+                         categories)
+
+
+def _group_sum(keys, amounts, size):
+    # Сумма amounts по целочисленным ключам 0..size-1. bincount складывает в
+    # float64, который точно хранит целые до 2**53 копеек (~9 * 10**13 руб.)
+    totals = np.bincount(keys, weights=amounts, minlength=size)
+    counts = np.bincount(keys, minlength=size)
+    return np.rint(totals).astype(np.int64), counts
+
+
+def sum_by_category(columns):
+    # Возвращает (названия категорий, суммы в копейках) по убыванию суммы
+    size = int(columns.category_ids.max()) + 1 if len(columns) else 0
+    totals, counts = _group_sum(columns.category_ids, columns.amounts, size)
+    order = np.argsort(-totals, kind="stable")
+    order = order[counts[order] > 0]
+    return [columns.categories[category_id] for category_id in order.tolist()], totals[order]
+
+
+def _sum_by_period(periods, amounts):
+    # periods — целые номера дней или месяцев; возвращает только периоды с записями
+    if not len(periods):
+        return periods, np.array([], dtype=np.int64)
+    first = periods.min()
+    totals, counts = _group_sum(periods - first, amounts, periods.max() - first + 1)
+    present = np.nonzero(counts)[0]
+    return present + first, totals[present]
+
+
+def sum_by_day(columns):
+    # Возвращает (дни datetime64[D], суммы в копейках) по возрастанию дня
+    days, totals = _sum_by_period(columns.days.astype(np.int64), columns.amounts)
+    return days.astype("datetime64[D]"), totals
+
+
+def sum_by_month(columns):
+    # Возвращает (месяцы datetime64[M], суммы в копейках) по возрастанию месяца
+    months = columns.days.astype("datetime64[D]").astype("datetime64[M]")
+    months, totals = _sum_by_period(months.astype(np.int64), columns.amounts)
+    return months.astype("datetime64[M]"), totals
+
+
+def cumulative_by_day(columns):
+    # Накопительный итог по дням: (дни, суммы с начала периода в копейках)
+    days, totals = sum_by_day(columns)
+    return days, np.cumsum(totals)
+
+
+def to_rubles(cents):
+    return np.asarray(cents) / 100
@@ -0,0 +1,177 @@
+# utils/batch_report.py
+# Пакетный отчет: выписки по месяцам, кварталам или годам за много лет
+# сразу.
+#
+# Период делится на отрезки, каждый отрезок считается независимо по самим
+# записям: суммы и количество по категориям, медиана и 90-й перцентиль
+# расходов, крупнейшие траты. Отрезки распределяются по процессам
+# ProcessPoolExecutor; каждый процесс открывает свое соединение к базе
+# только для чтения, поэтому процессы не ждут друг друга и ничего не могут
+# изменить. Результаты собираются в один набор данных в порядке отрезков.
+# Суммы считаются в копейках и переводятся в рубли только при слиянии.
+import heapq
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+from database import Database
+
+STEPS = ("month", "quarter", "year")
+STEP_MONTHS = {"month": 1, "quarter": 3, "year": 12}
+LARGEST_EXPENSES = 5
+
+# Соединение процесса-исполнителя, открывается в _init_worker
+_worker_db = None
+
+
+def split_periods(start_date, end_date, step="month"):
+    # Список (метка, первый день, последний день); крайние отрезки
+    # обрезаются по границам периода
+    if step not in STEPS:
+        raise ValueError(f"Шаг отчета: {', '.join(STEPS)}")
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    months = STEP_MONTHS[step]
+
+    periods = []
+    first = start.replace(month=start.month - (start.month - 1) % months, day=1)
+    while first <= end:
+        month_index = first.year * 12 + first.month - 1 + months
+        following = date(month_index // 12, month_index % 12 + 1, 1)
+        if step == "month":
+            label = f"{first.year}-{first.month:02d}"
+        elif step == "quarter":
+            label = f"{first.year}-Q{(first.month - 1) // 3 + 1}"
+        else:
+            label = str(first.year)
+        periods.append((label, max(first, start).isoformat(), min(following - timedelta(days=1), end).isoformat()))
+        first = following
+    return periods
+
+
+def _percentile(sorted_amounts, fraction):
+    if not sorted_amounts:
+        return 0
+    return sorted_amounts[min(len(sorted_amounts) - 1, int(fraction * len(sorted_amounts)))]
+
+
+def summarize_period(db, period):
+    # Выписка за один отрезок (метка, первый день, последний день)
+    label, start_date, end_date = period
+    categories = dict(db.get_all_categories())
+    statement = {"period": label, "start": start_date, "end": end_date}
+    for record_type in ("income", "expense"):
+        totals = {}
+        amounts = []
+        largest = []
+        for rows in db.iter_amount_chunks(start_date, end_date, record_type):
+            for day, category_id, amount in rows:
+                totals[category_id] = totals.get(category_id, 0) + amount
+            amounts.extend(row[2] for row in rows)
+            if record_type == "expense":
+                largest = heapq.nlargest(LARGEST_EXPENSES, largest + rows, key=lambda row: row[2])
+
+        statement[record_type] = {categories[category_id]: total for category_id, total in totals.items()}
+        statement[f"{record_type}_count"] = len(amounts)
+        if record_type == "expense":
+            amounts.sort()
+            statement["expense_median"] = _percentile(amounts, 0.5)
+            statement["expense_p90"] = _percentile(amounts, 0.9)
+            statement["largest_expenses"] = [(categories[category_id], amount, day)
+                                             for day, category_id, amount in largest]
+    return statement
+
+
+def _init_worker(db_name):
+    global _worker_db
+    _worker_db = Database(db_name, read_only=True, query_cache_size=0)
+
+
+def _summarize_in_worker(period):
+    return summarize_period(_worker_db, period)
+
+
+def _to_rubles(cents):
+    return round(cents / 100, 2)
+
+
+def _by_category(totals):
+    # Суммы в рублях по убыванию
+    return {category: _to_rubles(total) for category, total in sorted(totals.items(), key=lambda item: -item[1])}
+
+
+def merge_statements(statements, step):
+    # Один набор данных: выписки по отрезкам и итоги за весь период, суммы
+    # в рублях, категории по убыванию суммы
+    expense_totals = {}
+    income_totals = {}
+    periods = []
+    for statement in statements:
+        for category, total in statement["expense"].items():
+            expense_totals[category] = expense_totals.get(category, 0) + total
+        for category, total in statement["income"].items():
+            income_totals[category] = income_totals.get(category, 0) + total
+
+        income = sum(statement["income"].values())
+        expense = sum(statement["expense"].values())
+        periods.append({
+            "period": statement["period"],
+            "start": statement["start"],
+            "end": statement["end"],
+            "income": _to_rubles(income),
+            "expense": _to_rubles(expense),
+            "balance": _to_rubles(income - expense),
+            "records": statement["income_count"] + statement["expense_count"],
+            "expense_median": _to_rubles(statement["expense_median"]),
+            "expense_p90": _to_rubles(statement["expense_p90"]),
+            "income_by_category": _by_category(statement["income"]),
+            "expense_by_category": _by_category(statement["expense"]),
+            "largest_expenses": [(category, _to_rubles(amount), day)
+                                 for category, amount, day in statement["largest_expenses"]],
+        })
+
+    income = sum(income_totals.values())
+    expense = sum(expense_totals.values())
+    return {
+        "step": step,
+        "periods": periods,
+        "totals": {
+            "income": _to_rubles(income),
+            "expense": _to_rubles(expense),
+            "balance": _to_rubles(income - expense),
+            "records": sum(period["records"] for period in periods),
+            "income_by_category": _by_category(income_totals),
+            "expense_by_category": _by_category(expense_totals),
+        },
+    }
+
+
+def build_batch_report(db_name, start_date=None, end_date=None, step="month", jobs=None):
+    # Без границ берется весь период с записями. jobs — число процессов
+    # (по умолчанию по числу ядер); при jobs=1 или одном отрезке отчет
+    # считается в текущем процессе
+    db_name = os.path.abspath(db_name)
+    db = Database(db_name, read_only=True, query_cache_size=0)
+    try:
+        if start_date is None or end_date is None:
+            first_day, last_day = db.get_date_range()
+            if first_day is None:
+                return merge_statements([], step)
+            start_date = start_date or first_day
+            end_date = end_date or last_day
+        periods = split_periods(start_date, end_date, step)
+
+        jobs = min(jobs or os.cpu_count() or 1, len(periods))
+        if jobs <= 1:
+            return merge_statements([summarize_period(db, period) for period in periods], step)
+    finally:
+        db.close()
+
+    # Процессы запускаются через spawn: отчет строится и из интерфейса, а
+    # форк процесса с Qt и рабочими потоками небезопасен
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context,
+                             initializer=_init_worker, initargs=(db_name,)) as executor:
+        chunksize = max(1, len(periods) // (jobs * 4))
+        statements = list(executor.map(_summarize_in_worker, periods, chunksize=chunksize))
+    return merge_statements(statements, step)
@@ -0,0 +1,84 @@
+# utils/charts.py
+# Подготовка рядов для графика сумм по времени.
+#
+# Суммы по дням (Database.sum_by_day, из итоговых таблиц) собираются в
+# корзины по дням, неделям или месяцам; шаг выбирается по длине периода,
+# чтобы на графике за несколько лет было несколько сотен точек, а не
+# тысячи. Если точек все равно больше, чем пикселей по ширине, ряд
+# прореживается алгоритмом LTTB (Largest-Triangle-Three-Buckets), который
+# сохраняет пики и общую форму линии.
+from datetime import date
+
+RESOLUTIONS = ("day", "week", "month")
+
+# Длина периода в днях, до которой используется шаг по дням и по неделям
+DAY_SPAN = 120
+WEEK_SPAN = 3 * 366
+
+
+def choose_resolution(first_day, last_day):
+    span = (last_day - first_day).days
+    if span <= DAY_SPAN:
+        return "day"
+    if span <= WEEK_SPAN:
+        return "week"
+    return "month"
+
+
+def bucket_start(day, resolution):
+    if resolution == "week":
+        return date.fromordinal(day.toordinal() - day.weekday())
+    if resolution == "month":
+        return day.replace(day=1)
+    return day
+
+
+def bucket_totals(day_totals, resolution="auto"):
+    # day_totals: пары ('YYYY-MM-DD', сумма) по возрастанию даты. Возвращает
+    # шаг и список пар (date начала корзины, сумма)
+    days = [(date.fromisoformat(day), amount) for day, amount in day_totals]
+    if not days:
+        return resolution, []
+    if resolution == "auto":
+        resolution = choose_resolution(days[0][0], days[-1][0])
+
+    buckets = []
+    for day, amount in days:
+        start = bucket_start(day, resolution)
+        if buckets and buckets[-1][0] == start:
+            buckets[-1][1] += amount
+        else:
+            buckets.append([start, amount])
+    return resolution, [(start, round(amount, 2)) for start, amount in buckets]
+
+
+def lttb(points, threshold):
+    # points: пары (x, y) с числовым x по возрастанию. Первая и последняя
+    # точки сохраняются; из каждой корзины между ними берется точка,
+    # образующая наибольший треугольник с выбранной точкой предыдущей
+    # корзины и средней точкой следующей
+    if threshold < 3 or len(points) <= threshold:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (len(points) - 2) / (threshold - 2)
+    selected = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        following = points[end:min(int((bucket + 2) * every) + 1, len(points))] or points[-1:]
+        average_x = sum(point[0] for point in following) / len(following)
+        average_y = sum(point[1] for point in following) / len(following)
+
+        selected_x, selected_y = points[selected]
+        best, best_area = start, -1.0
+        for index in range(start, end):
+            x, y = points[index]
+            area = abs((selected_x - average_x) * (y - selected_y) - (selected_x - x) * (average_y - selected_y))
+            if area > best_area:
+                best, best_area = index, area
+        sampled.append(points[best])
+        selected = best
+
+    sampled.append(points[-1])
+    return sampled
@@ -1,14 +1,55 @@
 import csv
+import gzip
+import io
 
-def export_to_csv(data, filename="finance_records.csv"):
-    with open(filename, mode="w", newline="", encoding="utf-8") as file:
+HEADERS = ["Категория", "Сумма", "Дата"]
+
+
+def _open_output(filename, compression, buffer_size):
+    # Открываем файл для записи текста, при необходимости со сжатием
+    if compression is None:
+        if filename.endswith(".gz"):
+            compression = "gzip"
+        elif filename.endswith(".zst"):
+            compression = "zstd"
+
+    if compression is None:
+        return open(filename, mode="w", newline="", encoding="utf-8", buffering=buffer_size)
+
+    if compression == "gzip":
+        return gzip.open(filename, mode="wt", newline="", encoding="utf-8", compresslevel=6)
+
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("Для сжатия zstd установите пакет 'zstandard'")
+        raw = open(filename, mode="wb", buffering=buffer_size)
+        stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8", newline="", write_through=False)
+
+    raise ValueError(f"Неизвестный вид сжатия: {compression}")
+
+
+def export_to_csv_stream(records, filename="finance_records.csv", compression=None, buffer_size=1 << 20):
+    # records может быть генератором (например, Database.iter_filtered_records):
+    # строки записываются по одной и не накапливаются в памяти.
+    # compression: None, "gzip" или "zstd" (по умолчанию определяется по имени файла)
+    count = 0
+    with _open_output(filename, compression, buffer_size) as file:
         writer = csv.writer(file)
 
         # Записываем заголовки
-        writer.writerow(["Категория", "Сумма", "Дата"])
+        writer.writerow(HEADERS)
 
         # Записываем данные
-        for record in data:
-            writer.writerow([record[1], f"{record[2]:.2f}", record[3]])
+        for record in records:
+            writer.writerow((record[1], f"{record[2]:.2f}", record[3]))
+            count += 1
 
+    return count
+
+
+def export_to_csv(data, filename="finance_records.csv"):
+    export_to_csv_stream(data, filename)
     print(f"Данные успешно экспортированы в {filename}")
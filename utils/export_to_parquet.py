@@ -0,0 +1,169 @@
+# utils/export_to_parquet.py
+# Экспорт записей в столбцовые файлы Parquet или Arrow IPC для анализа в
+# pandas, polars или duckdb.
+#
+# Столбцы типизированы: сумма хранится точно, целыми копейками
+# (amount_cents), и рядом для удобства в рублях (amount, float64), дата —
+# timestamp. Файлы разбиты по месяцам в каталоги в стиле Hive
+# (month=2024-03/part-....parquet), поэтому фильтр по месяцу читает только
+# нужные каталоги. Записи читаются из базы порциями и не накапливаются в
+# памяти.
+#
+# Инкрементальный режим дописывает только записи с id больше сохраненной
+# отметки (_watermark.json в каталоге экспорта): новые файлы получают имена
+# от первого id порции, уже выгруженные не переписываются. Удаленные после
+# выгрузки записи остаются в файлах — для точной копии нужен полный экспорт
+# (incremental=False), который очищает каталог.
+#
+# pyarrow импортируется при первом экспорте; без него остальная программа
+# работает.
+import json
+import os
+import shutil
+from datetime import datetime
+
+WATERMARK_FILE = "_watermark.json"
+FORMATS = {"parquet": "parquet", "arrow": "arrow"}
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.dataset
+    except ImportError:
+        raise RuntimeError("Для экспорта в Parquet и Arrow установите пакет 'pyarrow'")
+    return pyarrow, pyarrow.compute, pyarrow.dataset
+
+
+def _schema(pa):
+    return pa.schema([
+        ("id", pa.int64()),
+        ("category_id", pa.int32()),
+        ("category", pa.string()),
+        ("amount_cents", pa.int64()),
+        ("amount", pa.float64()),
+        ("date", pa.timestamp("s")),
+        ("type", pa.string()),
+        ("notes", pa.string()),
+        ("month", pa.string()),
+    ])
+
+
+def _category_names(pa, db):
+    # Массив названий, в котором позиция равна id категории
+    categories = db.get_all_categories()
+    names = [None] * (max((category_id for category_id, _ in categories), default=0) + 1)
+    for category_id, name in categories:
+        names[category_id] = name
+    return pa.array(names, pa.string())
+
+
+def _to_record_batch(pa, pc, schema, rows, names):
+    # rows: кортежи Database.iter_record_batches; названия категорий
+    # выбираются из names по category_id одной векторной операцией
+    ids, category_ids, amounts, dates, types, notes = zip(*rows)
+    category_ids = pa.array(category_ids, pa.int32())
+    amounts = pa.array(amounts, pa.int64())
+    dates = pa.array(dates, pa.string())
+    return pa.RecordBatch.from_arrays([
+        pa.array(ids, pa.int64()),
+        category_ids,
+        pc.take(names, category_ids),
+        amounts,
+        pc.divide(pc.cast(amounts, pa.float64()), 100.0),
+        pc.strptime(dates, format="%Y-%m-%d %H:%M:%S", unit="s"),
+        pa.array(types, pa.string()),
+        pa.array(notes, pa.string()),
+        pc.utf8_slice_codeunits(dates, 0, 7),
+    ], schema=schema)
+
+
+def read_watermark(output_dir):
+    # Последний выгруженный id и формат прошлых выгрузок
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return {"last_id": 0, "format": None, "records": 0}
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _write_watermark(output_dir, watermark):
+    # Отметка записывается только после всех файлов и заменяется атомарно
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(watermark, file, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _clear_output(output_dir):
+    for name in os.listdir(output_dir):
+        path = os.path.join(output_dir, name)
+        if name.startswith("month=") and os.path.isdir(path):
+            shutil.rmtree(path)
+        elif name == WATERMARK_FILE:
+            os.remove(path)
+
+
+def export_records_columnar(db, output_dir, file_format="parquet", incremental=True, batch_size=50000,
+                            rows_per_group=128 * 1024, max_open_files=32):
+    # Возвращает количество выгруженных записей. file_format: "parquet" или
+    # "arrow" (Arrow IPC, читается через memory map без распаковки)
+    if file_format not in FORMATS:
+        raise ValueError(f"Неизвестный формат: {file_format}")
+    pa, pc, ds = _import_pyarrow()
+
+    os.makedirs(output_dir, exist_ok=True)
+    if incremental:
+        watermark = read_watermark(output_dir)
+        if watermark["format"] not in (None, file_format):
+            raise ValueError(f"В {output_dir} уже выгружены файлы {watermark['format']}; "
+                             "для другого формата нужен отдельный каталог или полный экспорт")
+    else:
+        _clear_output(output_dir)
+        watermark = read_watermark(output_dir)
+
+    after_id = watermark["last_id"]
+    schema = _schema(pa)
+    progress = {"last_id": after_id, "records": 0}
+
+    def batches():
+        names = _category_names(pa, db)
+        for rows in db.iter_record_batches(after_id, batch_size):
+            # Категория могла появиться во время выгрузки
+            if max(row[1] for row in rows) >= len(names):
+                names = _category_names(pa, db)
+            progress["last_id"] = rows[-1][0]
+            progress["records"] += len(rows)
+            yield _to_record_batch(pa, pc, schema, rows, names)
+
+    if file_format == "parquet":
+        dataset_format = ds.ParquetFileFormat()
+        file_options = dataset_format.make_write_options(compression="zstd")
+    else:
+        dataset_format = ds.IpcFileFormat()
+        file_options = dataset_format.make_write_options()
+
+    # Имена файлов зависят от первого id выгрузки: если прошлый запуск
+    # прервался до записи отметки, повтор перезапишет те же файлы.
+    # Строки месяца копятся до rows_per_group / 4 перед записью группы, а
+    # открытых файлов не больше max_open_files: память ограничена их
+    # произведением. Записи обычно идут по времени, и каждый месяц
+    # попадает в один файл; при перемешанных датах (импорт старых выписок)
+    # файлов будет больше
+    ds.write_dataset(
+        batches(), output_dir, schema=schema, format=dataset_format, file_options=file_options,
+        partitioning=ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive"),
+        basename_template=f"part-{after_id + 1:012d}-{{i}}.{FORMATS[file_format]}",
+        existing_data_behavior="overwrite_or_ignore", max_open_files=max_open_files,
+        min_rows_per_group=rows_per_group // 4, max_rows_per_group=rows_per_group,
+    )
+
+    if progress["records"]:
+        _write_watermark(output_dir, {
+            "last_id": progress["last_id"],
+            "format": file_format,
+            "records": watermark["records"] + progress["records"],
+            "updated": datetime.now().isoformat(timespec="seconds"),
+        })
+    return progress["records"]
@@ -0,0 +1,388 @@
+# utils/importer.py
+# Импорт банковских выписок (CSV, OFX, QIF) в таблицу records.
+#
+# Файлы читаются потоково, строки сопоставляются с полями
+# records(category, amount, date, type) и загружаются одной транзакцией
+# через Database.add_imported_records. Каждой строке присваивается хеш
+# содержимого, поэтому повторный импорт той же выписки не создает дубликатов.
+#
+# Запуск из корня проекта:
+#     python -m utils.importer statement.csv [--db finance.db] [--format csv]
+import argparse
+import csv
+import hashlib
+import math
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+
+from database import MAX_AMOUNT, Database
+
+# Возможные названия столбцов CSV для каждого поля (без учета регистра)
+DEFAULT_COLUMNS = {
+    "category": ["категория", "category", "описание", "description", "назначение платежа", "payee", "name"],
+    "amount": ["сумма", "amount", "сумма операции", "sum"],
+    "date": ["дата", "date", "дата операции", "transaction date"],
+    "type": ["тип", "type"],
+    "notes": ["примечание", "комментарий", "notes", "memo"],
+}
+
+DATE_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d",
+    "%d.%m.%Y %H:%M:%S",
+    "%d.%m.%Y %H:%M",
+    "%d.%m.%Y",
+    "%d/%m/%Y",
+    "%m/%d/%Y",
+    "%d/%m/%y",
+    "%m/%d/%y",
+    "%Y%m%d%H%M%S",
+    "%Y%m%d",
+]
+
+# В QIF даты американские: месяц первым, год бывает двузначным
+QIF_DATE_FORMATS = ["%m/%d/%Y", "%m/%d/%y"]
+
+INCOME_TYPES = {"income", "доход", "credit", "cr", "зачисление", "приход", "dep", "int", "div"}
+
+_AMOUNT_JUNK = re.compile(r"[\s'₽$€]|руб\.?|rub", re.IGNORECASE)
+_OFX_TRANSACTION = re.compile(r"<STMTTRN>(.*?)</STMTTRN>", re.IGNORECASE | re.DOTALL)
+_OFX_FIELD = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+def parse_amount(value):
+    # "1 234,56", "-1234.56", "1,234.56 руб.", "1.234,56" -> float
+    value = _AMOUNT_JUNK.sub("", value)
+    if "," in value and "." in value:
+        # Правый разделитель — десятичный, левый — разделитель тысяч
+        thousands = "," if value.rfind(".") > value.rfind(",") else "."
+        value = value.replace(thousands, "").replace(",", ".")
+    else:
+        value = value.replace(",", ".")
+    return float(value)
+
+
+# Самые частые форматы разбираются регулярным выражением без strptime
+_ISO_DATE = re.compile(r"(\d{4})-(\d{2})-(\d{2})(?:[ T](\d{2}):(\d{2})(?::(\d{2}))?)?$")
+_DOTTED_DATE = re.compile(r"(\d{2})\.(\d{2})\.(\d{4})(?: (\d{2}):(\d{2})(?::(\d{2}))?)?$")
+
+
+def _day_first(date_format):
+    return date_format.index("%d") < date_format.index("%m")
+
+
+class DateParser:
+    # Запоминает последний подошедший формат: в одной выписке он обычно один.
+    # Порядок дня и месяца в датах через "/" выбирается по первой такой дате
+    # и дальше не меняется, иначе 01/02 и 13/02 в одном файле разобрались бы
+    # по-разному. При неоднозначной первой дате побеждает формат из начала formats
+    def __init__(self, formats=DATE_FORMATS):
+        self.formats = list(formats)
+        self.slash_order_fixed = False
+
+    def _fast_parse(self, value):
+        match = _ISO_DATE.match(value)
+        if match:
+            year, month, day, hour, minute, second = match.groups()
+        else:
+            match = _DOTTED_DATE.match(value)
+            if not match:
+                return None
+            day, month, year, hour, minute, second = match.groups()
+        # Формат распознан, поэтому несуществующая дата (2024-02-31, 25:00) —
+        # ошибка строки, а не повод перебирать остальные форматы
+        try:
+            datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0))
+        except ValueError:
+            raise ValueError(f"Несуществующая дата: {value}")
+        return f"{year}-{month}-{day} {hour or '00'}:{minute or '00'}:{second or '00'}"
+
+    def __call__(self, value):
+        value = value.strip()
+        parsed = self._fast_parse(value)
+        if parsed:
+            return parsed
+        # В OFX после даты может идти часовой пояс: 20240131120000.000[-5:EST]
+        if value[:8].isdigit():
+            value = value.split(".")[0].split("[")[0]
+        for index, date_format in enumerate(self.formats):
+            try:
+                parsed = datetime.strptime(value, date_format)
+            except ValueError:
+                continue
+            if index:
+                self.formats.insert(0, self.formats.pop(index))
+            if "/" in date_format and not self.slash_order_fixed:
+                self._fix_slash_order(date_format)
+            return parsed.strftime("%Y-%m-%d %H:%M:%S")
+        raise ValueError(f"Неизвестный формат даты: {value}")
+
+    def _fix_slash_order(self, date_format):
+        day_first = _day_first(date_format)
+        self.formats = [other for other in self.formats
+                        if "/" not in other or _day_first(other) == day_first]
+        self.slash_order_fixed = True
+
+
+def _find_column(header, names):
+    lowered = [column.strip().lower() for column in header]
+    for name in names:
+        if name.lower() in lowered:
+            return lowered.index(name.lower())
+    return None
+
+
+def _sniff_delimiter(sample):
+    # Итоговая строка в конце выписки ("Итого,-300.50") может сбить Sniffer;
+    # тогда разделитель определяется по одной строке заголовка
+    header = sample.split("\n", 1)[0]
+    for text in (sample, header):
+        try:
+            return csv.Sniffer().sniff(text, delimiters=",;\t|").delimiter
+        except csv.Error:
+            continue
+    return max(",;\t|", key=header.count)
+
+
+def read_csv(path, mapping=None, delimiter=None, encoding="utf-8-sig", stats=None):
+    # Возвращает словари {category, amount, date, type?} по строкам файла.
+    # mapping позволяет явно указать столбец для поля: {"category": "Описание"}.
+    # Строки без нужных столбцов пропускаются и считаются в stats["errors"]
+    with open(path, newline="", encoding=encoding) as file:
+        if delimiter is None:
+            sample = file.read(64 * 1024)
+            file.seek(0)
+            delimiter = _sniff_delimiter(sample)
+
+        reader = csv.reader(file, delimiter=delimiter)
+        header = next(reader, None)
+        if header is None:
+            return
+
+        columns = {}
+        for field, names in DEFAULT_COLUMNS.items():
+            if mapping and field in mapping:
+                names = [mapping[field]]
+            columns[field] = _find_column(header, names)
+
+        missing = [field for field in ("category", "amount", "date") if columns[field] is None]
+        if missing:
+            raise ValueError(f"В файле {path} не найдены столбцы: {', '.join(missing)}")
+
+        category_column = columns["category"]
+        amount_column = columns["amount"]
+        date_column = columns["date"]
+        type_column = columns["type"]
+        notes_column = columns["notes"]
+        required_length = max(category_column, amount_column, date_column) + 1
+
+        for row in reader:
+            if not row:
+                continue
+            if len(row) < required_length:
+                if stats is not None:
+                    stats["errors"] += 1
+                continue
+            yield {
+                "category": row[category_column],
+                "amount": row[amount_column],
+                "date": row[date_column],
+                "type": row[type_column] if type_column is not None and type_column < len(row) else None,
+                "notes": row[notes_column] if notes_column is not None and notes_column < len(row) else None,
+            }
+
+
+def read_ofx(path, encoding="utf-8", chunk_size=1 << 20):
+    # Блоки <STMTTRN> ищутся в потоке порциями, файл целиком не читается
+    with open(path, encoding=encoding, errors="replace") as file:
+        buffer = ""
+        while True:
+            chunk = file.read(chunk_size)
+            buffer += chunk
+            last_end = 0
+            for match in _OFX_TRANSACTION.finditer(buffer):
+                fields = {name.upper(): value.strip() for name, value in _OFX_FIELD.findall(match.group(1))}
+                last_end = match.end()
+                yield {
+                    "category": fields.get("NAME") or fields.get("MEMO") or fields.get("TRNTYPE", ""),
+                    "amount": fields.get("TRNAMT", ""),
+                    "date": fields.get("DTPOSTED", ""),
+                    "type": fields.get("TRNTYPE"),
+                    "notes": fields.get("MEMO") if fields.get("NAME") else None,
+                    "id": fields.get("FITID"),
+                }
+            buffer = buffer[last_end:]
+            if not chunk:
+                break
+
+
+def _qif_date(value):
+    # Quicken пишет " 1/ 5'24" и "1/31' 4": пробелы заменяют ведущие нули,
+    # апостроф отделяет год после 2000
+    return value.replace(" ", "0").replace("'", "/")
+
+
+def read_qif(path, encoding="utf-8"):
+    with open(path, encoding=encoding, errors="replace") as file:
+        entry = {}
+        for line in file:
+            line = line.rstrip("\r\n")
+            if not line or line.startswith("!"):
+                continue
+            code, value = line[0], line[1:].strip()
+            if code == "^":
+                if entry:
+                    yield {
+                        "category": entry.get("L") or entry.get("P") or entry.get("M", ""),
+                        "amount": entry.get("T") or entry.get("U", ""),
+                        "date": _qif_date(entry.get("D", "")),
+                        "type": None,
+                        "notes": entry.get("M") if (entry.get("L") or entry.get("P")) else None,
+                    }
+                entry = {}
+            else:
+                entry[code] = value
+
+
+READERS = {"csv": read_csv, "ofx": read_ofx, "qfx": read_ofx, "qif": read_qif}
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    if extension in READERS:
+        return extension
+    return "csv"
+
+
+def normalize_rows(rows, default_type="expense", stats=None, date_formats=DATE_FORMATS):
+    # Приводит строки выписки к кортежам (category, amount, date, type, notes, import_hash).
+    # Отрицательная сумма — всегда расход; у положительной без столбца типа
+    # тип берется из default_type
+    parse_date = DateParser(date_formats)
+    occurrences = {}
+    previous_date = None
+
+    for row in rows:
+        try:
+            amount = parse_amount(row["amount"])
+            # float() принимает "nan", "inf" и "1e400"
+            if not math.isfinite(amount) or abs(amount) > MAX_AMOUNT:
+                raise ValueError(f"Недопустимая сумма: {row['amount']}")
+            record_date = parse_date(row["date"])
+        except (ValueError, KeyError):
+            if stats is not None:
+                stats["errors"] += 1
+            continue
+
+        category = (row.get("category") or "").strip() or "Без категории"
+        raw_type = (row.get("type") or "").strip().lower()
+        if amount < 0:
+            record_type = "expense"
+        elif raw_type:
+            record_type = "income" if raw_type in INCOME_TYPES else "expense"
+        else:
+            record_type = default_type
+        amount = abs(amount)
+        notes = (row.get("notes") or "").strip() or None
+
+        if row.get("id"):
+            key = f"id|{row['id']}|{record_date}|{amount:.2f}"
+        else:
+            # Одинаковые строки в один день (две одинаковые покупки) различаются
+            # порядковым номером. Выписки упорядочены по дате, поэтому счетчики
+            # сбрасываются при смене дня и память не растет с размером файла
+            if record_date[:10] != previous_date:
+                occurrences.clear()
+                previous_date = record_date[:10]
+            key = f"{record_date}|{amount:.2f}|{category}|{record_type}"
+            occurrence = occurrences.get(key, 0)
+            occurrences[key] = occurrence + 1
+            key = f"{key}|{occurrence}"
+
+        import_hash = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+        yield category, amount, record_date, record_type, notes, import_hash
+
+
+def read_records(path, file_format=None, mapping=None, default_type="expense", stats=None):
+    # Читает файл и возвращает генератор кортежей для Database.add_imported_records
+    file_format = file_format or detect_format(path)
+    if file_format not in READERS:
+        raise ValueError(f"Неизвестный формат файла: {file_format}")
+
+    reader = READERS[file_format]
+    rows = reader(path, mapping=mapping, stats=stats) if file_format == "csv" else reader(path)
+    date_formats = QIF_DATE_FORMATS if file_format == "qif" else DATE_FORMATS
+    return normalize_rows(rows, default_type, stats, date_formats)
+
+
+def import_file(db, path, file_format=None, mapping=None, default_type="expense",
+                batch_size=10000, progress=None, progress_every=50000):
+    # Импортирует файл и возвращает статистику: прочитано, добавлено,
+    # пропущено дубликатов, ошибок разбора, время и скорость (строк/с).
+    # progress(stats) вызывается каждые progress_every строк
+    stats = {"read": 0, "inserted": 0, "duplicates": 0, "errors": 0,
+             "seconds": 0.0, "rows_per_second": 0.0}
+    started = time.perf_counter()
+
+    def counted(records):
+        for record in records:
+            stats["read"] += 1
+            if progress is not None and stats["read"] % progress_every == 0:
+                _update_speed(stats, started)
+                progress(dict(stats))
+            yield record
+
+    records = counted(read_records(path, file_format, mapping, default_type, stats))
+
+    # Пачки передаются в базу по одной, чтобы можно было считать добавленные строки
+    with db.transaction():
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            stats["inserted"] += db.add_imported_records(batch, batch_size)
+
+    stats["duplicates"] = stats["read"] - stats["inserted"]
+    _update_speed(stats, started)
+    return stats
+
+
+def _update_speed(stats, started):
+    stats["seconds"] = time.perf_counter() - started
+    if stats["seconds"] > 0:
+        stats["rows_per_second"] = stats["read"] / stats["seconds"]
+
+
+def print_progress(stats):
+    print(f"  прочитано {stats['read']:,} строк, {stats['rows_per_second']:,.0f} строк/с")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Импорт банковской выписки")
+    parser.add_argument("files", nargs="+", help="файлы CSV, OFX или QIF")
+    parser.add_argument("--db", default="finance.db", help="путь к файлу базы данных")
+    parser.add_argument("--format", choices=sorted(READERS), help="формат файла (по умолчанию по расширению)")
+    parser.add_argument("--default-type", choices=["expense", "income"], default="expense",
+                        help="тип для положительных сумм, если в файле нет столбца типа")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    try:
+        for path in args.files:
+            print(f"Импорт {path}")
+            stats = import_file(db, path, args.format, default_type=args.default_type,
+                                progress=print_progress)
+            print(f"Добавлено {stats['inserted']:,}, дубликатов {stats['duplicates']:,}, "
+                  f"ошибок {stats['errors']:,} за {stats['seconds']:.1f} с "
+                  f"({stats['rows_per_second']:,.0f} строк/с)")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
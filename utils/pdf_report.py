@@ -0,0 +1,199 @@
+# utils/pdf_report.py
+# Построение PDF-отчета по записям напрямую из базы данных.
+#
+# Строки читаются из Database порциями и выводятся на страницы, у которых
+# неизменяемая часть (заголовок, шапка таблицы) нарисована один раз как
+# Form XObject и затем только подставляется. Первая страница — сводка по
+# категориям, посчитанная агрегатными запросами. Для работы без блокировки
+# интерфейса отчет можно построить в отдельном процессе (render_in_process).
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table, TableStyle
+
+from database import Database
+
+# Стандартные шрифты PDF не содержат кириллицы, поэтому ищем TTF-шрифт
+FONT_CANDIDATES = [
+    os.environ.get("FINANCE_PDF_FONT", ""),
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "C:\\Windows\\Fonts\\arial.ttf",
+]
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 40
+ROW_HEIGHT = 14
+FONT_SIZE = 9
+COLUMNS = [("Категория", MARGIN), ("Сумма", 260), ("Дата", 340), ("Тип", 470)]
+TABLE_TOP = PAGE_HEIGHT - MARGIN - 50
+ROWS_PER_PAGE = int((TABLE_TOP - MARGIN - 20) // ROW_HEIGHT)
+TYPE_NAMES = {"income": "Доход", "expense": "Расход"}
+
+
+def register_font():
+    for path in FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            if "ReportFont" not in pdfmetrics.getRegisteredFontNames():
+                pdfmetrics.registerFont(TTFont("ReportFont", path))
+            return "ReportFont"
+    return "Helvetica"
+
+
+def _describe_filters(filters):
+    parts = []
+    if filters.get("start_date") or filters.get("end_date"):
+        parts.append(f"период: {filters.get('start_date') or '...'} — {filters.get('end_date') or '...'}")
+    if filters.get("category_filter"):
+        parts.append(f"категория: {filters['category_filter']}")
+    if filters.get("record_type"):
+        parts.append(f"тип: {TYPE_NAMES.get(filters['record_type'], filters['record_type'])}")
+    if filters.get("search_term"):
+        parts.append(f"поиск: {filters['search_term']}")
+    return ", ".join(parts) or "все записи"
+
+
+def _draw_summary(pdf, db, filters, font):
+    pdf.setFont(font, 16)
+    pdf.drawString(MARGIN, PAGE_HEIGHT - MARGIN - 10, "Отчет по финансам")
+    pdf.setFont(font, 10)
+    pdf.drawString(MARGIN, PAGE_HEIGHT - MARGIN - 30, _describe_filters(filters))
+
+    aggregate_filters = {key: filters.get(key) for key in
+                         ("start_date", "end_date", "category_filter", "search_term")}
+    totals_by_type = {}
+    for record_type in ("income", "expense"):
+        if filters.get("record_type") not in (None, record_type):
+            continue
+        totals = db.sum_by_category(record_type=record_type, **aggregate_filters)
+        if totals:
+            totals_by_type[record_type] = totals
+
+    y = PAGE_HEIGHT - MARGIN - 60
+    for record_type, totals in totals_by_type.items():
+        total = sum(amount for _, amount in totals)
+        data = [["Категория", "Сумма", "Доля"]]
+        data += [[category, f"{amount:.2f}", f"{amount / total * 100:.1f}%" if total else "—"]
+                 for category, amount in totals]
+        data.append(["Итого", f"{total:.2f}", "100%"])
+
+        table = Table(data, colWidths=[260, 120, 80], repeatRows=1)
+        table.setStyle(TableStyle([
+            ("FONT", (0, 0), (-1, -1), font, FONT_SIZE),
+            ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+            ("LINEBELOW", (0, 0), (-1, 0), 0.5, colors.grey),
+            ("LINEABOVE", (0, -1), (-1, -1), 0.5, colors.grey),
+            ("ALIGN", (1, 1), (-1, -1), "RIGHT"),
+        ]))
+
+        pdf.setFont(font, 12)
+        pdf.drawString(MARGIN, y, "Доходы" if record_type == "income" else "Расходы")
+        y -= 8
+
+        # Если таблица не помещается на странице, делим ее и продолжаем на следующей
+        width = PAGE_WIDTH - 2 * MARGIN
+        parts = [table]
+        while parts:
+            part = parts.pop(0)
+            _, height = part.wrapOn(pdf, width, y - MARGIN)
+            if height <= y - MARGIN:
+                part.drawOn(pdf, MARGIN, y - height)
+                y -= height + 24
+                continue
+            pieces = part.split(width, y - MARGIN)
+            if len(pieces) < 2:
+                pdf.showPage()
+                y = PAGE_HEIGHT - MARGIN
+                parts.insert(0, part)
+            else:
+                parts = pieces + parts
+
+
+def _define_page_frame(pdf, font):
+    # Неизменяемая часть страницы с записями рисуется один раз
+    pdf.beginForm("records_page")
+    pdf.setFont(font, 12)
+    pdf.drawString(MARGIN, PAGE_HEIGHT - MARGIN - 10, "Записи")
+    pdf.setFont(font, FONT_SIZE)
+    for title, x in COLUMNS:
+        pdf.drawString(x, TABLE_TOP, title)
+    pdf.setStrokeColor(colors.grey)
+    pdf.line(MARGIN, TABLE_TOP - 4, PAGE_WIDTH - MARGIN, TABLE_TOP - 4)
+    pdf.endForm()
+
+
+def _draw_records(pdf, records, font):
+    count = 0
+    page = None
+    row_on_page = ROWS_PER_PAGE
+    for record in records:
+        if row_on_page == ROWS_PER_PAGE:
+            if page is not None:
+                pdf.drawText(page)
+                pdf.showPage()
+            pdf.doForm("records_page")
+            page = pdf.beginText()
+            page.setFont(font, FONT_SIZE)
+            row_on_page = 0
+
+        # record: (id, category, amount, date, type, ...)
+        y = TABLE_TOP - 18 - row_on_page * ROW_HEIGHT
+        values = (record[1][:45], f"{record[2]:.2f}", record[3], TYPE_NAMES.get(record[4], record[4] or ""))
+        for (_, x), value in zip(COLUMNS, values):
+            page.setTextOrigin(x, y)
+            page.textOut(value)
+        row_on_page += 1
+        count += 1
+
+    if page is not None:
+        pdf.drawText(page)
+    return count
+
+
+def build_pdf_report(db_name, file_name="finance_report.pdf", filters=None, chunk_size=2000):
+    # Строит отчет и возвращает количество выведенных записей (0 — нет данных,
+    # файл при этом не создается)
+    filters = {key: value for key, value in (filters or {}).items() if value}
+    db = Database(db_name, read_only=True, query_cache_size=0)
+    try:
+        records = db.iter_filtered_records(chunk_size=chunk_size, **filters)
+        first = next(records, None)
+        if first is None:
+            return 0
+
+        font = register_font()
+        pdf = canvas.Canvas(file_name, pagesize=A4, pageCompression=1)
+        pdf.setTitle("Отчет по финансам")
+
+        _draw_summary(pdf, db, filters, font)
+        pdf.showPage()
+
+        _define_page_frame(pdf, font)
+        count = _draw_records(pdf, _chain(first, records), font)
+        pdf.showPage()
+        pdf.save()
+        return count
+    finally:
+        db.close()
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def render_in_process(db_name, file_name="finance_report.pdf", filters=None, chunk_size=2000):
+    # Отдельный процесс запускается через spawn: форк процесса с Qt и
+    # рабочими потоками небезопасен
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        future = executor.submit(build_pdf_report, os.path.abspath(db_name),
+                                 os.path.abspath(file_name), filters, chunk_size)
+        return future.result()
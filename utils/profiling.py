@@ -0,0 +1,178 @@
+# utils/profiling.py
+# Замеры времени методов Database, SQL-запросов и обработчиков интерфейса.
+#
+# Включается переменной окружения FINANCE_PROFILE=1 (проверяется при
+# импорте). Без нее profiler равен None, классы не оборачиваются и
+# накладных расходов нет. Настройки:
+#     FINANCE_PROFILE_LOG      файл журнала (по умолчанию finance_profile.log)
+#     FINANCE_SLOW_QUERY_MS    порог медленного запроса, мс (по умолчанию 50)
+#
+# Каждое событие пишется в журнал одной строкой JSON; файл ротируется
+# по размеру. Для медленных запросов сохраняется EXPLAIN QUERY PLAN.
+# Сводка (количество, p50, p95, максимум) и последние медленные запросы
+# показываются в окне диагностики интерфейса.
+import functools
+import inspect
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+SAMPLES_PER_NAME = 1000
+SLOW_SAMPLES = 50
+MAX_SQL_LENGTH = 2000
+
+_IN_LIST = re.compile(r"\(\?(?:, \?)+\)")
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Profiler:
+    def __init__(self, log_path="finance_profile.log", slow_query_ms=50.0,
+                 max_bytes=5 * 1024 * 1024, backup_count=3):
+        self.slow_query_ms = slow_query_ms
+        self._durations = {}
+        self._counts = {}
+        self._slow = deque(maxlen=SLOW_SAMPLES)
+        self._lock = threading.Lock()
+
+        self.logger = logging.getLogger("finance.profile")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        if log_path and not self.logger.handlers:
+            handler = RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count,
+                                          encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger.addHandler(handler)
+
+    def record(self, kind, name, ms, **details):
+        # kind: "call" (метод Database), "query" (SQL), "slot" (обработчик
+        # интерфейса), "task" (фоновая задача DbWorker)
+        key = f"{kind}:{name}"
+        with self._lock:
+            durations = self._durations.get(key)
+            if durations is None:
+                durations = self._durations[key] = deque(maxlen=SAMPLES_PER_NAME)
+            durations.append(ms)
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+        event = {"ts": round(time.time(), 3), "kind": kind, "name": name, "ms": round(ms, 3),
+                 "thread": threading.current_thread().name}
+        event.update(details)
+        self.logger.info(json.dumps(event, ensure_ascii=False, default=str))
+
+    def record_query(self, sql, ms, rows, explain=None):
+        # explain() возвращает строки EXPLAIN QUERY PLAN; вызывается только
+        # для медленных запросов
+        sql = " ".join(sql.split())[:MAX_SQL_LENGTH]
+        details = {"sql": sql, "rows": rows}
+        if ms >= self.slow_query_ms and explain is not None:
+            try:
+                plan = [row[-1] for row in explain()]
+            except Exception as error:
+                plan = [f"{type(error).__name__}: {error}"]
+            details["plan"] = plan
+            with self._lock:
+                self._slow.append({"ts": time.time(), "ms": ms, "rows": rows, "sql": sql, "plan": plan})
+        # Имя для сводки — текст запроса, списки IN (?, ?, ...) разной длины
+        # считаются одним запросом
+        self.record("query", _IN_LIST.sub("(?...)", sql)[:300], ms, **details)
+
+    def summary(self):
+        # Список (имя, количество, p50, p95, максимум) по убыванию p95
+        with self._lock:
+            items = [(key, self._counts[key], sorted(durations)) for key, durations in self._durations.items()]
+        rows = [(key, count, _percentile(values, 0.5), _percentile(values, 0.95), values[-1])
+                for key, count, values in items]
+        rows.sort(key=lambda row: row[3], reverse=True)
+        return rows
+
+    def slow_queries(self):
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._counts.clear()
+            self._slow.clear()
+
+
+def _create_profiler():
+    if os.environ.get("FINANCE_PROFILE", "").lower() not in ("1", "true", "yes", "on"):
+        return None
+    try:
+        slow_query_ms = float(os.environ.get("FINANCE_SLOW_QUERY_MS", "50"))
+    except ValueError:
+        slow_query_ms = 50.0
+    return Profiler(os.environ.get("FINANCE_PROFILE_LOG", "finance_profile.log"), slow_query_ms)
+
+
+profiler = _create_profiler()
+
+
+def _timed(func, kind, name, max_args):
+    if inspect.isgeneratorfunction(func):
+        # Для генераторов считается время внутри генератора, без времени
+        # того, кто забирает строки
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            elapsed = 0.0
+            generator = func(*args, **kwargs)
+            try:
+                while True:
+                    started = time.perf_counter()
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += time.perf_counter() - started
+                    yield item
+            finally:
+                generator.close()
+                profiler.record(kind, name, elapsed * 1000)
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Слоты Qt вызываются с лишними аргументами сигнала (например,
+        # checked у clicked); как и PyQt, передаем только те, что принимает функция
+        if max_args is not None:
+            args = args[:max_args]
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.record(kind, name, (time.perf_counter() - started) * 1000)
+    return wrapper
+
+
+def instrument(kind, exclude=(), trim_args=False):
+    # Декоратор класса: оборачивает замером времени все публичные методы,
+    # объявленные в самом классе. Если профилирование выключено, класс
+    # возвращается без изменений
+    def decorate(cls):
+        if profiler is None:
+            return cls
+        for attribute, func in list(vars(cls).items()):
+            if attribute.startswith("_") or attribute in exclude:
+                continue
+            if not inspect.isfunction(func):
+                continue
+            max_args = None
+            if trim_args:
+                parameters = inspect.signature(func).parameters.values()
+                if not any(parameter.kind == parameter.VAR_POSITIONAL for parameter in parameters):
+                    max_args = sum(parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD)
+                                   for parameter in parameters)
+            setattr(cls, attribute, _timed(func, kind, f"{cls.__name__}.{attribute}", max_args))
+        return cls
+    return decorate
@@ -0,0 +1,40 @@
+# utils/rollups.py
+# Обслуживание итоговых таблиц daily_totals и monthly_totals.
+#
+# Запуск из корня проекта:
+#     python -m utils.rollups check [--db finance.db]
+#     python -m utils.rollups rebuild [--db finance.db]
+import argparse
+import sys
+
+from database import Database
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Итоговые суммы по дням и месяцам")
+    parser.add_argument("command", choices=["check", "rebuild"])
+    parser.add_argument("--db", default="finance.db", help="путь к файлу базы данных")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    try:
+        if args.command == "rebuild":
+            db.rebuild_rollups()
+            print("Итоговые таблицы пересчитаны")
+
+        mismatches = db.check_rollups()
+        if not mismatches:
+            print("Итоговые таблицы совпадают с записями")
+            return 0
+
+        print(f"Найдено расхождений: {len(mismatches)}")
+        for table, period, category, record_type, expected, expected_count, actual, actual_count in mismatches[:20]:
+            print(f"  {table} {period} {category} {record_type}: "
+                  f"ожидалось {expected} ({expected_count} шт.), в таблице {actual} ({actual_count} шт.)")
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
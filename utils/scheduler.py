@@ -0,0 +1,165 @@
+# utils/scheduler.py
+# Проведение регулярных расходов, включая пропущенные платежи.
+#
+# Ближайшие даты платежей хранятся в куче, поэтому проверка по таймеру
+# смотрит только на ее вершину и не перечитывает таблицу regular_expenses.
+# Все пропущенные платежи расхода считаются сразу с учетом длины месяцев
+# и записываются одной транзакцией. Даты считаются от дня первого платежа
+# (anchor_date), поэтому после короткого месяца день не «съезжает».
+import calendar
+import heapq
+import threading
+from datetime import date, datetime, timedelta
+
+# Интервал -> (дней, месяцев). В базе интервал хранится строкой из интерфейса
+INTERVALS = {
+    "ежедневно": (1, 0),
+    "еженедельно": (7, 0),
+    "ежемесячно": (0, 1),
+    "ежеквартально": (0, 3),
+    "ежегодно": (0, 12),
+    "daily": (1, 0),
+    "weekly": (7, 0),
+    "monthly": (0, 1),
+    "quarterly": (0, 3),
+    "yearly": (0, 12),
+}
+
+
+def add_months(start, months):
+    # 31 января + 1 месяц = 28 (29) февраля: день ограничивается длиной месяца
+    month_index = start.year * 12 + start.month - 1 + months
+    year, month = divmod(month_index, 12)
+    day = min(start.day, calendar.monthrange(year, month + 1)[1])
+    return date(year, month + 1, day)
+
+
+def occurrence(start, interval, number):
+    # Дата платежа с номером number, отсчитанная от start. Считаем каждый раз
+    # от исходной даты, чтобы после короткого месяца день не «съезжал»
+    days, months = INTERVALS[interval]
+    if months:
+        return add_months(start, months * number)
+    return start + timedelta(days=days * number)
+
+
+def occurrence_number(anchor, interval, current):
+    # Номер первого платежа от anchor с датой не раньше current
+    days, months = INTERVALS[interval]
+    if months:
+        number = ((current.year - anchor.year) * 12 + current.month - anchor.month) // months
+    else:
+        number = (current - anchor).days // days
+    number = max(number, 0)
+    while occurrence(anchor, interval, number) < current:
+        number += 1
+    return number
+
+
+def due_occurrences(anchor, interval, first, until, limit):
+    # Даты платежей от first до until включительно (не больше limit)
+    # и дата следующего платежа после них. Платежи после first считаются
+    # от anchor — дня первого платежа расхода
+    dates = []
+    number = occurrence_number(anchor, interval, first)
+    current = first
+    while current <= until and len(dates) < limit:
+        dates.append(current)
+        number += 1
+        current = occurrence(anchor, interval, number)
+    return dates, current
+
+
+class RegularExpenseScheduler:
+    # max_occurrences ограничивает количество платежей за один проход:
+    # если расход не проводился очень давно, остаток будет проведен
+    # следующими проходами (см. has_due)
+    def __init__(self, db, max_occurrences=5000):
+        self.db = db
+        self.max_occurrences = max_occurrences
+        self.heap = []
+        self.expenses = {}
+        self.lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        # Вызывается после добавления или удаления регулярных расходов
+        heap = []
+        expenses = {}
+        for expense_id, category, amount, interval, next_payment_date, anchor_date in self.db.get_regular_expenses():
+            interval = (interval or "").strip().lower()
+            if interval not in INTERVALS:
+                continue
+            try:
+                next_date = datetime.strptime(next_payment_date, "%Y-%m-%d").date()
+            except (TypeError, ValueError):
+                continue
+            try:
+                anchor = datetime.strptime(anchor_date, "%Y-%m-%d").date()
+            except (TypeError, ValueError):
+                anchor = next_date
+            expenses[expense_id] = (category, amount, interval, anchor, next_date)
+            heap.append((next_date, expense_id))
+        heapq.heapify(heap)
+        with self.lock:
+            self.heap = heap
+            self.expenses = expenses
+
+    def next_due_date(self):
+        with self.lock:
+            return self.heap[0][0] if self.heap else None
+
+    def has_due(self, today=None):
+        next_date = self.next_due_date()
+        return next_date is not None and next_date <= (today or date.today())
+
+    def run_due(self, today=None):
+        # Проводит все наступившие платежи и возвращает количество новых записей.
+        # Выполняется в фоновом потоке
+        today = today or date.today()
+        with self.lock:
+            due = []
+            budget = self.max_occurrences
+            while self.heap and self.heap[0][0] <= today and budget > 0:
+                next_date, expense_id = heapq.heappop(self.heap)
+                category, amount, interval, anchor, _ = self.expenses[expense_id]
+                dates, new_next_date = due_occurrences(anchor, interval, next_date, today, budget)
+                budget -= len(dates)
+                due.append((expense_id, category, amount, interval, anchor, next_date, dates, new_next_date))
+
+            records = []
+            stale = False
+            try:
+                with self.db.transaction():
+                    for expense_id, category, amount, interval, anchor, next_date, dates, new_next_date in due:
+                        # Если расход удален или дату уже сдвинул кто-то другой,
+                        # платежи не дублируем, а очередь потом перечитываем
+                        if not self.db.advance_regular_expense(
+                                expense_id, next_date.isoformat(), new_next_date.isoformat()):
+                            stale = True
+                            continue
+                        records.extend((category, amount, f"{payment_date.isoformat()} 00:00:00", "expense")
+                                       for payment_date in dates)
+                    self.db.add_records_bulk(records)
+            except Exception:
+                # Транзакция откатилась: возвращаем расходы в очередь без изменений
+                for expense_id, category, amount, interval, anchor, next_date, dates, new_next_date in due:
+                    heapq.heappush(self.heap, (next_date, expense_id))
+                raise
+
+            for expense_id, category, amount, interval, anchor, next_date, dates, new_next_date in due:
+                self.expenses[expense_id] = (category, amount, interval, anchor, new_next_date)
+                heapq.heappush(self.heap, (new_next_date, expense_id))
+
+        if stale:
+            self.reload()
+        return len(records)
+
+    def seconds_until_next(self, now=None):
+        # Сколько ждать до начала дня следующего платежа (None — платежей нет)
+        next_date = self.next_due_date()
+        if next_date is None:
+            return None
+        now = now or datetime.now()
+        moment = datetime.combine(next_date, datetime.min.time())
+        return max(0.0, (moment - now).total_seconds())
@@ -0,0 +1,152 @@
+# utils/snapshot.py
+# Снимок записей для аналитики без обращения к SQLite.
+#
+# Снимок — каталог с небольшим заголовком header.json и четырьмя
+# двоичными столбцами, по файлу на столбец:
+#     day.bin           int32, день как число дней с 1970-01-01
+#     category_id.bin   int32
+#     income.bin        uint8, 1 для дохода, 0 для расхода
+#     amount_cents.bin  int64, сумма в копейках
+# Строки упорядочены по дате, поэтому выборка за период — это срез, а не
+# фильтр. Читатель открывает столбцы через numpy.memmap: данные не
+# копируются и не загружаются целиком, в память попадают только страницы,
+# которые реально читаются. Столбцы передаются в функции utils/analytics.py
+# как RecordColumns.
+#
+# Снимок строится заново целиком (записи могли удаляться) во временный
+# каталог, который затем подменяет прежний. Открытые читатели продолжают
+# работать со старыми файлами.
+#
+# Запуск из корня проекта:
+#     python -m utils.snapshot build [--db finance.db] [--output finance_snapshot]
+#     python -m utils.snapshot info [--output finance_snapshot]
+import argparse
+import json
+import os
+import shutil
+import sys
+from datetime import date, datetime
+
+import numpy as np
+
+from database import Database
+from utils.analytics import RecordColumns
+
+FORMAT_VERSION = 1
+HEADER_FILE = "header.json"
+COLUMNS = [("day", "<i4"), ("category_id", "<i4"), ("income", "u1"), ("amount_cents", "<i8")]
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def build_snapshot(db, path="finance_snapshot", chunk_size=100000):
+    # Возвращает количество записей в снимке
+    temporary = path + ".tmp"
+    if os.path.exists(temporary):
+        shutil.rmtree(temporary)
+    os.makedirs(temporary)
+
+    rows = 0
+    last_id = 0
+    files = [open(os.path.join(temporary, f"{name}.bin"), "wb") for name, _ in COLUMNS]
+    try:
+        for chunk in db.iter_day_ordered_chunks(chunk_size):
+            ids, *columns = zip(*chunk)
+            for file, (_, dtype), values in zip(files, COLUMNS, columns):
+                file.write(np.array(values, dtype=dtype).tobytes())
+            rows += len(chunk)
+            last_id = max(last_id, max(ids))
+    finally:
+        for file in files:
+            file.close()
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "rows": rows,
+        "last_id": last_id,
+        "columns": dict(COLUMNS),
+        "categories": {str(category_id): name for category_id, name in db.get_all_categories()},
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "source": os.path.abspath(db.db_name),
+    }
+    with open(os.path.join(temporary, HEADER_FILE), "w", encoding="utf-8") as file:
+        json.dump(header, file, ensure_ascii=False, indent=2)
+
+    if os.path.exists(path):
+        previous = path + ".old"
+        if os.path.exists(previous):
+            shutil.rmtree(previous)
+        os.replace(path, previous)
+        os.replace(temporary, path)
+        shutil.rmtree(previous)
+    else:
+        os.replace(temporary, path)
+    return rows
+
+
+def _day_number(value):
+    return date.fromisoformat(value[:10]).toordinal() - EPOCH_ORDINAL
+
+
+class Snapshot:
+    def __init__(self, path="finance_snapshot"):
+        with open(os.path.join(path, HEADER_FILE), encoding="utf-8") as file:
+            self.header = json.load(file)
+        if self.header["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия снимка: {self.header['format_version']}")
+
+        self.path = path
+        self.categories = {int(category_id): name for category_id, name in self.header["categories"].items()}
+        rows = self.header["rows"]
+        for name, dtype in COLUMNS:
+            # memmap не открывает пустой файл
+            if rows:
+                column = np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode="r", shape=(rows,))
+            else:
+                column = np.empty(0, dtype=dtype)
+            setattr(self, name, column)
+
+    def __len__(self):
+        return self.header["rows"]
+
+    def columns(self, start_date=None, end_date=None, record_type=None):
+        # Записи за период (даты 'YYYY-MM-DD' включительно) как RecordColumns.
+        # Без record_type столбцы — срезы memmap без копирования; фильтр по
+        # типу копирует только подходящие строки
+        start = np.searchsorted(self.day, _day_number(start_date), "left") if start_date else 0
+        end = np.searchsorted(self.day, _day_number(end_date), "right") if end_date else len(self)
+        days = self.day[start:end]
+        category_ids = self.category_id[start:end]
+        amounts = self.amount_cents[start:end]
+        if record_type:
+            mask = self.income[start:end] == (1 if record_type == "income" else 0)
+            days, category_ids, amounts = days[mask], category_ids[mask], amounts[mask]
+        return RecordColumns(days, category_ids, amounts, self.categories)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Снимок записей для аналитики")
+    parser.add_argument("command", choices=["build", "info"])
+    parser.add_argument("--db", default="finance.db", help="путь к файлу базы данных")
+    parser.add_argument("--output", default="finance_snapshot", help="каталог снимка")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        db = Database(args.db, query_cache_size=0)
+        try:
+            rows = build_snapshot(db, args.output)
+        finally:
+            db.close()
+        print(f"Снимок {args.output}: {rows:,} записей")
+        return 0
+
+    snapshot = Snapshot(args.output)
+    header = snapshot.header
+    print(f"Записей: {header['rows']:,}, последний id: {header['last_id']}, создан: {header['created']}")
+    if len(snapshot):
+        first, last = (np.datetime64(int(day), "D") for day in (snapshot.day[0], snapshot.day[-1]))
+        print(f"Период: {first} — {last}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())